@@ -2,35 +2,100 @@ from flask import Flask
 from flask_cors import CORS
 from config import Config
 from models import db
+from serializers import JSONProvider
+import startup
 
 def create_app():
+    timer = startup.StartupTimer()
     app = Flask(__name__)
-    app.config.from_object(Config)
+    with timer.phase('config'):
+        app.config.from_object(Config)
+        # ISO dates and numeric Decimals, encoded with orjson when it is installed
+        app.json = JSONProvider(app)
 
-    CORS(app)
-    db.init_app(app)
+        # Expose pagination headers so the frontend can follow cursors
+        CORS(app, expose_headers=['X-Next-Cursor', 'Link'])
+
+        # gzip/brotli by Accept-Encoding, with compressed bodies cached by ETag
+        import compression
+        compression.init_app(app)
+
+    with timer.phase('engine'):
+        # Engine profile (SQLite pragmas or MySQL pool) picked from DB_PROFILE
+        import db_profiles
+        db_profiles.init_app(app)
+        db.init_app(app)
+
+        # Per-request SQL and latency histograms, served at /api/admin/metrics
+        import metrics
+        metrics.init_app(app)
+
+        # GETs to the read-heavy blueprints go to a replica when DATABASE_REPLICA_URLS is set
+        import db_routing
+        db_routing.init_app(app)
 
     with app.app_context():
-        from routes.auth_routes import auth_bp
-        from routes.academic_routes import academic_bp
-        from routes.staff_routes import staff_bp
-        from routes.student_routes import student_bp
-        from routes.learning_routes import learning_bp
-        from routes.submission_routes import submission_bp
-        from routes.admin_routes import admin_bp
-
-        app.register_blueprint(auth_bp, url_prefix='/api/auth')
-        app.register_blueprint(academic_bp, url_prefix='/api/academic')
-        app.register_blueprint(staff_bp, url_prefix='/api/staff')
-        app.register_blueprint(student_bp, url_prefix='/api/student')
-        app.register_blueprint(learning_bp, url_prefix='/api/learning')
-        app.register_blueprint(submission_bp, url_prefix='/api/submission')
-        app.register_blueprint(admin_bp, url_prefix='/api/admin')
-        
-        db.create_all()
+        db_profiles.install(app)
+
+        with timer.phase('blueprints'):
+            from routes.auth_routes import auth_bp
+            from routes.academic_routes import academic_bp
+            from routes.staff_routes import staff_bp
+            from routes.student_routes import student_bp
+            from routes.learning_routes import learning_bp
+            from routes.submission_routes import submission_bp
+            from routes.admin_routes import admin_bp
+            from routes.upload_routes import upload_bp
+            from routes.job_routes import job_bp
+            from routes.search_routes import search_bp
+
+            app.register_blueprint(auth_bp, url_prefix='/api/auth')
+            app.register_blueprint(academic_bp, url_prefix='/api/academic')
+            app.register_blueprint(staff_bp, url_prefix='/api/staff')
+            app.register_blueprint(student_bp, url_prefix='/api/student')
+            app.register_blueprint(learning_bp, url_prefix='/api/learning')
+            app.register_blueprint(submission_bp, url_prefix='/api/submission')
+            app.register_blueprint(admin_bp, url_prefix='/api/admin')
+            app.register_blueprint(upload_bp, url_prefix='/api/uploads')
+            app.register_blueprint(job_bp, url_prefix='/api/jobs')
+            app.register_blueprint(search_bp, url_prefix='/api/search')
+
+        # Versioned migrations instead of db.create_all(); SCHEMA_STARTUP=check only compares versions
+        with timer.phase('schema'):
+            startup.prepare_schema(app)
+
+        if app.config['STARTUP_WARMUP']:
+            with timer.phase('warmup'):
+                startup.warm_up()
+
+    with timer.phase('cli'):
+        from migrations import schema_cli
+        from progress_counters import progress_cli
+        from student_import import students_cli
+        from file_storage import uploads_cli
+        from jobs import jobs_cli, ensure_worker
+        from outbox import outbox_cli
+        from db_routing import replicas_cli
+        from search import search_cli
+        import tasks  # registers the job handlers
+        app.cli.add_command(schema_cli)
+        app.cli.add_command(progress_cli)
+        app.cli.add_command(students_cli)
+        app.cli.add_command(uploads_cli)
+        app.cli.add_command(jobs_cli)
+        app.cli.add_command(outbox_cli)
+        app.cli.add_command(replicas_cli)
+        app.cli.add_command(search_cli)
+
+    # Start the in-process job worker on the first request, i.e. after any fork
+    @app.before_request
+    def start_job_worker():
+        ensure_worker(app)
 
+    startup.finish(app, timer)
     return app
 
 if __name__ == '__main__':
+    # Development server; production runs `gunicorn -c gunicorn.conf.py`
     app = create_app()
     app.run(debug=True)
@@ -0,0 +1,5 @@
+"""Load benchmarks: a synthetic dataset generator and concurrent flow runner.
+
+See benchmarks.runner for usage; run with `python -m benchmarks` from the
+backend directory.
+"""
@@ -0,0 +1,126 @@
+"""Synthetic dataset for the benchmarks.
+
+Everything is derived from a seeded random.Random, so the same scale and
+seed always produce the same rows with the same ids. Rows are written through
+the models with executemany inserts into an empty database.
+"""
+import random
+from datetime import date, timedelta
+from sqlalchemy import insert
+from models import (db, AcademicYear, Program, Course, ProgramCourse, Staff, StudyMaterial, Assignment, MCQ, Student,
+                    AssignmentSubmission, AssignmentEvaluation, Result)
+from tasks import grade_for_marks
+
+SCALES = {
+    'small': {
+        'academic_years': 1, 'programs': 3, 'courses': 6, 'staff': 3, 'materials_per_course': 8,
+        'mcqs_per_material': 4, 'students': 300, 'quiz_rate': 0.5, 'submission_rate': 0.5, 'evaluated_rate': 0.5
+    },
+    'medium': {
+        'academic_years': 2, 'programs': 10, 'courses': 30, 'staff': 15, 'materials_per_course': 20,
+        'mcqs_per_material': 5, 'students': 5000, 'quiz_rate': 0.4, 'submission_rate': 0.4, 'evaluated_rate': 0.6
+    },
+    'large': {
+        'academic_years': 4, 'programs': 40, 'courses': 120, 'staff': 60, 'materials_per_course': 30,
+        'mcqs_per_material': 5, 'students': 20000, 'quiz_rate': 0.3, 'submission_rate': 0.3, 'evaluated_rate': 0.7
+    },
+}
+
+ASSIGNMENT_EVERY = 3  # Every third material carries an assignment
+INSERT_CHUNK = 5000
+OPTIONS = 'ABCD'
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(insert(model), rows[start:start + INSERT_CHUNK])
+
+
+def generate(params, seed=42):
+    """Fill an empty database; returns the row count per table and the ids the flows need."""
+    if db.session.query(Student.student_id).first() or db.session.query(Course.course_id).first():
+        raise RuntimeError('The benchmark database must be empty')
+    rng = random.Random(seed)
+    today = date.today()
+    counts = {}
+
+    years = [{'academic_year_id': i, 'year': '{}-{}'.format(2020 + i, 2021 + i),
+              'start_date': date(2020 + i, 6, 1), 'end_date': date(2021 + i, 5, 31), 'status': 'Active'}
+             for i in range(1, params['academic_years'] + 1)]
+    programs = [{'program_id': i, 'program_name': 'Program {}'.format(i), 'semester': 1 + i % 6,
+                 'academic_year_id': 1 + i % params['academic_years'], 'status': 'Active'}
+                for i in range(1, params['programs'] + 1)]
+    staff = [{'staff_id': i, 'name': 'Staff {}'.format(i), 'email': 'staff{}@bench.lls'.format(i),
+              'password_hash': 'bench', 'status': 'Active'}
+             for i in range(1, params['staff'] + 1)]
+    courses = [{'course_id': i, 'course_name': 'Course {}'.format(i), 'credits': 4,
+                'staff_id': 1 + i % params['staff'], 'status': 'Active'}
+               for i in range(1, params['courses'] + 1)]
+    program_of_course = {c['course_id']: 1 + c['course_id'] % params['programs'] for c in courses}
+    links = [{'program_id': program_id, 'course_id': course_id, 'semester': 1}
+             for course_id, program_id in program_of_course.items()]
+
+    materials, assignments, mcqs = [], [], []
+    course_materials = {}  # course_id -> [(material_id, [(mcq_id, correct)], assignment_id or None)]
+    for course in courses:
+        items = []
+        for order in range(1, params['materials_per_course'] + 1):
+            material_id = len(materials) + 1
+            materials.append({'material_id': material_id, 'course_id': course['course_id'],
+                              'title': 'Lesson {}'.format(order), 'material_type': 'video', 'order_index': order,
+                              'duration_minutes': rng.randint(5, 45), 'upload_date': today,
+                              'uploaded_by': course['staff_id']})
+            questions = []
+            for q in range(params['mcqs_per_material']):
+                correct = rng.choice(OPTIONS)
+                mcq_id = len(mcqs) + 1
+                mcqs.append({'mcq_id': mcq_id, 'material_id': material_id, 'question': 'Question {}'.format(q + 1),
+                             'option_a': 'a', 'option_b': 'b', 'option_c': 'c', 'option_d': 'd',
+                             'correct_option': correct})
+                questions.append((mcq_id, correct))
+            assignment_id = None
+            if order % ASSIGNMENT_EVERY == 0:
+                assignment_id = len(assignments) + 1
+                assignments.append({'assignment_id': assignment_id, 'material_id': material_id,
+                                    'title': 'Assignment {}'.format(order), 'due_date': today + timedelta(days=14)})
+            items.append((material_id, questions, assignment_id))
+        course_materials[course['course_id']] = items
+
+    students, results, submissions, evaluations = [], [], [], []
+    for student_id in range(1, params['students'] + 1):
+        course_id = rng.randint(1, params['courses'])
+        students.append({'student_id': student_id, 'name': 'Student {}'.format(student_id),
+                         'email': 'student{}@bench.lls'.format(student_id), 'password_hash': 'bench',
+                         'course_id': course_id, 'program_id': program_of_course[course_id],
+                         'parent_email': 'parent{}@bench.lls'.format(student_id) if student_id % 2 else None})
+        for material_id, questions, assignment_id in course_materials[course_id]:
+            if rng.random() < params['quiz_rate']:
+                for mcq_id, correct in questions:
+                    passed = rng.random() < 0.7
+                    results.append({'student_id': student_id, 'mcq_id': mcq_id,
+                                    'status': 'Pass' if passed else 'Fail', 'grade': 'A' if passed else 'F'})
+            if assignment_id and rng.random() < params['submission_rate']:
+                submission_id = len(submissions) + 1
+                submissions.append({'submission_id': submission_id, 'assignment_id': assignment_id,
+                                    'student_id': student_id, 'assignment_text': 'Answer', 'submitted_date': today})
+                if rng.random() < params['evaluated_rate']:
+                    evaluation_id = len(evaluations) + 1
+                    marks = rng.randint(20, 100)
+                    evaluations.append({'evaluation_id': evaluation_id, 'submission_id': submission_id,
+                                        'marks': marks, 'evaluated_by': 1})
+                    results.append({'student_id': student_id, 'evaluation_id': evaluation_id,
+                                    'status': 'Pass' if marks >= 40 else 'Fail', 'grade': grade_for_marks(marks)})
+
+    for model, rows in ((AcademicYear, years), (Program, programs), (Staff, staff), (Course, courses),
+                        (ProgramCourse, links), (StudyMaterial, materials), (Assignment, assignments), (MCQ, mcqs),
+                        (Student, students), (AssignmentSubmission, submissions),
+                        (AssignmentEvaluation, evaluations), (Result, results)):
+        _insert(model, rows)
+        counts[model.__tablename__] = len(rows)
+    db.session.commit()
+
+    return counts, {
+        'staff_ids': [s['staff_id'] for s in staff],
+        'students': [(s['student_id'], s['course_id']) for s in students],
+        'course_materials': course_materials,
+    }
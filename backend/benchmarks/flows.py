@@ -0,0 +1,43 @@
+"""The user flows the benchmark drives.
+
+Each flow picks its subject with the client's random generator and yields
+the requests one user action makes, as (method, path, json body) tuples, in
+the order the frontend sends them.
+"""
+
+
+def student_dashboard(rng, ctx):
+    """StudentDashboard: catalog, the course's materials and the student's progress."""
+    student_id, course_id = rng.choice(ctx['students'])
+    yield 'GET', '/api/academic/courses', None
+    yield 'GET', '/api/learning/courses/{}/materials'.format(course_id), None
+    yield 'GET', '/api/learning/student/{}/course/{}/progress'.format(student_id, course_id), None
+
+
+def quiz_submit(rng, ctx):
+    """A student answers every question of one lesson."""
+    student_id, course_id = rng.choice(ctx['students'])
+    material_id, questions, _ = rng.choice(ctx['course_materials'][course_id])
+    answers = [{'mcq_id': mcq_id, 'selected_option': rng.choice('ABCD')} for mcq_id, _ in questions]
+    yield 'POST', '/api/learning/quiz/submit', {'student_id': student_id, 'answers': answers}
+    yield 'GET', '/api/learning/quiz/results/{}/{}'.format(student_id, material_id), None
+
+
+def grading_inbox(rng, ctx):
+    """A teacher opens the first page of their submissions inbox."""
+    staff_id = rng.choice(ctx['staff_ids'])
+    yield 'GET', '/api/submission/staff/{}/submissions?limit=50'.format(staff_id), None
+
+
+def roster(rng, ctx):
+    """A teacher opens the student list of their courses."""
+    staff_id = rng.choice(ctx['staff_ids'])
+    yield 'GET', '/api/student/staff/{}/students'.format(staff_id), None
+
+
+FLOWS = {
+    'student_dashboard': student_dashboard,
+    'quiz_submit': quiz_submit,
+    'grading_inbox': grading_inbox,
+    'roster': roster,
+}
@@ -0,0 +1,234 @@
+"""Seed a synthetic dataset, drive the main flows concurrently and write a JSON report.
+
+Run from the backend directory:
+
+    python -m benchmarks --scale medium --clients 8 --duration 20 --output bench.json --baseline last.json
+
+Each flow runs on its own, after a short warm-up, with --clients threads
+calling create_app() through the WSGI test client, so the numbers cover
+routing, the ORM and the database, not the network. The report holds, per
+flow, latency percentiles of a whole user action, throughput, error count
+and SQL statements per request; with --baseline the p95 and throughput
+changes against an earlier report are printed and stored too.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+WARMUP_ACTIONS = 5
+_local = threading.local()
+
+
+def _percentile(ordered, fraction):
+    # Nearest rank
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _count_queries(conn, cursor, statement, parameters, context, executemany):
+    if hasattr(_local, 'queries'):
+        _local.queries += 1
+
+
+def _client_loop(app, flow, ctx, seed, deadline, max_actions, samples, lock):
+    rng = random.Random(seed)
+    client = app.test_client()
+    _local.queries = 0
+    latencies, queries, errors, requests = [], [], 0, 0
+    actions = 0
+    while time.perf_counter() < deadline and (max_actions is None or actions < max_actions):
+        started = time.perf_counter()
+        for method, path, body in flow(rng, ctx):
+            _local.queries = 0
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            response.close()
+            queries.append(_local.queries)
+            requests += 1
+            if response.status_code >= 400:
+                errors += 1
+        latencies.append(time.perf_counter() - started)
+        actions += 1
+    with lock:
+        samples['latencies'].extend(latencies)
+        samples['queries'].extend(queries)
+        samples['errors'] += errors
+        samples['requests'] += requests
+
+
+def run_flow(app, name, flow, ctx, clients, duration, actions, seed):
+    # Warm caches and connection pools before measuring
+    warm = {'latencies': [], 'queries': [], 'errors': 0, 'requests': 0}
+    _client_loop(app, flow, ctx, seed, float('inf'), WARMUP_ACTIONS, warm, threading.Lock())
+
+    samples = {'latencies': [], 'queries': [], 'errors': 0, 'requests': 0}
+    lock = threading.Lock()
+    per_client = None if actions is None else max(1, actions // clients)
+    started = time.perf_counter()
+    deadline = started + duration if actions is None else float('inf')
+    threads = [threading.Thread(target=_client_loop, name='bench-{}-{}'.format(name, i),
+                                args=(app, flow, ctx, seed * 1000 + i, deadline, per_client, samples, lock))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(samples['latencies'])
+    queries = samples['queries']
+    return {
+        'actions': len(ordered),
+        'requests': samples['requests'],
+        'errors': samples['errors'],
+        'seconds': round(elapsed, 3),
+        'throughput_per_second': round(len(ordered) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'p50': _ms(_percentile(ordered, 0.50)),
+            'p95': _ms(_percentile(ordered, 0.95)),
+            'p99': _ms(_percentile(ordered, 0.99)),
+            'max': _ms(ordered[-1] if ordered else None),
+        },
+        'queries_per_request': {
+            'mean': round(sum(queries) / len(queries), 2) if queries else None,
+            'max': max(queries) if queries else None,
+        },
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _signed(value):
+    return 'n/a' if value is None else '{:+.1f}'.format(value)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _version():
+    path = os.path.join(os.path.dirname(__file__), '..', '..', 'VERSION')
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def compare(report, baseline):
+    """Per flow, the change in p95 latency and throughput against the baseline, in percent."""
+    changes = {}
+    for name, flow in report['flows'].items():
+        before = baseline.get('flows', {}).get(name)
+        if not before:
+            continue
+        change = {}
+        for label, now, then in (
+            ('p95_latency_pct', flow['latency_ms']['p95'], before['latency_ms']['p95']),
+            ('throughput_pct', flow['throughput_per_second'], before['throughput_per_second']),
+        ):
+            change[label] = round(100.0 * (now - then) / then, 1) if now is not None and then else None
+        changes[name] = change
+    return changes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', choices=('small', 'medium', 'large'), default='small')
+    for key in ('academic_years', 'programs', 'courses', 'staff', 'materials_per_course', 'mcqs_per_material',
+                'students'):
+        parser.add_argument('--' + key.replace('_', '-'), type=int, dest=key, help='Override the scale preset')
+    parser.add_argument('--flows', default=','.join(('student_dashboard', 'quiz_submit', 'grading_inbox', 'roster')),
+                        help='Comma-separated flows to run')
+    parser.add_argument('--clients', type=int, default=4, help='Concurrent clients per flow')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per flow')
+    parser.add_argument('--actions', type=int, help='Run this many user actions per flow instead of --duration')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', help='An empty database to seed; defaults to a new SQLite file')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', help='An earlier report to compare against')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='lls-bench-'), 'bench.db')
+    # Config reads the environment on import, so set it before the app is loaded
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['JOB_WORKER_THREADS'] = '0'
+    os.environ['SQL_QUERY_BUDGET'] = '0'
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app import create_app
+    from models import db
+    from benchmarks.dataset import SCALES, generate
+    from benchmarks.flows import FLOWS
+
+    flows = [name.strip() for name in args.flows.split(',') if name.strip()]
+    unknown = [name for name in flows if name not in FLOWS]
+    if unknown:
+        raise SystemExit('Unknown flows: {} (choose from {})'.format(', '.join(unknown), ', '.join(FLOWS)))
+    params = dict(SCALES[args.scale])
+    params.update({key: value for key, value in vars(args).items() if key in params and value is not None})
+
+    app = create_app()
+    event.listen(Engine, 'after_cursor_execute', _count_queries)
+
+    print('Seeding {} dataset into {}'.format(args.scale, database_url))
+    started = time.perf_counter()
+    with app.app_context():
+        counts, ctx = generate(params, args.seed)
+        dialect = db.engine.dialect.name
+    print('Seeded {} rows in {:.1f}s'.format(sum(counts.values()), time.perf_counter() - started))
+
+    report = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat() + 'Z',
+            'version': _version(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'database': dialect,
+            'scale': args.scale,
+            'params': params,
+            'seed': args.seed,
+            'clients': args.clients,
+            'duration': None if args.actions else args.duration,
+            'actions': args.actions,
+        },
+        'dataset': counts,
+        'flows': {},
+    }
+    for index, name in enumerate(flows):
+        result = run_flow(app, name, FLOWS[name], ctx, args.clients, args.duration, args.actions, args.seed + index)
+        report['flows'][name] = result
+        print('{:<18} {:>7} actions {:>8} /s  p50 {:>8} ms  p95 {:>8} ms  p99 {:>8} ms  {:>6} queries/req  {} errors'.format(
+            name, result['actions'], result['throughput_per_second'], result['latency_ms']['p50'],
+            result['latency_ms']['p95'], result['latency_ms']['p99'], result['queries_per_request']['mean'],
+            result['errors']))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['baseline'] = {'path': args.baseline, 'changes': compare(report, json.load(f))}
+        for name, change in report['baseline']['changes'].items():
+            print('{:<18} p95 {:>8}%  throughput {:>8}%  vs baseline'.format(
+                name, _signed(change['p95_latency_pct']), _signed(change['throughput_pct'])))
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Wrote {}'.format(args.output))
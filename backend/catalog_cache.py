@@ -0,0 +1,70 @@
+import threading
+from functools import wraps
+from flask import Response, request
+from sqlalchemy.exc import IntegrityError
+from models import db, CatalogVersion
+
+# Per-process cache of serialized catalog responses: key -> (catalog version, JSON bytes, headers)
+_entries = {}
+_stats = {'hits': 0, 'misses': 0}
+_lock = threading.Lock()
+MAX_ENTRIES = 512
+# Set by list_response on keyset pages; a cached page without them would look like the last one
+REPLAYED_HEADERS = ('X-Next-Cursor', 'Link')
+
+
+def current_version():
+    return db.session.query(CatalogVersion.version).filter_by(id=1).scalar() or 0
+
+
+def bump_version():
+    """Mark the catalog as changed. Call before committing the write it belongs to.
+
+    Migration 10 seeds the version row; should it be missing anyway, it is
+    created in a savepoint so a concurrent first write cannot fail the request.
+    """
+    bump = {CatalogVersion.version: CatalogVersion.version + 1}
+    if not CatalogVersion.query.filter_by(id=1).update(bump, synchronize_session=False):
+        try:
+            with db.session.begin_nested():
+                db.session.add(CatalogVersion(id=1, version=1))
+        except IntegrityError:
+            # Another write created it first
+            CatalogVersion.query.filter_by(id=1).update(bump, synchronize_session=False)
+
+
+def stats():
+    with _lock:
+        return dict(_stats, entries=len(_entries))
+
+
+def cached_catalog(view):
+    """Serve a GET view from the catalog cache while the catalog version is unchanged.
+
+    The key covers the endpoint, its URL arguments and the query string, so
+    filtered listings and pages are cached separately, each with its
+    pagination headers. Only complete 200 responses are stored; streamed
+    exports always go to the database.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.endpoint, tuple(sorted(kwargs.items())), request.query_string)
+        version = current_version()
+
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == version:
+            with _lock:
+                _stats['hits'] += 1
+            return Response(entry[1], mimetype='application/json', headers=entry[2])
+
+        with _lock:
+            _stats['misses'] += 1
+        response = view(*args, **kwargs)
+        if isinstance(response, Response) and response.status_code == 200 and not response.is_streamed:
+            with _lock:
+                if len(_entries) >= MAX_ENTRIES:
+                    _entries.clear()
+                headers = [(name, response.headers[name]) for name in REPLAYED_HEADERS if name in response.headers]
+                _entries[key] = (version, response.get_data(), headers)
+        return response
+    return wrapper
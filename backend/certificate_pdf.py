@@ -0,0 +1,60 @@
+"""Certificate PDF rendering.
+
+A plain single-page PDF built by hand with the standard Helvetica fonts, so
+no PDF library is needed. Kept free of Flask and database imports: the
+function runs in worker processes that import only this module.
+"""
+
+PAGE_WIDTH = 842  # A4 landscape, in points
+PAGE_HEIGHT = 595
+
+
+def _pdf_text(value):
+    text = str(value).encode('latin-1', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _centred(font, size, y, value):
+    # Helvetica averages about half an em per character; close enough to centre a line
+    x = max(36, (PAGE_WIDTH - len(str(value)) * size * 0.5) / 2)
+    return 'BT /{} {} Tf {:.1f} {} Td ({}) Tj ET'.format(font, size, x, y, _pdf_text(value))
+
+
+def render_certificate_pdf(fields):
+    """Return the PDF bytes for one certificate.
+
+    `fields` holds student_name, program_name, certificate_number and
+    issue_date (an ISO date string).
+    """
+    content = '\n'.join([
+        '4 w 30 30 {} {} re S'.format(PAGE_WIDTH - 60, PAGE_HEIGHT - 60),
+        _centred('F2', 36, 450, 'Certificate of Completion'),
+        _centred('F1', 16, 390, 'This certifies that'),
+        _centred('F2', 28, 340, fields['student_name']),
+        _centred('F1', 16, 290, 'has successfully completed the program'),
+        _centred('F2', 22, 245, fields['program_name']),
+        _centred('F1', 12, 120, 'Certificate No. {}'.format(fields['certificate_number'])),
+        _centred('F1', 12, 100, 'Issued on {}'.format(fields['issue_date'])),
+    ]).encode('latin-1')
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        ('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {} {}] /Contents 4 0 R '
+         '/Resources << /Font << /F1 5 0 R /F2 6 0 R >> >> >>').format(PAGE_WIDTH, PAGE_HEIGHT).encode('ascii'),
+        b'<< /Length ' + str(len(content)).encode('ascii') + b' >>\nstream\n' + content + b'\nendstream',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    ]
+
+    pdf = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b'%010d 00000 n \n' % offset
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(pdf)
@@ -0,0 +1,227 @@
+"""Batch certificate issuance.
+
+A batch certifies every student of a program who passed all of its courses
+and has no certificate for that program yet. It runs as a chain of background jobs, one
+chunk of students each: a chunk's PDFs are rendered in a process pool, then
+its certificates, the batch progress and the job for the next chunk are
+committed in one transaction. A crash loses at most the chunk in flight,
+which the retried job redoes; once the job has used up its attempts,
+starting the batch again queues it anew. Students already certified are
+skipped, and the unique (student_id, program_id) index stops a concurrent
+run from issuing twice.
+
+Certificate numbers are reserved from certificate_sequence a block at a time
+and the unused part of the block is kept on the batch row, so a resumed
+batch reuses the numbers a failed chunk had taken instead of leaving gaps.
+"""
+import threading
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from certificate_pdf import render_certificate_pdf
+from file_storage import store_bytes
+from jobs import enqueue, retry
+from models import (db, Assignment, AssignmentEvaluation, AssignmentSubmission, Certificate, CertificateBatch,
+                    CertificateSequence, MCQ, Program, ProgramCourse, Result, Student, StudyMaterial)
+
+CHUNK_SIZE = 200
+NUMBER_BLOCK_SIZE = 1000  # A multiple of CHUNK_SIZE, so only a batch's last chunk leaves part of a block
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def format_number(number):
+    return '{}-{:08d}'.format(current_app.config['CERTIFICATE_NUMBER_PREFIX'], number)
+
+
+def reserve_numbers(count):
+    """Reserve `count` consecutive certificate numbers in the current transaction; returns the first."""
+    bump = {CertificateSequence.last_number: CertificateSequence.last_number + count}
+    if not CertificateSequence.query.filter_by(id=1).update(bump, synchronize_session=False):
+        try:
+            with db.session.begin_nested():
+                db.session.add(CertificateSequence(id=1, last_number=count))
+            return 1
+        except IntegrityError:
+            # Another transaction created the sequence first
+            CertificateSequence.query.filter_by(id=1).update(bump, synchronize_session=False)
+    last = db.session.query(CertificateSequence.last_number).filter_by(id=1).scalar()
+    return last - count + 1
+
+
+def _course_items(item, course_filter):
+    """SELECT of the assignments or quiz questions whose material matches course_filter."""
+    return db.select(item).join(StudyMaterial, StudyMaterial.material_id == item.material_id).where(course_filter)
+
+
+def _eligible_students(program_id):
+    """Students of the program (directly or through an enrolled course) who passed it and have no certificate.
+
+    Passing means passing every course of the program: a Pass result for each
+    of the course's assignments and at least CERTIFICATE_QUIZ_PASS_PERCENT of
+    its quiz questions answered correctly. A course without graded work asks
+    for nothing, but at least one Pass in the program is required; the latest
+    one is recorded on the certificate.
+    """
+    percent = current_app.config['CERTIFICATE_QUIZ_PASS_PERCENT']
+    program_courses = db.select(ProgramCourse.course_id).where(ProgramCourse.program_id == program_id)
+    course = db.aliased(ProgramCourse)
+    this_course = StudyMaterial.course_id == course.course_id
+    in_program = StudyMaterial.course_id.in_(program_courses)
+
+    # Per course of the program and per student, correlated to both
+    assignments = _course_items(Assignment, this_course).with_only_columns(
+        db.func.count(Assignment.assignment_id)).scalar_subquery()
+    questions = _course_items(MCQ, this_course).with_only_columns(db.func.count(MCQ.mcq_id)).scalar_subquery()
+    passed = db.select(db.func.count(db.distinct(AssignmentSubmission.assignment_id))).join(
+        AssignmentEvaluation, AssignmentEvaluation.submission_id == AssignmentSubmission.submission_id
+    ).join(Result, Result.evaluation_id == AssignmentEvaluation.evaluation_id).where(
+        AssignmentSubmission.student_id == Student.student_id, Result.status == 'Pass',
+        AssignmentSubmission.assignment_id.in_(
+            _course_items(Assignment, this_course).with_only_columns(Assignment.assignment_id).correlate(course))
+    ).correlate(Student, course).scalar_subquery()
+    correct = db.select(db.func.count(Result.result_id)).where(
+        Result.student_id == Student.student_id, Result.status == 'Pass',
+        Result.mcq_id.in_(_course_items(MCQ, this_course).with_only_columns(MCQ.mcq_id).correlate(course))
+    ).correlate(Student, course).scalar_subquery()
+    failed_course = db.select(course.course_id).where(
+        course.program_id == program_id,
+        db.or_(passed < assignments, correct * 100 < questions * percent)
+    ).correlate(Student).exists()
+
+    latest_pass = db.select(db.func.max(Result.result_id)).where(
+        Result.student_id == Student.student_id, Result.status == 'Pass',
+        db.or_(
+            Result.evaluation_id.in_(db.select(AssignmentEvaluation.evaluation_id).join(
+                AssignmentSubmission, AssignmentSubmission.submission_id == AssignmentEvaluation.submission_id
+            ).where(AssignmentSubmission.assignment_id.in_(
+                _course_items(Assignment, in_program).with_only_columns(Assignment.assignment_id)))),
+            Result.mcq_id.in_(_course_items(MCQ, in_program).with_only_columns(MCQ.mcq_id))
+        )
+    ).correlate(Student).scalar_subquery()
+    certified = db.select(Certificate.certificate_id).where(
+        Certificate.student_id == Student.student_id, Certificate.program_id == program_id
+    ).exists()
+    return db.session.query(Student.student_id, Student.name, latest_pass.label('result_id')).filter(
+        db.or_(Student.program_id == program_id, Student.course_id.in_(program_courses)),
+        latest_pass.isnot(None),
+        ~failed_course,
+        ~certified
+    )
+
+
+def _render_pool():
+    """The per-process PDF render pool, or None to render in the calling thread."""
+    global _pool
+    processes = current_app.config['CERTIFICATE_RENDER_PROCESSES']
+    if processes <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Imported here so web workers that never issue certificates skip loading multiprocessing
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn, not fork: the job worker calling this is one thread of many
+            _pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def render_pdfs(fields):
+    pool = _render_pool()
+    if pool is None:
+        return [render_certificate_pdf(f) for f in fields]
+    chunksize = max(1, len(fields) // (current_app.config['CERTIFICATE_RENDER_PROCESSES'] * 4))
+    return list(pool.map(render_certificate_pdf, fields, chunksize=chunksize))
+
+
+def _enqueue_chunk(batch):
+    return enqueue('issue_certificate_batch', {'batch_id': batch.batch_id},
+                   idempotency_key='certificate-batch:{}:{}'.format(batch.batch_id, batch.last_student_id))
+
+
+def start_batch(program_id):
+    """Open a batch for the program and queue its first chunk; returns (batch, job, created).
+
+    A batch already running for the program is returned instead of a second
+    one, together with the job for its next chunk. If that job used up its
+    attempts it is queued again, so the batch resumes where it stopped.
+    """
+    running = CertificateBatch.query.filter_by(program_id=program_id, status='Running').first()
+    if running:
+        # The same key as the chunk job already queued or run, so this finds it rather than adding one
+        job = _enqueue_chunk(running)
+        if job.status == 'Failed':
+            retry(job)
+        db.session.commit()
+        return running, job, False
+    batch = CertificateBatch(program_id=program_id, total=_eligible_students(program_id).count())
+    db.session.add(batch)
+    db.session.flush()
+    job = _enqueue_chunk(batch)
+    db.session.commit()
+    return batch, job, True
+
+
+def issue_next_chunk(batch_id):
+    """Issue the next chunk of a batch and queue the one after it. Runs as a job."""
+    batch = db.session.get(CertificateBatch, batch_id)
+    if batch is None or batch.status == 'Done':
+        return
+
+    students = _eligible_students(batch.program_id).filter(
+        Student.student_id > batch.last_student_id
+    ).order_by(Student.student_id).limit(CHUNK_SIZE).all()
+    if not students:
+        # Hand back the unused end of the block unless numbers were reserved after it
+        CertificateSequence.query.filter_by(id=1, last_number=batch.reserved_until).update(
+            {CertificateSequence.last_number: batch.next_number - 1}, synchronize_session=False
+        )
+        batch.status = 'Done'
+        batch.finished_at = datetime.utcnow()
+        return
+
+    if batch.reserved_until - batch.next_number + 1 < len(students):
+        first = reserve_numbers(NUMBER_BLOCK_SIZE)
+        batch.next_number, batch.reserved_until = first, first + NUMBER_BLOCK_SIZE - 1
+        # Keep the block even if this chunk fails, so the retry reuses its numbers
+        db.session.commit()
+
+    program_name = db.session.query(Program.program_name).filter_by(program_id=batch.program_id).scalar()
+    issue_date = date.today()
+    numbers = [format_number(batch.next_number + i) for i in range(len(students))]
+    pdfs = render_pdfs([{
+        'student_name': s.name,
+        'program_name': program_name,
+        'certificate_number': number,
+        'issue_date': issue_date.isoformat()
+    } for s, number in zip(students, numbers)])
+
+    db.session.execute(insert(Certificate), [{
+        'student_id': s.student_id,
+        'result_id': s.result_id,
+        'program_id': batch.program_id,
+        'issue_date': issue_date,
+        'certificate_number': number,
+        'file_path': store_bytes(pdf, 'application/pdf'),
+        'status': 'Issued'
+    } for s, number, pdf in zip(students, numbers, pdfs)])
+
+    batch.issued += len(students)
+    batch.next_number += len(students)
+    batch.last_student_id = students[-1].student_id
+    _enqueue_chunk(batch)
+
+
+def batch_progress(batch):
+    return {
+        'batch_id': batch.batch_id,
+        'program_id': batch.program_id,
+        'status': batch.status,
+        'total': batch.total,
+        'issued': batch.issued,
+        'percent': min(100.0, round(100.0 * batch.issued / batch.total, 1)) if batch.total else 100.0,
+        'created_at': batch.created_at.isoformat() if batch.created_at else None,
+        'finished_at': batch.finished_at.isoformat() if batch.finished_at else None
+    }
@@ -0,0 +1,118 @@
+"""Negotiated response compression.
+
+An after_request hook compresses response bodies of COMPRESS_MIN_SIZE bytes
+or more with brotli or gzip, whichever the client's Accept-Encoding prefers
+(brotli only when the package is installed). Streamed responses, file
+downloads, ranges and types that are already compressed go out untouched.
+
+Compressed bodies of responses with an ETag are kept in a per-process LRU
+cache, bounded by COMPRESS_CACHE_BYTES, so hot list payloads such as the
+course catalog, the student list and the grading inbox are compressed once
+per change instead of once per request. The key holds a digest of the
+uncompressed body next to the ETag: two versions of a payload that somehow
+shared an ETag still never get each other's compressed bytes. Weak ETags,
+which the conditional GETs send, may be shared by every encoding of the same
+content and are left alone; a strong ETag gets the encoding appended so
+caches keep the representations apart. Cache hits, misses and bytes are
+registered with metrics and served at /api/admin/metrics.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import request
+import metrics
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/xml', 'application/javascript',
+                      'image/svg+xml')
+
+_cache = OrderedDict()  # (etag, encoding, body digest) -> compressed body
+_cache_bytes = [0]
+_stats = {'hits': 0, 'misses': 0, 'compressed': 0}
+_lock = threading.Lock()
+
+
+def stats():
+    with _lock:
+        return dict(_stats, entries=len(_cache), bytes=_cache_bytes[0])
+
+
+@metrics.register
+def _metric_lines():
+    current = stats()
+    return ['# HELP lls_compression_cache_total Compressed-body cache lookups by result.',
+            '# TYPE lls_compression_cache_total counter',
+            'lls_compression_cache_total{{result="hit"}} {}'.format(current['hits']),
+            'lls_compression_cache_total{{result="miss"}} {}'.format(current['misses']),
+            '# HELP lls_compression_cache_bytes Bytes of compressed bodies cached.',
+            '# TYPE lls_compression_cache_bytes gauge',
+            'lls_compression_cache_bytes {}'.format(current['bytes'])]
+
+
+def _compressible(mimetype):
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def _encode(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=config['COMPRESS_GZIP_LEVEL'], mtime=0)
+
+
+def _cached(key, data, encoding, config):
+    with _lock:
+        body = _cache.get(key)
+        if body is not None:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            return body
+        _stats['misses'] += 1
+    body = _encode(data, encoding, config)
+    limit = config['COMPRESS_CACHE_BYTES']
+    if len(body) <= limit // 8:  # One payload may not push out most of the others
+        with _lock:
+            if key not in _cache:
+                _cache[key] = body
+                _cache_bytes[0] += len(body)
+                while _cache_bytes[0] > limit:
+                    _cache_bytes[0] -= len(_cache.popitem(last=False)[1])
+    return body
+
+
+def init_app(app):
+    if not app.config['COMPRESS_RESPONSES']:
+        return
+    offered = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    @app.after_request
+    def compress(response):
+        if response.direct_passthrough or response.is_streamed or response.status_code not in (200, 201) \
+                or 'Content-Encoding' in response.headers or 'Content-Range' in response.headers \
+                or not _compressible(response.mimetype or ''):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(offered)
+        data = response.get_data()
+        if encoding is None or len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        etag, weak = response.get_etag()
+        if etag:
+            # Hashing is far cheaper than compressing, and the key then cannot outlive the content
+            key = (etag, encoding, hashlib.blake2b(data, digest_size=16).digest())
+            body = _cached(key, data, encoding, app.config)
+            if not weak:
+                response.set_etag('{}-{}'.format(etag, encoding))
+        else:
+            body = _encode(data, encoding, app.config)
+        with _lock:
+            _stats['compressed'] += 1
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
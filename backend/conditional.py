@@ -0,0 +1,65 @@
+"""Conditional GETs from row versions.
+
+Versioned models carry updated_at, set on insert and on every ORM or bulk
+UPDATE. A read endpoint names the rows its body is built from; before the
+view runs, one SELECT of scalar subqueries reads COUNT and MAX(updated_at)
+over each of them, each answered from an index. The ETag hashes those values
+together with the endpoint, its URL arguments and the query string, so a
+matching If-None-Match is answered 304 without running the view or
+serializing anything.
+
+The count is what notices deletions, which leave MAX(updated_at) unchanged.
+For that reason Last-Modified is sent for information only and
+If-Modified-Since is not used to answer 304.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import current_app, make_response, request
+from sqlalchemy import func, select
+from models import db, CatalogVersion
+
+
+def rows(model, *criteria):
+    """Version of the model's rows matching criteria: their count and latest updated_at."""
+    return [
+        select(func.count()).select_from(model).where(*criteria).scalar_subquery(),
+        select(func.max(model.updated_at)).where(*criteria).scalar_subquery(),
+    ]
+
+
+def catalog():
+    """Version of the academic catalog (years, programs, courses and their links), kept by catalog_cache."""
+    return [select(CatalogVersion.version).where(CatalogVersion.id == 1).scalar_subquery()]
+
+
+def conditional(versions):
+    """Answer If-None-Match for a GET view from the versions of the rows it reads.
+
+    `versions` is called with the view's URL arguments, inside the request,
+    and returns a list of rows()/catalog() parts. Place the decorator above
+    cached_catalog so a 304 skips the cache lookup too.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            values = db.session.execute(select(*versions(**kwargs))).one()
+            key = repr((request.endpoint, sorted(kwargs.items()), request.query_string, tuple(values)))
+            # Weak: the same data may be sent with different encodings
+            etag = hashlib.sha1(key.encode()).hexdigest()
+            stamps = [value for value in values if isinstance(value, datetime)]
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if stamps:
+                response.last_modified = max(stamps)
+            # Cache, but ask every time; the answer is usually a 304
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -4,3 +4,67 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///lls.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER')  # Defaults to <instance>/uploads
+    MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE') or 2 * 1024 ** 3)
+    # nginx internal location aliased to UPLOAD_FOLDER; when set, file bytes are served by nginx
+    FILE_ACCEL_REDIRECT_PREFIX = os.environ.get('FILE_ACCEL_REDIRECT_PREFIX')
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE') == '1'
+    # Background job threads per web process; 0 leaves jobs to `flask jobs worker`
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS') or 2)
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL') or 1.0)
+    # Certificate numbers are '<prefix>-00000001'; PDFs render in this many processes (0 or 1 renders inline)
+    CERTIFICATE_NUMBER_PREFIX = os.environ.get('CERTIFICATE_NUMBER_PREFIX') or 'CERT'
+    CERTIFICATE_RENDER_PROCESSES = int(os.environ.get('CERTIFICATE_RENDER_PROCESSES') or os.cpu_count() or 1)
+    # Share of a course's quiz questions a student must answer correctly to pass it for a certificate
+    CERTIFICATE_QUIZ_PASS_PERCENT = int(os.environ.get('CERTIFICATE_QUIZ_PASS_PERCENT') or 50)
+    # Outbox email: 'file' writes .eml files to MAIL_FILE_DIR (default <instance>/mail), 'smtp' uses MAIL_SERVER
+    MAIL_TRANSPORT = os.environ.get('MAIL_TRANSPORT') or 'file'
+    MAIL_FILE_DIR = os.environ.get('MAIL_FILE_DIR')
+    MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'localhost'
+    MAIL_PORT = int(os.environ.get('MAIL_PORT') or 25)
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS') == '1'
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_FROM = os.environ.get('MAIL_FROM') or 'no-reply@lls.local'
+    # Messages queued within this many seconds go out in one dispatch
+    OUTBOX_DISPATCH_DELAY = float(os.environ.get('OUTBOX_DISPATCH_DELAY') or 5)
+    # Requests running more SQL statements than this are logged with their statements; 0 disables
+    SQL_QUERY_BUDGET = int(os.environ.get('SQL_QUERY_BUDGET') or 20)
+    # Engine tuning profile: auto (from the URL), sqlite, mysql or default; see db_profiles
+    DB_PROFILE = os.environ.get('DB_PROFILE') or 'auto'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000)
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB') or 64 * 1024)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 ** 2)
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 30)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 280)  # Below MySQL's usual wait_timeout
+    # Read replicas as comma-separated URLs, used by GETs to REPLICA_BLUEPRINTS; see db_routing
+    SQLALCHEMY_BINDS = {
+        'replica_{}'.format(i): url.strip()
+        for i, url in enumerate((os.environ.get('DATABASE_REPLICA_URLS') or '').split(','), start=1) if url.strip()
+    }
+    REPLICA_BLUEPRINTS = ('learning', 'academic', 'student', 'submission', 'search')
+    # After a write, the same client reads from the primary for this long
+    READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS') or 10)
+    # What create_app does with the schema: upgrade, check (version only, no DDL) or skip; see startup
+    SCHEMA_STARTUP = os.environ.get('SCHEMA_STARTUP') or 'upgrade'
+    # Configure the ORM and open a connection at startup rather than on the first request
+    STARTUP_WARMUP = os.environ.get('STARTUP_WARMUP', '1') == '1'
+    # Production server (gunicorn -c gunicorn.conf.py): WEB_WORKERS 0 means one per available core
+    WEB_BIND = os.environ.get('WEB_BIND') or '127.0.0.1:5000'
+    WEB_WORKERS = int(os.environ.get('WEB_WORKERS') or 0)
+    WEB_THREADS = int(os.environ.get('WEB_THREADS') or 4)
+    WEB_MAX_REQUESTS = int(os.environ.get('WEB_MAX_REQUESTS') or 10000)
+    WEB_MAX_REQUESTS_JITTER = int(os.environ.get('WEB_MAX_REQUESTS_JITTER') or 1000)
+    WEB_GRACEFUL_TIMEOUT = int(os.environ.get('WEB_GRACEFUL_TIMEOUT') or 30)
+    WEB_KEEPALIVE = int(os.environ.get('WEB_KEEPALIVE') or 5)
+    WEB_PRELOAD = os.environ.get('WEB_PRELOAD') == '1'  # HUP cannot reload code preloaded in the master
+    # gzip/brotli for bodies of at least COMPRESS_MIN_SIZE bytes; turn off when a proxy in front compresses
+    COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', '1') == '1'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL') or 6)
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY') or 5)
+    # Compressed bodies of responses with an ETag, kept per process
+    COMPRESS_CACHE_BYTES = int(os.environ.get('COMPRESS_CACHE_BYTES') or 32 * 1024 * 1024)
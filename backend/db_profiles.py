@@ -0,0 +1,130 @@
+"""Database engine profiles.
+
+DB_PROFILE picks how the engine is tuned; 'auto' (the default) follows the
+database URL.
+
+sqlite   Every new connection is switched to WAL with synchronous=NORMAL, a
+         larger page cache, memory-mapped reads and a busy timeout, so
+         readers no longer block the writer and concurrent writers wait
+         for each other instead of failing with "database is locked".
+mysql    A bounded connection pool with overflow, connections recycled
+         before the server's wait_timeout and checked with a ping on
+         checkout, so a restarted server or idle cut-off costs a reconnect
+         rather than a failed request.
+default  Flask-SQLAlchemy's own engine settings.
+
+The numbers come from the DB_* and SQLITE_* settings in Config. The active
+profile and what the database reports back are served at
+/api/admin/database.
+"""
+from sqlalchemy import event, text
+from models import db
+
+PROFILES = ('auto', 'sqlite', 'mysql', 'default')
+
+
+def profile_for(app):
+    profile = app.config['DB_PROFILE']
+    if profile not in PROFILES:
+        raise ValueError('DB_PROFILE must be one of {}'.format(', '.join(PROFILES)))
+    if profile == 'auto':
+        uri = app.config['SQLALCHEMY_DATABASE_URI']
+        if uri.startswith('sqlite'):
+            return 'sqlite'
+        if uri.startswith('mysql'):
+            return 'mysql'
+        return 'default'
+    return profile
+
+
+def engine_options(app, profile):
+    config = app.config
+    if profile == 'sqlite':
+        # pysqlite's own lock wait, in seconds, alongside the busy_timeout pragma
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000.0}}
+    if profile == 'mysql':
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+        }
+    return {}
+
+
+def sqlite_pragmas(config):
+    return (
+        ('journal_mode', 'WAL'),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('cache_size', -config['SQLITE_CACHE_SIZE_KB']),  # Negative means KiB rather than pages
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT_MS']),
+        ('temp_store', 'MEMORY'),
+    )
+
+
+def init_app(app):
+    """Choose the profile and merge its engine options. Call before db.init_app(app)."""
+    profile = profile_for(app)
+    app.config['DB_ACTIVE_PROFILE'] = profile
+    options = engine_options(app, profile)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def install(app):
+    """Attach the per-connection setup to every engine. Call inside an app context after db.init_app(app)."""
+    if app.config['DB_ACTIVE_PROFILE'] != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(app.config)
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+        cursor.close()
+        # pysqlite only opens a transaction before DML, so a SAVEPOINT taken earlier started one
+        # of its own and RELEASE committed it. Transactions are begun explicitly instead
+        dbapi_connection.isolation_level = None
+
+    def begin(conn):
+        # A deferred transaction that has read cannot take the write lock once another connection
+        # has written; work that reads before it writes asks for the lock up front with sqlite_immediate
+        conn.exec_driver_sql('BEGIN IMMEDIATE' if conn.get_execution_options().get('sqlite_immediate') else 'BEGIN')
+
+    for engine in db.engines.values():
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', set_pragmas)
+            event.listen(engine, 'begin', begin)
+
+
+def _engine_report(engine):
+    report = {
+        'dialect': engine.dialect.name,
+        'driver': engine.dialect.driver,
+        'url': engine.url.render_as_string(hide_password=True),
+        'pool': {'class': type(engine.pool).__name__, 'status': engine.pool.status()},
+    }
+    with engine.connect() as conn:
+        if engine.dialect.name == 'sqlite':
+            report['pragmas'] = {
+                name: conn.execute(text('PRAGMA {}'.format(name))).scalar()
+                for name in ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'busy_timeout', 'temp_store')
+            }
+        elif engine.dialect.name == 'mysql':
+            row = conn.execute(text(
+                'SELECT VERSION(), @@transaction_isolation, @@wait_timeout, @@max_connections'
+            )).one()
+            report['server'] = {'version': row[0], 'transaction_isolation': row[1], 'wait_timeout': row[2],
+                                'max_connections': row[3]}
+    return report
+
+
+def diagnostics(app):
+    options = {key: value for key, value in app.config['SQLALCHEMY_ENGINE_OPTIONS'].items() if key != 'connect_args'}
+    return {
+        'profile': app.config['DB_ACTIVE_PROFILE'],
+        'engine_options': options,
+        'engines': {bind or 'default': _engine_report(engine) for bind, engine in db.engines.items()},
+    }
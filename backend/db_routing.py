@@ -0,0 +1,134 @@
+"""Read-replica routing.
+
+Replicas are Flask-SQLAlchemy binds named replica_1, replica_2, ... built
+from DATABASE_REPLICA_URLS. No model is bound to them; instead the session
+class below sends plain SELECTs to a replica when the request picked one,
+and everything else (flushes, DML, SELECT ... FOR UPDATE, raw connections)
+to the primary. Once a request writes it stays on the primary.
+
+A GET or HEAD request to one of REPLICA_BLUEPRINTS picks a random replica,
+unless the same client wrote something in the last READ_YOUR_WRITES_SECONDS.
+The client is recognised by a short-lived cookie set on every successful
+write and, for clients that do not send cookies cross-origin, by address and
+user agent within the process. Code that must read the primary in a routed
+request calls use_primary().
+
+Locally two SQLite files work: point DATABASE_REPLICA_URLS at a copy and run
+`flask replicas sync` to refresh it from the primary.
+"""
+import random
+import threading
+import time
+import click
+from flask import current_app, request
+from flask.cli import AppGroup
+from flask_sqlalchemy.session import Session
+
+replicas_cli = AppGroup('replicas', help='Manage read replicas.')
+
+REPLICA_BIND_PREFIX = 'replica_'
+COOKIE_NAME = 'lls_primary_until'
+MAX_TRACKED_CLIENTS = 10000
+
+_recent_writers = {}  # client key -> time until which it reads the primary
+_writers_lock = threading.Lock()
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if replica is not None and bind is None:
+            if self._flushing or clause is None or not getattr(clause, 'is_select', False) \
+                    or getattr(clause, '_for_update_arg', None) is not None:
+                # A write, a locking read or a raw connection: this request stays on the primary
+                self.info.pop('replica', None)
+            else:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_engines(db):
+    return [engine for key, engine in db.engines.items() if key and key.startswith(REPLICA_BIND_PREFIX)]
+
+
+def use_primary():
+    """Send the rest of this request's queries to the primary."""
+    from models import db
+    db.session.info.pop('replica', None)
+
+
+def _client_key():
+    return (request.access_route[0] if request.access_route else request.remote_addr,
+            request.headers.get('User-Agent', ''))
+
+
+def _wrote_recently():
+    now = time.time()
+    try:
+        if float(request.cookies.get(COOKIE_NAME, 0)) > now:
+            return True
+    except ValueError:
+        pass
+    return _recent_writers.get(_client_key(), 0) > now
+
+
+def _remember_writer(until):
+    with _writers_lock:
+        if len(_recent_writers) >= MAX_TRACKED_CLIENTS:
+            now = time.time()
+            for key in [k for k, v in _recent_writers.items() if v <= now]:
+                del _recent_writers[key]
+        _recent_writers[_client_key()] = until
+
+
+def init_app(app):
+    from models import db
+    blueprints = set(app.config['REPLICA_BLUEPRINTS'])
+    window = app.config['READ_YOUR_WRITES_SECONDS']
+
+    @app.before_request
+    def route_reads():
+        if request.method not in ('GET', 'HEAD') or request.blueprint not in blueprints:
+            return
+        engines = replica_engines(db)
+        if engines and not _wrote_recently():
+            db.session.info['replica'] = random.choice(engines)
+
+    @app.after_request
+    def mark_writer(response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400 and replica_engines(db):
+            until = time.time() + window
+            _remember_writer(until)
+            response.set_cookie(COOKIE_NAME, str(int(until) + 1), max_age=window, httponly=True, samesite='Lax')
+        return response
+
+
+@replicas_cli.command('sync')
+def sync_command():
+    """Copy the primary SQLite database into every SQLite replica."""
+    from models import db
+    primary = db.engine
+    if primary.dialect.name != 'sqlite':
+        raise click.ClickException('sync only copies SQLite files; use the server\'s replication for MySQL')
+    for engine in replica_engines(db):
+        if engine.dialect.name != 'sqlite':
+            continue
+        source, target = primary.raw_connection(), engine.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            source.close()
+            target.close()
+        click.echo('Synced {}'.format(engine.url.database))
+
+
+@replicas_cli.command('status')
+def status_command():
+    """List the configured replicas."""
+    from models import db
+    engines = replica_engines(db)
+    if not engines:
+        click.echo('No replicas configured; all queries use the primary')
+    for engine in engines:
+        click.echo(engine.url.render_as_string(hide_password=True))
+    click.echo('Routed blueprints: {}'.format(', '.join(current_app.config['REPLICA_BLUEPRINTS'])))
@@ -0,0 +1,273 @@
+"""Resumable uploads and content-addressed file storage.
+
+An upload is opened with its total size, then its bytes arrive in any number
+of chunks, each appended at the offset the server reports, so an interrupted
+upload resumes where it stopped. Chunks are copied from the request stream to
+a part file in small pieces and never held in memory whole. On completion the
+part file is hashed and moved to objects/<aa>/<sha256>; if that object already
+exists the part is discarded, so identical files are stored once. Rows refer
+to stored files as 'sha256:<hex>'.
+"""
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+import click
+from flask import abort, current_app, request, send_file
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from models import db, StoredFile, UploadSession
+
+try:
+    import fcntl
+except ImportError:  # Optional: without it only the conditional UPDATE guards concurrent chunks
+    fcntl = None
+
+uploads_cli = AppGroup('uploads', help='Manage uploaded files.')
+
+COPY_BUFFER_SIZE = 64 * 1024
+REF_PREFIX = 'sha256:'
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def upload_root():
+    return current_app.config.get('UPLOAD_FOLDER') or os.path.join(current_app.instance_path, 'uploads')
+
+
+def _part_path(upload_id):
+    return os.path.join(upload_root(), 'tmp', upload_id + '.part')
+
+
+def object_path(sha256):
+    return os.path.join(upload_root(), 'objects', sha256[:2], sha256)
+
+
+def file_ref(sha256):
+    return REF_PREFIX + sha256
+
+
+def parse_file_ref(value):
+    """Return the sha256 of a 'sha256:<hex>' reference, or None for other file paths."""
+    if value and value.startswith(REF_PREFIX):
+        return value[len(REF_PREFIX):]
+    return None
+
+
+def start_upload(filename, total_size, content_type=None):
+    if not isinstance(total_size, int) or total_size < 0:
+        raise UploadError('size must be a non-negative integer')
+    if total_size > current_app.config['MAX_UPLOAD_SIZE']:
+        raise UploadError('File is larger than {} bytes'.format(current_app.config['MAX_UPLOAD_SIZE']), 413)
+
+    upload = UploadSession(upload_id=uuid.uuid4().hex, filename=filename, content_type=content_type,
+                           total_size=total_size, received_bytes=0, status='Pending')
+    os.makedirs(os.path.dirname(_part_path(upload.upload_id)), exist_ok=True)
+    open(_part_path(upload.upload_id), 'wb').close()
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def _lock_part(part, upload, wait=False):
+    """Hold an exclusive lock on the open part file; without `wait`, fail at once if another request holds it."""
+    if fcntl is None:
+        return
+    if wait:
+        fcntl.flock(part.fileno(), fcntl.LOCK_EX)
+        return
+    try:
+        fcntl.flock(part.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise UploadError('Another chunk of this upload is being written', 409, upload.received_bytes)
+
+
+def write_chunk(upload, offset, stream):
+    """Append the bytes of `stream` at `offset`; returns the new offset.
+
+    Concurrent chunks for one upload would otherwise both pass the offset
+    check and interleave their bytes in the part file. The writer holds a lock
+    on the part file from the check until the offset is committed, and reads
+    the row again under it; the lock goes with the file when it is closed.
+    """
+    written = 0
+    with open(_part_path(upload.upload_id), 'r+b') as part:
+        _lock_part(part, upload)
+        # A locking read sees the latest commit even inside a REPEATABLE READ snapshot.
+        # Committing right away keeps the row lock off the transfer; the file lock covers it
+        db.session.refresh(upload, with_for_update=True)
+        status, received, total_size = upload.status, upload.received_bytes, upload.total_size
+        db.session.commit()
+        if status != 'Pending':
+            raise UploadError('Upload is already complete', 409)
+        if offset != received:
+            raise UploadError('Expected offset {}'.format(received), 409, received)
+
+        part.seek(offset)
+        while True:
+            block = stream.read(COPY_BUFFER_SIZE)
+            if not block:
+                break
+            written += len(block)
+            if offset + written > total_size:
+                raise UploadError('Chunk runs past the declared size of {} bytes'.format(total_size))
+            part.write(block)
+        part.truncate()
+        part.flush()
+
+        # Only advance from the offset checked above; covers writers without the file lock
+        moved = UploadSession.query.filter_by(upload_id=upload.upload_id, received_bytes=offset).update(
+            {UploadSession.received_bytes: offset + written}, synchronize_session=False
+        )
+        db.session.commit()
+    if not moved:
+        db.session.refresh(upload)
+        raise UploadError('Upload offset changed concurrently', 409, upload.received_bytes)
+    return offset + written
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_upload(upload):
+    """Hash the finished upload and move it into content-addressed storage.
+
+    Works under the same part file lock as write_chunk, on the row read again,
+    and commits before letting go. Of two concurrent completions the second
+    then finds the upload complete and returns the same stored file.
+    """
+    if upload.status == 'Complete':
+        return db.session.get(StoredFile, upload.sha256)
+
+    part = _part_path(upload.upload_id)
+    try:
+        lock = open(part, 'rb')
+    except FileNotFoundError:
+        # Already moved by another completion, which may not have committed yet
+        lock = None
+    try:
+        if lock is not None:
+            _lock_part(lock, upload, wait=True)
+        db.session.refresh(upload, with_for_update=True)
+        if upload.status == 'Complete':
+            return db.session.get(StoredFile, upload.sha256)
+        if lock is None:
+            raise UploadError('Upload is being completed', 409)
+        if upload.received_bytes != upload.total_size:
+            raise UploadError('Received {} of {} bytes'.format(upload.received_bytes, upload.total_size),
+                              409, upload.received_bytes)
+
+        sha256 = _hash_file(part)
+        target = object_path(sha256)
+        if os.path.exists(target):
+            os.remove(part)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(part, target)
+
+        stored = _stored_file_row(sha256, upload.total_size, upload.content_type)
+        upload.sha256 = sha256
+        upload.status = 'Complete'
+        db.session.commit()
+        return stored
+    finally:
+        if lock is not None:
+            lock.close()
+
+
+def _stored_file_row(sha256, size, content_type):
+    stored = db.session.get(StoredFile, sha256)
+    if stored is None:
+        try:
+            with db.session.begin_nested():
+                stored = StoredFile(sha256=sha256, size=size, content_type=content_type)
+                db.session.add(stored)
+        except IntegrityError:
+            # The same content was stored by another request
+            stored = db.session.get(StoredFile, sha256)
+    return stored
+
+
+def store_bytes(data, content_type):
+    """Store generated content and return its 'sha256:<hex>' reference.
+
+    The StoredFile row joins the caller's transaction; the object file is
+    written at once, and is simply reused if the transaction is retried.
+    """
+    sha256 = hashlib.sha256(data).hexdigest()
+    target = object_path(sha256)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = '{}.{}.tmp'.format(target, uuid.uuid4().hex)
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, target)
+    _stored_file_row(sha256, len(data), content_type)
+    return file_ref(sha256)
+
+
+def send_stored_file(ref):
+    """Serve a 'sha256:<hex>' reference without reading the file into Python.
+
+    The content hash is a strong ETag. By default werkzeug answers Range and
+    If-None-Match itself and hands the open file to the server's
+    wsgi.file_wrapper (sendfile), or sends X-Sendfile when USE_X_SENDFILE is
+    on. With FILE_ACCEL_REDIRECT_PREFIX set, nginx is told via X-Accel-Redirect
+    to serve objects/<aa>/<sha256> from that internal location instead.
+    """
+    sha256 = parse_file_ref(ref)
+    stored = db.session.get(StoredFile, sha256) if sha256 else None
+    if stored is None:
+        abort(404)
+    mimetype = stored.content_type or 'application/octet-stream'
+
+    prefix = current_app.config.get('FILE_ACCEL_REDIRECT_PREFIX')
+    if prefix:
+        if sha256 in request.if_none_match:
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.response_class(mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = '{}/objects/{}/{}'.format(prefix.rstrip('/'), sha256[:2], sha256)
+        response.set_etag(sha256)
+        return response
+
+    return send_file(object_path(sha256), mimetype=mimetype, conditional=True, etag=sha256)
+
+
+def resolve_file_path(data):
+    """Return the file_path to record for a create/submit payload.
+
+    A completed `upload_id` becomes its 'sha256:<hex>' reference; otherwise the
+    client-supplied `file_path` is kept as before.
+    """
+    upload_id = data.get('upload_id')
+    if not upload_id:
+        return data.get('file_path')
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None or upload.status != 'Complete':
+        raise UploadError('Upload {} is not complete'.format(upload_id))
+    return file_ref(upload.sha256)
+
+
+@uploads_cli.command('cleanup')
+@click.option('--older-than-hours', default=24, show_default=True)
+def cleanup_command(older_than_hours):
+    """Remove unfinished uploads that have not completed in time."""
+    cutoff = datetime.utcnow() - timedelta(hours=older_than_hours)
+    stale = UploadSession.query.filter(UploadSession.status == 'Pending', UploadSession.created_at < cutoff).all()
+    for upload in stale:
+        if os.path.exists(_part_path(upload.upload_id)):
+            os.remove(_part_path(upload.upload_id))
+        db.session.delete(upload)
+    db.session.commit()
+    click.echo('Removed {} unfinished uploads'.format(len(stale)))
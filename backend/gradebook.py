@@ -0,0 +1,205 @@
+"""Course gradebook export.
+
+One row per student and one column per quiz question and assignment of the
+course. Students are read in keyset chunks; for each chunk the quiz results
+and assignment marks come from one query each, so memory stays bounded by the
+chunk size however many students the course has. Rows are streamed as CSV or
+as an XLSX workbook written straight into the response.
+"""
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+from sqlalchemy import union
+from models import db, Student, StudyMaterial, MCQ, Assignment, Result, AssignmentSubmission, AssignmentEvaluation
+
+CHUNK_SIZE = 500
+FORMATS = ('csv', 'xlsx')
+
+
+class _Buffer:
+    """Write-only sink the csv and zip writers fill and the generators drain."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(p.encode('utf-8') if isinstance(p, str) else p for p in self.parts)
+        self.parts = []
+        return data
+
+
+def _course_items(course_id):
+    """Return the quiz and assignment columns of a course, in lesson order."""
+    mcqs = db.session.query(MCQ.mcq_id, StudyMaterial.title).join(
+        StudyMaterial, StudyMaterial.material_id == MCQ.material_id
+    ).filter(StudyMaterial.course_id == course_id).order_by(StudyMaterial.order_index, MCQ.mcq_id).all()
+    assignments = db.session.query(Assignment.assignment_id, Assignment.title).join(
+        StudyMaterial, StudyMaterial.material_id == Assignment.material_id
+    ).filter(StudyMaterial.course_id == course_id).order_by(StudyMaterial.order_index, Assignment.assignment_id).all()
+    return mcqs, assignments
+
+
+def _course_student_ids(course_id):
+    """Students enrolled in the course or with any quiz or assignment activity in it."""
+    enrolled = db.select(Student.student_id).where(Student.course_id == course_id)
+    answered = db.select(Result.student_id).join(MCQ, MCQ.mcq_id == Result.mcq_id).join(
+        StudyMaterial, StudyMaterial.material_id == MCQ.material_id
+    ).where(StudyMaterial.course_id == course_id)
+    submitted = db.select(AssignmentSubmission.student_id).join(
+        Assignment, Assignment.assignment_id == AssignmentSubmission.assignment_id
+    ).join(StudyMaterial, StudyMaterial.material_id == Assignment.material_id).where(StudyMaterial.course_id == course_id)
+    return union(enrolled, answered, submitted).subquery()
+
+
+def _student_chunks(course_id):
+    student_ids = _course_student_ids(course_id)
+    last_id = 0
+    while True:
+        students = db.session.query(Student.student_id, Student.name, Student.email).filter(
+            Student.student_id.in_(db.select(student_ids.c.student_id)),
+            Student.student_id > last_id
+        ).order_by(Student.student_id).limit(CHUNK_SIZE).all()
+        if not students:
+            return
+        yield students
+        last_id = students[-1].student_id
+
+
+def gradebook_rows(course_id):
+    """Yield the header row, then one row per student."""
+    mcqs, assignments = _course_items(course_id)
+    mcq_ids = [m.mcq_id for m in mcqs]
+    assignment_ids = [a.assignment_id for a in assignments]
+
+    yield (['student_id', 'name', 'email']
+           + ['Quiz: {} #{}'.format(m.title, m.mcq_id) for m in mcqs]
+           + ['Assignment: {}'.format(a.title) for a in assignments]
+           + ['quizzes_passed', 'quiz_total', 'assignment_average'])
+
+    for students in _student_chunks(course_id):
+        ids = [s.student_id for s in students]
+
+        quiz = {}
+        if mcq_ids:
+            for student_id, mcq_id, status in db.session.query(Result.student_id, Result.mcq_id, Result.status).filter(
+                Result.student_id.in_(ids), Result.mcq_id.in_(mcq_ids)
+            ):
+                quiz[(student_id, mcq_id)] = status
+
+        # Latest submission per student and assignment wins
+        marks = {}
+        if assignment_ids:
+            for student_id, assignment_id, evaluation_id, mark in db.session.query(
+                AssignmentSubmission.student_id, AssignmentSubmission.assignment_id,
+                AssignmentEvaluation.evaluation_id, AssignmentEvaluation.marks
+            ).outerjoin(
+                AssignmentEvaluation, AssignmentEvaluation.submission_id == AssignmentSubmission.submission_id
+            ).filter(
+                AssignmentSubmission.student_id.in_(ids), AssignmentSubmission.assignment_id.in_(assignment_ids)
+            ).order_by(AssignmentSubmission.submission_id):
+                marks[(student_id, assignment_id)] = float(mark) if mark is not None else (
+                    'pending' if evaluation_id is None else None)
+
+        for s in students:
+            quiz_cells = [quiz.get((s.student_id, mcq_id)) for mcq_id in mcq_ids]
+            mark_cells = [marks.get((s.student_id, assignment_id)) for assignment_id in assignment_ids]
+            scored = [m for m in mark_cells if isinstance(m, float)]
+            yield ([s.student_id, s.name, s.email] + quiz_cells + mark_cells + [
+                sum(1 for q in quiz_cells if q == 'Pass'),
+                len(mcq_ids),
+                round(sum(scored) / len(scored), 2) if scored else None
+            ])
+
+
+def stream_csv(rows):
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if cell is None else cell for cell in row])
+        yield buffer.drain()
+
+
+def _column_name(index):
+    name = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        name = chr(65 + rem) + name
+    return name
+
+
+def _xlsx_row(number, row):
+    cells = []
+    for i, value in enumerate(row):
+        if value is None:
+            continue
+        ref = '{}{}'.format(_column_name(i), number)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append('<c r="{}"><v>{}</v></c>'.format(ref, value))
+        else:
+            cells.append('<c r="{}" t="inlineStr"><is><t>{}</t></is></c>'.format(ref, escape(str(value))))
+    return '<row r="{}">{}</row>'.format(number, ''.join(cells))
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Gradebook" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def stream_xlsx(rows):
+    """Write a single-sheet workbook, yielding compressed bytes as rows are added.
+
+    The zip is written to a non-seekable buffer, so zipfile uses data
+    descriptors and nothing but the current row is held in memory.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        yield buffer.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            for number, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(number, row).encode('utf-8'))
+                yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
@@ -0,0 +1,74 @@
+"""Production server settings for gunicorn, read from the WEB_* config.
+
+Run from the backend directory:
+
+    gunicorn -c gunicorn.conf.py
+
+Each of WEB_WORKERS processes serves requests on WEB_THREADS threads
+(gthread) and loads the app itself, so HUP restarts the workers on the code
+now on disk: deploy, then `kill -HUP <master pid>`. Once a worker has loaded
+the app, gc.freeze() moves what exists then out of the collector's way, so
+later collections only walk objects created by requests.
+
+WEB_PRELOAD=1 creates the app in the master before forking instead, sharing
+the imports, routing tables and configured mappers copy-on-write; pooled
+connections are closed first and each worker opens its own. The master then
+holds the code: HUP only restarts the workers on what it already loaded, and
+new code needs USR2 (a new master starts on the same socket), then WINCH
+and TERM to the old master once the new workers are up.
+
+A worker exits after WEB_MAX_REQUESTS requests, plus up to
+WEB_MAX_REQUESTS_JITTER so they do not all restart together; that caps how far
+a leak can grow. SIGTERM stops gracefully within WEB_GRACEFUL_TIMEOUT.
+
+The default worker count is one per available core: the GIL lets a process
+run Python on one core at a time, and the threads cover time spent waiting
+on the database or the network.
+"""
+import gc
+import os
+from config import Config
+
+
+def default_workers():
+    try:
+        cores = len(os.sched_getaffinity(0))  # Honours CPU sets in containers
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return max(2, cores)
+
+
+wsgi_app = 'app:create_app()'
+bind = [Config.WEB_BIND]
+workers = Config.WEB_WORKERS or default_workers()
+worker_class = 'gthread'
+threads = Config.WEB_THREADS
+max_requests = Config.WEB_MAX_REQUESTS
+max_requests_jitter = Config.WEB_MAX_REQUESTS_JITTER
+graceful_timeout = Config.WEB_GRACEFUL_TIMEOUT
+keepalive = Config.WEB_KEEPALIVE
+preload_app = Config.WEB_PRELOAD
+backlog = 2048
+
+
+def when_ready(server):
+    # Runs in the master after preloading and before the first fork
+    if server.cfg.preload_app:
+        from models import db
+        app = server.app.wsgi()
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        # Objects that exist now are never collected, so the collector does not dirty the shared pages
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    # Runs in each worker once it has loaded the app; with preloading the master froze the shared objects already
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # Let the in-process job worker finish its running jobs
+    from jobs import stop_worker
+    stop_worker()
@@ -0,0 +1,241 @@
+"""Database-backed background jobs.
+
+Jobs are rows in the job table, enqueued in the same transaction as the write
+that needs them, so a job exists exactly when its data was committed. A worker
+thread per process polls for due jobs, claims each with a conditional UPDATE
+(so several processes can share one table), and runs the handlers in a thread
+pool. A failed job is retried with exponential backoff until max_attempts; a
+job left Running by a crashed worker is requeued after RUNNING_TIMEOUT, and
+should the original run finish after all, its outcome and the writes it left
+uncommitted are dropped.
+Nothing beyond the application database is needed, SQLite included.
+
+Handlers are registered with @job_handler('kind') and receive the decoded
+payload inside an application context; they should be idempotent.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from models import db, Job
+
+log = logging.getLogger(__name__)
+
+jobs_cli = AppGroup('jobs', help='Run and inspect background jobs.')
+
+RUNNING_TIMEOUT = timedelta(minutes=10)
+
+_handlers = {}
+
+
+def job_handler(kind):
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload, idempotency_key=None, max_attempts=3, delay=0):
+    """Add a job to the current session; it runs once the caller commits.
+
+    With an idempotency key, enqueueing the same key again returns the
+    existing job instead of creating another.
+    """
+    if idempotency_key:
+        existing = Job.query.filter_by(idempotency_key=idempotency_key).first()
+        if existing:
+            return existing
+
+    job = Job(kind=kind, payload=json.dumps(payload), idempotency_key=idempotency_key,
+              max_attempts=max_attempts, run_after=datetime.utcnow() + timedelta(seconds=delay))
+    try:
+        with db.session.begin_nested():
+            db.session.add(job)
+    except IntegrityError:
+        # Enqueued concurrently under the same key
+        return Job.query.filter_by(idempotency_key=idempotency_key).first()
+    return job
+
+
+def retry(job):
+    """Queue a Failed job again with a fresh set of attempts; the caller commits."""
+    job.status = 'Queued'
+    job.attempts = 0
+    job.run_after = datetime.utcnow()
+    job.finished_at = None
+
+
+def _claim(job_id, now):
+    claimed = Job.query.filter_by(job_id=job_id, status='Queued').update({
+        Job.status: 'Running',
+        Job.attempts: Job.attempts + 1,
+        Job.locked_at: now
+    }, synchronize_session=False)
+    db.session.commit()
+    return bool(claimed)
+
+
+def _requeue_stale(now):
+    Job.query.filter(Job.status == 'Running', Job.locked_at < now - RUNNING_TIMEOUT).update(
+        {Job.status: 'Queued'}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def claim_due_jobs(limit):
+    """Claim up to `limit` due jobs for this worker; returns their ids."""
+    now = datetime.utcnow()
+    _requeue_stale(now)
+    due = db.session.query(Job.job_id).filter(Job.status == 'Queued', Job.run_after <= now).order_by(
+        Job.job_id).limit(limit).all()
+    return [job_id for (job_id,) in due if _claim(job_id, now)]
+
+
+def _record(job_id, attempts, outcome):
+    """Write a run's outcome if the job is still Running under the claim that started the run.
+
+    A run that outlived RUNNING_TIMEOUT may have been requeued and claimed
+    again meanwhile; its outcome is then stale and nothing is written.
+    """
+    return bool(Job.query.filter_by(job_id=job_id, status='Running', attempts=attempts).update(
+        outcome, synchronize_session=False
+    ))
+
+
+def run_job(job_id):
+    """Run one claimed job and record the outcome. Needs an app context."""
+    job = db.session.get(Job, job_id)
+    kind, attempts, max_attempts = job.kind, job.attempts, job.max_attempts
+    handler = _handlers.get(kind)
+    try:
+        if handler is None:
+            raise LookupError('No handler registered for job kind {!r}'.format(kind))
+        handler(json.loads(job.payload))
+        # Committed with the handler's writes, so a stale run leaves neither behind
+        owned = _record(job_id, attempts, {
+            Job.status: 'Done', Job.last_error: None, Job.finished_at: datetime.utcnow()
+        })
+    except Exception as e:
+        db.session.rollback()
+        outcome = {Job.last_error: '{}: {}'.format(type(e).__name__, e)}
+        if attempts < max_attempts:
+            outcome.update({Job.status: 'Queued', Job.run_after: datetime.utcnow() + timedelta(seconds=2 ** attempts)})
+        else:
+            outcome.update({Job.status: 'Failed', Job.finished_at: datetime.utcnow()})
+        owned = _record(job_id, attempts, outcome)
+        if owned:
+            log.exception('Job %s (%s) failed on attempt %s', job_id, kind, attempts)
+    if owned:
+        db.session.commit()
+    else:
+        db.session.rollback()
+        log.warning('Job %s (%s) was claimed again while attempt %s ran; its outcome is dropped',
+                    job_id, kind, attempts)
+
+
+class JobWorker:
+    """Polls the job table and runs due jobs on a thread pool."""
+
+    def __init__(self, app, threads=2, poll_interval=1.0):
+        self.app = app
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='job')
+        self._stop = threading.Event()
+        self._idle = threading.Semaphore(threads)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='job-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._pool.shutdown(wait=True)
+
+    def _execute(self, job_id):
+        try:
+            with self.app.app_context():
+                run_job(job_id)
+        finally:
+            self._idle.release()
+
+    def poll_once(self):
+        """Claim and submit as many due jobs as there are idle threads; returns how many."""
+        free = 0
+        while self._idle.acquire(blocking=False):
+            free += 1
+        if not free:
+            return 0
+        try:
+            with self.app.app_context():
+                job_ids = claim_due_jobs(free)
+        except Exception:
+            log.exception('Job poll failed')
+            job_ids = []
+        for _ in range(free - len(job_ids)):
+            self._idle.release()
+        for job_id in job_ids:
+            self._pool.submit(self._execute, job_id)
+        return len(job_ids)
+
+    def run(self):
+        while not self._stop.is_set():
+            if not self.poll_once():
+                self._stop.wait(self.poll_interval)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def ensure_worker(app):
+    """Start this process's in-process worker once; called lazily so it runs after a fork."""
+    global _worker
+    if _worker is not None or app.config['JOB_WORKER_THREADS'] <= 0:
+        return
+    with _worker_lock:
+        if _worker is None:
+            _worker = JobWorker(app, app.config['JOB_WORKER_THREADS'], app.config['JOB_POLL_INTERVAL'])
+            _worker.start()
+
+
+def stop_worker():
+    """Let this process's worker finish its running jobs and stop; used when a gunicorn worker exits."""
+    global _worker
+    with _worker_lock:
+        if _worker is not None:
+            _worker.stop()
+            _worker = None
+
+
+@jobs_cli.command('worker')
+@click.option('--threads', default=4, show_default=True)
+@click.option('--poll-interval', default=1.0, show_default=True)
+def worker_command(threads, poll_interval):
+    """Run a dedicated job worker in the foreground."""
+    from flask import current_app
+    worker = JobWorker(current_app._get_current_object(), threads, poll_interval)
+    click.echo('Job worker running with {} threads'.format(threads))
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+@jobs_cli.command('run-pending')
+def run_pending_command():
+    """Run every due job once, synchronously, then exit."""
+    count = 0
+    while True:
+        job_ids = claim_due_jobs(10)
+        if not job_ids:
+            break
+        for job_id in job_ids:
+            run_job(job_id)
+            count += 1
+    click.echo('Ran {} jobs'.format(count))
@@ -0,0 +1,174 @@
+"""Per-request SQL and latency metrics.
+
+Engine events count every statement run while a request is active and time
+it; when the request ends its latency, statement count and SQL time are
+added to histograms labelled by blueprint and endpoint, which
+/api/admin/metrics renders in the Prometheus text format. Streamed responses
+are measured when the stream finishes. A request that runs more than
+SQL_QUERY_BUDGET statements is logged with its most repeated statements,
+which is usually enough to spot an N+1 loop.
+
+Other modules add their own series with register(), which render() calls
+after the request metrics.
+
+The histograms live in the process; with several workers each one reports
+its own and Prometheus sums them by instance.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+STATEMENTS_LOGGED = 5
+STATEMENTS_KEPT = 200  # Per request, for the over-budget log
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # labels -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self, label_names):
+        lines = ['# HELP {} {}'.format(self.name, self.help_text), '# TYPE {} histogram'.format(self.name)]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self.series.items())
+        for labels, series in items:
+            base = ','.join('{}="{}"'.format(k, _escape(v)) for k, v in zip(label_names, labels))
+            for bound, count in zip(self.buckets, series):
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(self.name, base, bound, count))
+            lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(self.name, base, series[-2]))
+            lines.append('{}_sum{{{}}} {}'.format(self.name, base, round(series[-1], 6)))
+            lines.append('{}_count{{{}}} {}'.format(self.name, base, series[-2]))
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+LABELS = ('blueprint', 'endpoint')
+request_latency = Histogram('lls_request_duration_seconds', 'Request latency, including streamed bodies.',
+                            LATENCY_BUCKETS)
+request_queries = Histogram('lls_request_sql_statements', 'SQL statements run per request.', COUNT_BUCKETS)
+request_sql_time = Histogram('lls_request_sql_seconds', 'Time spent in SQL per request.', LATENCY_BUCKETS)
+_over_budget = Counter()
+_status_counts = Counter()
+_counter_lock = threading.Lock()
+_collectors = []  # Callables returning more exposition lines; see register
+
+
+def register(collector):
+    """Add a callable returning Prometheus text lines to render(), for modules that keep their own stats."""
+    if collector not in _collectors:
+        _collectors.append(collector)
+    return collector
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql' in g:
+        context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None or not has_request_context() or 'sql' not in g:
+        return
+    elapsed = time.perf_counter() - started
+    sql = g.sql
+    sql['count'] += 1
+    sql['time'] += elapsed
+    if len(sql['statements']) < STATEMENTS_KEPT:
+        sql['statements'].append((statement, elapsed))
+
+
+def _record(sql, labels, method, path, status, budget):
+    latency = time.perf_counter() - sql['started']
+    request_latency.observe(labels, latency)
+    request_queries.observe(labels, sql['count'])
+    request_sql_time.observe(labels, sql['time'])
+    with _counter_lock:
+        _status_counts[labels + (str(status),)] += 1
+
+    if budget and sql['count'] > budget:
+        with _counter_lock:
+            _over_budget[labels] += 1
+        repeated = Counter(statement for statement, _ in sql['statements']).most_common(STATEMENTS_LOGGED)
+        log.warning(
+            '%s %s ran %d SQL statements (budget %d) in %.1f ms of %.1f ms:\n%s',
+            method, path, sql['count'], budget, sql['time'] * 1000, latency * 1000,
+            '\n'.join('  {}x {}'.format(n, ' '.join(statement.split())) for statement, n in repeated)
+        )
+
+
+def init_app(app):
+    budget = app.config['SQL_QUERY_BUDGET']
+
+    @app.before_request
+    def start_request_metrics():
+        g.sql = {'count': 0, 'time': 0.0, 'statements': [], 'started': time.perf_counter(), 'streamed': False}
+
+    @app.after_request
+    def record_streamed_response(response):
+        g.status = response.status_code
+        if 'sql' in g and response.is_streamed:
+            # The request context is torn down before the body is sent; record once the stream closes
+            g.sql['streamed'] = True
+            args = (g.sql, (request.blueprint or '', request.endpoint or 'unmatched'), request.method, request.path,
+                    response.status_code, budget)
+            response.call_on_close(lambda: _record(*args))
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(error=None):
+        sql = g.get('sql')
+        if sql is None or sql['streamed']:
+            return
+        g.pop('sql')
+        status = 500 if error is not None else g.get('status', 500)
+        _record(sql, (request.blueprint or '', request.endpoint or 'unmatched'), request.method, request.path,
+                status, budget)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for histogram in (request_latency, request_queries, request_sql_time):
+        lines.extend(histogram.render(LABELS))
+    with _counter_lock:
+        statuses = sorted(_status_counts.items())
+        over_budget = sorted(_over_budget.items())
+    lines += ['# HELP lls_requests_total Requests by endpoint and status.', '# TYPE lls_requests_total counter']
+    for (blueprint, endpoint, status), count in statuses:
+        lines.append('lls_requests_total{{blueprint="{}",endpoint="{}",status="{}"}} {}'.format(
+            _escape(blueprint), _escape(endpoint), status, count))
+    lines += ['# HELP lls_requests_over_query_budget_total Requests that ran more than SQL_QUERY_BUDGET statements.',
+              '# TYPE lls_requests_over_query_budget_total counter']
+    for (blueprint, endpoint), count in over_budget:
+        lines.append('lls_requests_over_query_budget_total{{blueprint="{}",endpoint="{}"}} {}'.format(
+            _escape(blueprint), _escape(endpoint), count))
+    for collector in list(_collectors):
+        lines.extend(collector())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,212 @@
+"""Versioned schema migrations.
+
+Each entry in MIGRATIONS runs once, in order, in its own transaction, and is
+recorded in the schema_version table. create_app calls upgrade() in place of
+db.create_all(), so an existing SQLite or MySQL database picks up new tables
+and indexes on its next start without being rebuilt. Every step must be safe
+to re-run, since several workers may start at the same time. With
+SCHEMA_STARTUP=check workers only compare versions; see startup.
+"""
+from datetime import datetime
+import click
+from flask.cli import AppGroup
+from sqlalchemy import insert, inspect, select, text
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from models import (db, Versioned, SchemaVersion, MaterialOrderSequence, StoredFile, UploadSession, Job, Certificate,
+                    CertificateSequence, CertificateBatch, OutboxMessage, SearchDocument, CatalogVersion)
+
+schema_cli = AppGroup('schema', help='Inspect and upgrade the database schema.')
+
+
+def _create_missing_tables(conn):
+    db.metadata.create_all(conn)
+
+
+def _create_missing_indexes(conn):
+    """Create every index declared on the models that the database lacks."""
+    inspector = inspect(conn)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue  # Created, with its indexes, by a later migration
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        columns = {c['name'] for c in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            # Indexes on columns a later migration adds are created by that migration
+            if index.name not in existing and all(c.name in columns for c in index.columns):
+                index.create(conn)
+
+
+def _dedupe_quiz_results(conn):
+    # Older quiz submits could race and store the same (student, mcq) twice;
+    # keep the newest row so the unique index can be built
+    conn.execute(text(
+        'DELETE FROM result WHERE mcq_id IS NOT NULL AND result_id NOT IN ('
+        ' SELECT keep_id FROM (SELECT MAX(result_id) AS keep_id FROM result'
+        ' WHERE mcq_id IS NOT NULL GROUP BY student_id, mcq_id) AS keep)'
+    ))
+    # Progress counters counted the duplicates; they are rebuilt on next read
+    conn.execute(text('DELETE FROM student_course_progress'))
+
+
+def _check_unique_evaluations(conn):
+    duplicates = conn.execute(text(
+        'SELECT submission_id FROM assignment_evaluation GROUP BY submission_id HAVING COUNT(*) > 1'
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            'Submissions with more than one evaluation must be merged before upgrading: {}'.format(duplicates)
+        )
+
+
+def _add_lookup_indexes(conn):
+    _dedupe_quiz_results(conn)
+    _check_unique_evaluations(conn)
+    _create_missing_indexes(conn)
+
+
+def _add_material_order_sequence(conn):
+    MaterialOrderSequence.__table__.create(conn, checkfirst=True)
+    conn.execute(text(
+        'INSERT INTO material_order_sequence (course_id, last_order_index)'
+        ' SELECT course_id, MAX(COALESCE(order_index, 0)) FROM study_material'
+        ' WHERE course_id NOT IN (SELECT course_id FROM material_order_sequence)'
+        ' GROUP BY course_id'
+    ))
+
+
+def _add_upload_tables(conn):
+    StoredFile.__table__.create(conn, checkfirst=True)
+    UploadSession.__table__.create(conn, checkfirst=True)
+
+
+def _add_job_table(conn):
+    Job.__table__.create(conn, checkfirst=True)
+
+
+def _add_missing_columns(conn, table, names):
+    existing = {c['name'] for c in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name not in existing:
+            column = table.c[name]
+            conn.execute(text('ALTER TABLE {} ADD COLUMN {} {}'.format(
+                table.name, name, column.type.compile(dialect=conn.dialect)
+            )))
+
+
+def _add_certificate_batches(conn):
+    _add_missing_columns(conn, Certificate.__table__, ('program_id', 'file_path'))
+    CertificateSequence.__table__.create(conn, checkfirst=True)
+    CertificateBatch.__table__.create(conn, checkfirst=True)
+    _create_missing_indexes(conn)
+
+
+def _add_outbox_table(conn):
+    OutboxMessage.__table__.create(conn, checkfirst=True)
+
+
+def _add_row_versions(conn):
+    now = datetime.utcnow()
+    for mapper in db.Model.registry.mappers:
+        if issubclass(mapper.class_, Versioned):
+            table = mapper.local_table
+            _add_missing_columns(conn, table, ('updated_at',))
+            # A NULL never moves MAX(updated_at), so an edit to an old row would keep the old ETag
+            conn.execute(table.update().where(table.c.updated_at.is_(None)).values(updated_at=now))
+    _create_missing_indexes(conn)
+
+
+def _add_search_index(conn):
+    import search
+    SearchDocument.__table__.create(conn, checkfirst=True)
+    search.install(conn)
+    search.rebuild(conn)
+
+
+def _seed_catalog_version(conn):
+    # bump_version only has to update this row, so concurrent first catalog writes never race to insert it.
+    # Starting above 0 invalidates anything cached while the row was missing
+    if conn.execute(select(CatalogVersion.id).where(CatalogVersion.id == 1)).first() is None:
+        conn.execute(insert(CatalogVersion).values(id=1, version=1))
+
+
+MIGRATIONS = [
+    (1, 'Create base tables', _create_missing_tables),
+    (2, 'Add lookup indexes and unique keys for hot paths', _add_lookup_indexes),
+    (3, 'Add per-course material order sequence', _add_material_order_sequence),
+    (4, 'Add resumable upload and stored file tables', _add_upload_tables),
+    (5, 'Add background job table', _add_job_table),
+    (6, 'Add certificate programs, PDFs and batch issuance', _add_certificate_batches),
+    (7, 'Add communication outbox', _add_outbox_table),
+    (8, 'Add updated_at row versions for conditional GETs', _add_row_versions),
+    (9, 'Add full-text search index', _add_search_index),
+    (10, 'Seed the catalog version row', _seed_catalog_version),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version():
+    if not inspect(db.engine).has_table(SchemaVersion.__tablename__):
+        return 0
+    return db.session.query(db.func.max(SchemaVersion.version)).scalar() or 0
+
+
+def stored_version():
+    """The recorded schema version in one SELECT, without inspecting the database; 0 if never migrated."""
+    version_table = SchemaVersion.__table__
+    try:
+        with db.engine.connect() as conn:
+            return conn.execute(select(db.func.max(version_table.c.version))).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        return 0  # No schema_version table yet
+
+
+def upgrade():
+    """Apply pending migrations. Returns the list of versions applied."""
+    if stored_version() >= LATEST_VERSION:
+        return []
+    version_table = SchemaVersion.__table__
+    # On SQLite each step holds the write lock from its version check on, so workers starting
+    # together wait their turn and then find the step recorded
+    engine = db.engine.execution_options(sqlite_immediate=True)
+    with engine.begin() as conn:
+        version_table.create(conn, checkfirst=True)
+
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        try:
+            with engine.begin() as conn:
+                done = conn.execute(
+                    select(version_table.c.version).where(version_table.c.version == version)
+                ).first()
+                if done:
+                    continue
+                migrate(conn)
+                conn.execute(version_table.insert().values(
+                    version=version, description=description, applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Another worker recorded this version first
+            continue
+        applied.append(version)
+    return applied
+
+
+@schema_cli.command('upgrade')
+def upgrade_command():
+    """Apply pending schema migrations."""
+    applied = upgrade()
+    if applied:
+        click.echo('Applied migrations: {}'.format(', '.join(str(v) for v in applied)))
+    else:
+        click.echo('Schema is up to date (version {})'.format(current_version()))
+
+
+@schema_cli.command('status')
+def status_command():
+    """Show the applied schema version and any pending migrations."""
+    version = current_version()
+    click.echo('Current version: {}'.format(version))
+    for number, description, _ in MIGRATIONS:
+        if number > version:
+            click.echo('Pending: {} {}'.format(number, description))
@@ -1,9 +1,19 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy.dialects import mysql
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+# The routing session sends reads of routed GET requests to a replica when one is configured
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
-class AcademicYear(db.Model):
+# MySQL's DATETIME keeps whole seconds unless asked for more; two edits in one second must still differ
+ROW_VERSION_TYPE = db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql')
+
+class Versioned:
+    # Set on insert and on every ORM or bulk UPDATE; the read endpoints' ETags come from it (see conditional)
+    updated_at = db.Column(ROW_VERSION_TYPE, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AcademicYear(Versioned, db.Model):
     __tablename__ = 'academic_year'
     academic_year_id = db.Column(db.Integer, primary_key=True)
     year = db.Column(db.String(20), nullable=False)
@@ -11,40 +21,43 @@ class AcademicYear(db.Model):
     end_date = db.Column(db.Date, nullable=False)
     status = db.Column(db.Enum('Active', 'Inactive', name='academic_status'), default='Active')
 
-class Program(db.Model):
+class Program(Versioned, db.Model):
     __tablename__ = 'program'
     program_id = db.Column(db.Integer, primary_key=True)
     program_name = db.Column(db.String(100), nullable=False)  # e.g., BCA, BCom
     description = db.Column(db.Text)
     duration_months = db.Column(db.Integer)
     semester = db.Column(db.Integer, nullable=False, default=1)  # Which semester this program is (1, 2, 3, etc.)
-    academic_year_id = db.Column(db.Integer, db.ForeignKey('academic_year.academic_year_id'), nullable=True)
+    academic_year_id = db.Column(db.Integer, db.ForeignKey('academic_year.academic_year_id'), nullable=True, index=True)
     status = db.Column(db.Enum('Active', 'Inactive', name='program_status'), default='Active')
     academic_year = db.relationship('AcademicYear', backref='programs', lazy=True)
     program_courses = db.relationship('ProgramCourse', backref='program', lazy=True)
 
-class Course(db.Model):
+class Course(Versioned, db.Model):
     __tablename__ = 'course'
     course_id = db.Column(db.Integer, primary_key=True)
     course_name = db.Column(db.String(100), nullable=False)  # e.g., German A1, French B1
     description = db.Column(db.Text)
     credits = db.Column(db.Integer)
-    staff_id = db.Column(db.Integer, db.ForeignKey('staff.staff_id'), nullable=True)  # Teacher/Tutor for this course
+    staff_id = db.Column(db.Integer, db.ForeignKey('staff.staff_id'), nullable=True, index=True)  # Teacher/Tutor for this course
     status = db.Column(db.Enum('Active', 'Inactive', name='course_status'), default='Active')
     teacher = db.relationship('Staff', backref='courses_taught', lazy=True)
     materials = db.relationship('StudyMaterial', backref='course', lazy=True)
     # Course can be linked to multiple programs via ProgramCourse table
 
-class ProgramCourse(db.Model):
+class ProgramCourse(Versioned, db.Model):
     __tablename__ = 'program_course'
     program_course_id = db.Column(db.Integer, primary_key=True)
-    program_id = db.Column(db.Integer, db.ForeignKey('program.program_id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.course_id'), nullable=False)
+    program_id = db.Column(db.Integer, db.ForeignKey('program.program_id'), nullable=False, index=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.course_id'), nullable=False, index=True)
     semester = db.Column(db.Integer, nullable=False)
     course = db.relationship('Course', backref='program_courses')
 
-class Staff(db.Model):
+class Staff(Versioned, db.Model):
     __tablename__ = 'staff'
+    __table_args__ = (
+        db.Index('ix_staff_updated_at', 'updated_at'),
+    )
     staff_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
@@ -55,8 +68,14 @@ class Staff(db.Model):
     uploaded_materials = db.relationship('StudyMaterial', backref='uploader', lazy=True)
     evaluations = db.relationship('AssignmentEvaluation', backref='evaluator', lazy=True)
 
-class StudyMaterial(db.Model):
+class StudyMaterial(Versioned, db.Model):
     __tablename__ = 'study_material'
+    __table_args__ = (
+        # Course material listings filter by course and order by position
+        db.Index('ix_study_material_course_order', 'course_id', 'order_index'),
+        # Freshness of a course's material list in one index range
+        db.Index('ix_study_material_course_updated', 'course_id', 'updated_at'),
+    )
     material_id = db.Column(db.Integer, primary_key=True)
     course_id = db.Column(db.Integer, db.ForeignKey('course.course_id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -71,19 +90,19 @@ class StudyMaterial(db.Model):
     assignments = db.relationship('Assignment', backref='material', lazy=True)
     mcqs = db.relationship('MCQ', backref='material', lazy=True)
 
-class Assignment(db.Model):
+class Assignment(Versioned, db.Model):
     __tablename__ = 'assignment'
     assignment_id = db.Column(db.Integer, primary_key=True)
-    material_id = db.Column(db.Integer, db.ForeignKey('study_material.material_id'), nullable=False)
+    material_id = db.Column(db.Integer, db.ForeignKey('study_material.material_id'), nullable=False, index=True)
     title = db.Column(db.String(200), nullable=False)
     instructions = db.Column(db.Text)
     due_date = db.Column(db.Date)
     submissions = db.relationship('AssignmentSubmission', backref='assignment', lazy=True)
 
-class MCQ(db.Model):
+class MCQ(Versioned, db.Model):
     __tablename__ = 'mcq'
     mcq_id = db.Column(db.Integer, primary_key=True)
-    material_id = db.Column(db.Integer, db.ForeignKey('study_material.material_id'), nullable=False)
+    material_id = db.Column(db.Integer, db.ForeignKey('study_material.material_id'), nullable=False, index=True)
     question = db.Column(db.Text, nullable=False)
     option_a = db.Column(db.String(200))
     option_b = db.Column(db.String(200))
@@ -92,8 +111,12 @@ class MCQ(db.Model):
     correct_option = db.Column(db.String(1)) # 'A', 'B', 'C', or 'D'
     results = db.relationship('Result', backref='mcq', lazy=True)
 
-class Student(db.Model):
+class Student(Versioned, db.Model):
     __tablename__ = 'student'
+    __table_args__ = (
+        db.Index('ix_student_updated_at', 'updated_at'),
+        db.Index('ix_student_course_updated', 'course_id', 'updated_at'),
+    )
     student_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
@@ -103,7 +126,7 @@ class Student(db.Model):
     parent_name = db.Column(db.String(100))
     parent_contact = db.Column(db.String(20))
     parent_email = db.Column(db.String(100))
-    course_id = db.Column(db.Integer, db.ForeignKey('course.course_id'), nullable=True)  # Student enrolls in a course
+    course_id = db.Column(db.Integer, db.ForeignKey('course.course_id'), nullable=True, index=True)  # Student enrolls in a course
     program_id = db.Column(db.Integer, db.ForeignKey('program.program_id'), nullable=True)  # Keep for backward compatibility
     course = db.relationship('Course', backref='enrolled_students', lazy=True)
     program = db.relationship('Program', backref='students', lazy=True)
@@ -122,19 +145,26 @@ class Payment(db.Model):
     method = db.Column(db.Enum('Card', 'Bank Transfer', 'Cash', name='payment_method'))
     status = db.Column(db.Enum('Pending', 'Completed', 'Failed', name='payment_status'), default='Pending')
 
-class AssignmentSubmission(db.Model):
+class AssignmentSubmission(Versioned, db.Model):
     __tablename__ = 'assignment_submission'
+    __table_args__ = (
+        db.Index('ix_assignment_submission_assignment_student', 'assignment_id', 'student_id'),
+    )
     submission_id = db.Column(db.Integer, primary_key=True)
     assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.assignment_id'), nullable=False)
-    student_id = db.Column(db.Integer, db.ForeignKey('student.student_id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.student_id'), nullable=False, index=True)
     file_path = db.Column(db.String(255))
     submitted_date = db.Column(db.Date, default=datetime.utcnow)
     assignment_text = db.Column(db.Text) # Renamed from 'assignemnt' in doc to be clearer
     evaluations = db.relationship('AssignmentEvaluation', backref='submission', lazy=True)
     communications = db.relationship('Communication', backref='submission', lazy=True)
 
-class AssignmentEvaluation(db.Model):
+class AssignmentEvaluation(Versioned, db.Model):
     __tablename__ = 'assignment_evaluation'
+    __table_args__ = (
+        # A submission is evaluated once; re-evaluating updates the row
+        db.Index('uq_assignment_evaluation_submission', 'submission_id', unique=True),
+    )
     evaluation_id = db.Column(db.Integer, primary_key=True)
     submission_id = db.Column(db.Integer, db.ForeignKey('assignment_submission.submission_id'), nullable=False)
     marks = db.Column(db.Numeric(5, 2))
@@ -142,8 +172,12 @@ class AssignmentEvaluation(db.Model):
     evaluated_by = db.Column(db.Integer, db.ForeignKey('staff.staff_id'))
     results = db.relationship('Result', backref='evaluation', lazy=True)
 
-class Result(db.Model):
+class Result(Versioned, db.Model):
     __tablename__ = 'result'
+    __table_args__ = (
+        # One quiz result per student and question; evaluation results have mcq_id NULL
+        db.Index('uq_result_student_mcq', 'student_id', 'mcq_id', unique=True),
+    )
     result_id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student.student_id'), nullable=False)
     evaluation_id = db.Column(db.Integer, db.ForeignKey('assignment_evaluation.evaluation_id'), nullable=True)
@@ -153,6 +187,77 @@ class Result(db.Model):
     communications = db.relationship('Communication', backref='result', lazy=True)
     certificates = db.relationship('Certificate', backref='result', lazy=True)
 
+class CourseContentCounter(Versioned, db.Model):
+    __tablename__ = 'course_content_counter'
+    # Maintained incrementally by progress_counters; rebuilt with `flask progress rebuild`
+    course_id = db.Column(db.Integer, db.ForeignKey('course.course_id'), primary_key=True)
+    mcq_count = db.Column(db.Integer, nullable=False, default=0)
+    assignment_count = db.Column(db.Integer, nullable=False, default=0)
+
+class StudentCourseProgress(Versioned, db.Model):
+    __tablename__ = 'student_course_progress'
+    student_id = db.Column(db.Integer, db.ForeignKey('student.student_id'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.course_id'), primary_key=True)
+    completed_quizzes = db.Column(db.Integer, nullable=False, default=0)
+    submitted_assignments = db.Column(db.Integer, nullable=False, default=0)
+
+class SchemaVersion(db.Model):
+    __tablename__ = 'schema_version'
+    # One row per migration applied by migrations.upgrade()
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class MaterialOrderSequence(db.Model):
+    __tablename__ = 'material_order_sequence'
+    # Last order_index handed out per course; material uploads reserve blocks from it
+    course_id = db.Column(db.Integer, db.ForeignKey('course.course_id'), primary_key=True)
+    last_order_index = db.Column(db.Integer, nullable=False, default=0)
+
+class StoredFile(db.Model):
+    __tablename__ = 'stored_file'
+    # Content-addressed blob under UPLOAD_FOLDER/objects; referenced as 'sha256:<hex>' in file_path columns
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UploadSession(db.Model):
+    __tablename__ = 'upload_session'
+    upload_id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(255))
+    content_type = db.Column(db.String(100))
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    sha256 = db.Column(db.String(64), db.ForeignKey('stored_file.sha256'), nullable=True)  # Set once complete
+    status = db.Column(db.Enum('Pending', 'Complete', name='upload_status'), default='Pending')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Job(Versioned, db.Model):
+    __tablename__ = 'job'
+    __table_args__ = (
+        # Workers poll for due queued jobs
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+    job_id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    idempotency_key = db.Column(db.String(100), unique=True, nullable=True)
+    status = db.Column(db.Enum('Queued', 'Running', 'Done', 'Failed', name='job_status'), default='Queued', nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    last_error = db.Column(db.Text)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+class CatalogVersion(db.Model):
+    __tablename__ = 'catalog_version'
+    # Single row, bumped by every catalog write so each worker's catalog_cache can tell it is stale
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 class Communication(db.Model):
     __tablename__ = 'communication'
     communication_id = db.Column(db.Integer, primary_key=True)
@@ -161,15 +266,61 @@ class Communication(db.Model):
     message = db.Column(db.Text, nullable=False)
     sent_date = db.Column(db.DateTime, default=datetime.utcnow)
 
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox_message'
+    __table_args__ = (
+        # The dispatcher drains due pending messages in id order
+        db.Index('ix_outbox_message_status_run_after', 'status', 'run_after'),
+    )
+    message_id = db.Column(db.Integer, primary_key=True)
+    communication_id = db.Column(db.Integer, db.ForeignKey('communication.communication_id'), nullable=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.student_id'), nullable=True)
+    recipient = db.Column(db.String(100), nullable=False)  # Student or parent email
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.Enum('Pending', 'Sending', 'Sent', 'Failed', name='outbox_status'), default='Pending', nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    claimed_by = db.Column(db.String(32))  # Dispatcher run that is delivering it
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
 class Certificate(db.Model):
     __tablename__ = 'certificate'
+    __table_args__ = (
+        # One certificate per student and program; manual certificates have program_id NULL
+        db.Index('uq_certificate_student_program', 'student_id', 'program_id', unique=True),
+    )
     certificate_id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student.student_id'), nullable=False)
     result_id = db.Column(db.Integer, db.ForeignKey('result.result_id'), nullable=True)
+    program_id = db.Column(db.Integer, db.ForeignKey('program.program_id'), nullable=True)
     issue_date = db.Column(db.Date, default=datetime.utcnow)
     certificate_number = db.Column(db.String(50), unique=True)
+    file_path = db.Column(db.String(255))  # 'sha256:<hex>' of the rendered PDF
     status = db.Column(db.Enum('Issued', 'Pending', 'Revoked', name='certificate_status'), default='Pending')
 
+class CertificateSequence(db.Model):
+    __tablename__ = 'certificate_sequence'
+    # Single row; certificate numbers are reserved from it in blocks
+    id = db.Column(db.Integer, primary_key=True)
+    last_number = db.Column(db.Integer, nullable=False, default=0)
+
+class CertificateBatch(Versioned, db.Model):
+    __tablename__ = 'certificate_batch'
+    batch_id = db.Column(db.Integer, primary_key=True)
+    program_id = db.Column(db.Integer, db.ForeignKey('program.program_id'), nullable=False)
+    status = db.Column(db.Enum('Running', 'Done', name='certificate_batch_status'), default='Running', nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    issued = db.Column(db.Integer, nullable=False, default=0)
+    last_student_id = db.Column(db.Integer, nullable=False, default=0)  # Students are issued in id order
+    next_number = db.Column(db.Integer, nullable=False, default=1)  # Unused part of the reserved number block
+    reserved_until = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
 class Feedback(db.Model):
     __tablename__ = 'feedback'
     feedback_id = db.Column(db.Integer, primary_key=True)
@@ -177,3 +328,16 @@ class Feedback(db.Model):
     rating = db.Column(db.Integer)
     comments = db.Column(db.Text)
     date = db.Column(db.Date, default=datetime.utcnow)
+
+class SearchDocument(db.Model):
+    __tablename__ = 'search_document'
+    # One row per searchable record, maintained by search; the full-text index is built over title and body
+    __table_args__ = (
+        db.Index('uq_search_document_kind_ref', 'kind', 'ref_id', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'material', 'mcq', 'student' or 'staff'
+    ref_id = db.Column(db.Integer, nullable=False)
+    course_id = db.Column(db.Integer, index=True)
+    title = db.Column(db.Text, nullable=False)  # Quiz questions can be long
+    body = db.Column(db.Text)
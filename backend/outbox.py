@@ -0,0 +1,241 @@
+"""Outbox for student and parent email.
+
+Code that wants to tell someone something adds outbox_message rows in its
+own transaction, so a message exists exactly when the change it reports was
+committed, and the request never waits on a mail server. Adding messages
+also queues a dispatch job for the current OUTBOX_DISPATCH_DELAY window; the
+job drains due messages in batches, groups each batch by recipient so one
+person gets one email per batch however many events concern them, and hands
+the batch to the configured transport. Failed deliveries are retried with
+backoff, up to MAX_ATTEMPTS.
+
+Transports are looked up by MAIL_TRANSPORT: 'smtp' (one connection per
+batch, e.g. to a local relay or `python -m aiosmtpd -n`), 'file' (one .eml
+per email under MAIL_FILE_DIR) or a 'module:Class' path to any class with
+the same constructor and send() method.
+"""
+import importlib
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import make_msgid
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import insert, literal
+from jobs import enqueue
+from models import db, OutboxMessage, Student, ProgramCourse
+
+outbox_cli = AppGroup('outbox', help='Deliver queued student and parent email.')
+
+BATCH_SIZE = 500
+MAX_ATTEMPTS = 5
+SENDING_TIMEOUT = timedelta(minutes=10)
+
+
+class FileTransport:
+    """Write each email to MAIL_FILE_DIR as an .eml file, for development and tests."""
+
+    def __init__(self, config):
+        self.directory = config.get('MAIL_FILE_DIR') or os.path.join(current_app.instance_path, 'mail')
+
+    def send(self, emails):
+        os.makedirs(self.directory, exist_ok=True)
+        for email in emails:
+            name = '{}-{}.eml'.format(datetime.utcnow().strftime('%Y%m%d%H%M%S'), uuid.uuid4().hex[:8])
+            with open(os.path.join(self.directory, name), 'wb') as f:
+                f.write(email.as_bytes())
+        return {}
+
+
+class SmtpTransport:
+    """Deliver a whole batch over one SMTP connection."""
+
+    def __init__(self, config):
+        self.config = config
+
+    def send(self, emails):
+        import smtplib  # Only the smtp transport needs it
+        config = self.config
+        failed = {}
+        with smtplib.SMTP(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=30) as smtp:
+            if config['MAIL_USE_TLS']:
+                smtp.starttls()
+            if config.get('MAIL_USERNAME'):
+                smtp.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+            for email in emails:
+                try:
+                    smtp.send_message(email)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                    # Only this recipient failed; the connection is still usable
+                    failed[email['To']] = str(e)
+        return failed
+
+
+TRANSPORTS = {'file': FileTransport, 'smtp': SmtpTransport}
+
+
+def get_transport():
+    name = current_app.config['MAIL_TRANSPORT']
+    if name in TRANSPORTS:
+        cls = TRANSPORTS[name]
+    else:
+        module, _, attr = name.partition(':')
+        cls = getattr(importlib.import_module(module), attr)
+    return cls(current_app.config)
+
+
+def schedule_dispatch(after=0):
+    """Queue a dispatch for the end of the window `after` seconds from now, once per window."""
+    interval = current_app.config['OUTBOX_DISPATCH_DELAY']
+    if interval <= 0:
+        return enqueue('dispatch_outbox', {}, delay=after)
+    first = math.floor((time.time() + after) / interval) + 1
+    for window in (first, first + 1):
+        job = enqueue('dispatch_outbox', {}, idempotency_key='outbox-dispatch:{}'.format(window),
+                      delay=max(0, window * interval - time.time()))
+        if job.status == 'Queued':
+            break
+        # That window's dispatch has already started and may not see our rows
+    return job
+
+
+def _add_message(recipient, subject, body, student_id=None, communication_id=None):
+    db.session.add(OutboxMessage(recipient=recipient, subject=subject, body=body,
+                                 student_id=student_id, communication_id=communication_id))
+
+
+def queue_message(recipient, subject, body, student_id=None, communication_id=None):
+    _add_message(recipient, subject, body, student_id, communication_id)
+    schedule_dispatch()
+
+
+def notify_student(student, subject, body, communication_id=None, include_parents=True):
+    """Queue a message to a student and, if one is on file, their parent."""
+    _add_message(student.email, subject, body, student.student_id, communication_id)
+    if include_parents and student.parent_email and student.parent_email != student.email:
+        _add_message(student.parent_email, subject, body, student.student_id, communication_id)
+    schedule_dispatch()
+
+
+def queue_announcement(subject, body, communication_id, course_id=None, program_id=None, include_parents=False):
+    """Queue one message per matching student (and parent) with INSERT ... SELECT.
+
+    Without course_id or program_id every student is addressed. Returns the
+    number of messages queued.
+    """
+    students = db.select(Student.student_id, Student.email, Student.parent_email)
+    if course_id:
+        students = students.where(Student.course_id == course_id)
+    if program_id:
+        program_courses = db.select(ProgramCourse.course_id).where(ProgramCourse.program_id == program_id)
+        students = students.where(db.or_(Student.program_id == program_id, Student.course_id.in_(program_courses)))
+    students = students.subquery()
+
+    columns = ['student_id', 'recipient', 'subject', 'body', 'communication_id', 'status', 'attempts', 'run_after',
+               'created_at']
+    now = datetime.utcnow()
+
+    def rows(address):
+        return db.select(students.c.student_id, address, literal(subject), literal(body), literal(communication_id),
+                         literal('Pending'), literal(0), literal(now), literal(now)).where(address.isnot(None))
+
+    queued = db.session.execute(insert(OutboxMessage).from_select(columns, rows(students.c.email))).rowcount
+    if include_parents:
+        queued += db.session.execute(insert(OutboxMessage).from_select(
+            columns, rows(students.c.parent_email).where(students.c.parent_email != students.c.email)
+        )).rowcount
+    if queued:
+        schedule_dispatch()
+    return queued
+
+
+def _claim_batch(limit):
+    """Mark up to `limit` due messages as this run's; returns them in id order."""
+    now = datetime.utcnow()
+    OutboxMessage.query.filter(OutboxMessage.status == 'Sending', OutboxMessage.locked_at < now - SENDING_TIMEOUT).update(
+        {OutboxMessage.status: 'Pending'}, synchronize_session=False
+    )
+    due = db.session.query(OutboxMessage.message_id).filter(
+        OutboxMessage.status == 'Pending', OutboxMessage.run_after <= now
+    ).order_by(OutboxMessage.message_id).limit(limit)
+    token = uuid.uuid4().hex
+    OutboxMessage.query.filter(OutboxMessage.message_id.in_([m for (m,) in due]), OutboxMessage.status == 'Pending').update(
+        {OutboxMessage.status: 'Sending', OutboxMessage.claimed_by: token, OutboxMessage.locked_at: now},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return OutboxMessage.query.filter_by(claimed_by=token, status='Sending').order_by(OutboxMessage.message_id).all()
+
+
+def _compose(recipient, messages):
+    email = EmailMessage()
+    email['From'] = current_app.config['MAIL_FROM']
+    email['To'] = recipient
+    email['Message-ID'] = make_msgid()
+    if len(messages) == 1:
+        email['Subject'] = messages[0].subject
+        email.set_content(messages[0].body)
+    else:
+        email['Subject'] = '{} new messages'.format(len(messages))
+        email.set_content('\n\n'.join('{}\n{}\n{}'.format(m.subject, '-' * len(m.subject), m.body) for m in messages))
+    return email
+
+
+def dispatch_pending(batch_size=BATCH_SIZE):
+    """Deliver every due message, a batch at a time. Returns (emails sent, messages sent, messages failed)."""
+    transport = get_transport()
+    emails_sent = messages_sent = messages_failed = 0
+    while True:
+        batch = _claim_batch(batch_size)
+        if not batch:
+            break
+
+        by_recipient = OrderedDict()
+        for message in batch:
+            by_recipient.setdefault(message.recipient, []).append(message)
+        try:
+            failed = transport.send([_compose(recipient, messages) for recipient, messages in by_recipient.items()])
+        except Exception as e:
+            # The transport itself failed, e.g. the SMTP server is down: retry the whole batch
+            failed = dict.fromkeys(by_recipient, '{}: {}'.format(type(e).__name__, e))
+
+        now = datetime.utcnow()
+        for recipient, messages in by_recipient.items():
+            for message in messages:
+                message.attempts += 1
+                if recipient not in failed:
+                    message.status = 'Sent'
+                    message.sent_at = now
+                    message.last_error = None
+                elif message.attempts < MAX_ATTEMPTS:
+                    message.status = 'Pending'
+                    message.run_after = now + timedelta(seconds=30 * 2 ** message.attempts)
+                    message.last_error = failed[recipient]
+                else:
+                    message.status = 'Failed'
+                    message.last_error = failed[recipient]
+            if recipient in failed:
+                messages_failed += len(messages)
+            else:
+                emails_sent += 1
+                messages_sent += len(messages)
+        retry_at = [m.run_after for m in batch if m.status == 'Pending']
+        if retry_at:
+            schedule_dispatch(after=(min(retry_at) - now).total_seconds())
+        db.session.commit()
+
+        if len(failed) == len(by_recipient):
+            break  # Nothing got through; leave the rest for the retry
+    return emails_sent, messages_sent, messages_failed
+
+
+@outbox_cli.command('dispatch')
+def dispatch_command():
+    """Deliver every due outbox message now."""
+    emails, sent, failed = dispatch_pending()
+    click.echo('Sent {} messages in {} emails, {} failed'.format(sent, emails, failed))
@@ -0,0 +1,101 @@
+"""Shared keyset pagination and streaming for list endpoints.
+
+The mode is chosen from the query string:
+    (nothing)       the full list as one JSON array, as the endpoints always returned
+    limit / after   one page ordered by the key column; the cursor for the next page
+                    is sent in the X-Next-Cursor header and a Link: rel="next" header
+    stream=ndjson   one JSON object per line, read through a server-side cursor
+    stream=json     a JSON array written element by element from a server-side cursor
+
+Streaming modes never hold the whole result in memory, so they are the way to
+export large tables.
+"""
+from flask import Response, current_app, jsonify, request, stream_with_context, url_for
+
+MAX_LIMIT = 500
+STREAM_BATCH_SIZE = 1000
+
+
+def _error(message):
+    return jsonify({'error': message}), 400
+
+
+def _closing(session, chunks):
+    """Close the query's session once the body has been sent.
+
+    The request's session is removed when the view returns, before a
+    streamed body is generated; the query then reopens that same session,
+    which nothing else would close, keeping its connection checked out.
+    """
+    try:
+        yield from chunks
+    finally:
+        session.close()
+
+
+def _stream(query, serialize, fmt):
+    dumps = current_app.json.dumps
+    rows = query.yield_per(STREAM_BATCH_SIZE)
+
+    if fmt == 'ndjson':
+        def generate():
+            for row in rows:
+                yield dumps(serialize(row)) + '\n'
+        return Response(stream_with_context(_closing(query.session, generate())), mimetype='application/x-ndjson')
+
+    def generate():
+        yield '['
+        first = True
+        for row in rows:
+            yield ('' if first else ',') + dumps(serialize(row))
+            first = False
+        yield ']'
+    return Response(stream_with_context(_closing(query.session, generate())), mimetype='application/json')
+
+
+def list_response(query, key, serialize, default_limit=None, max_limit=MAX_LIMIT, descending=False):
+    """Build a list response for `query` in the mode the request asks for.
+
+    `key` is the unique integer column used for ordering and as the cursor;
+    it must be selected by the query (as an entity attribute or a column).
+    `serialize` turns one row into a dict. With `default_limit` set the
+    endpoint is always paginated, even when the client sends no `limit`.
+    """
+    order = key.desc() if descending else key.asc()
+    stream = request.args.get('stream')
+
+    if stream is not None:
+        if stream not in ('ndjson', 'json'):
+            return _error("stream must be 'ndjson' or 'json'")
+        return _stream(query.order_by(order), serialize, stream)
+
+    limit = request.args.get('limit', default_limit, type=int)
+    after = request.args.get('after', type=int)
+
+    if limit is None and after is None:
+        return jsonify([serialize(row) for row in query.order_by(order).all()])
+
+    if limit is None:
+        limit = max_limit
+    if limit < 1:
+        return _error('limit must be positive')
+    limit = min(limit, max_limit)
+
+    if after is not None:
+        query = query.filter(key < after if descending else key > after)
+
+    # Fetch one extra row to learn whether another page exists
+    rows = query.order_by(order).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    response = jsonify([serialize(row) for row in rows])
+    if has_more:
+        next_cursor = str(getattr(rows[-1], key.key))
+        args = request.args.to_dict()
+        args['after'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = '<{}>; rel="next"'.format(
+            url_for(request.endpoint, **(request.view_args or {}), **args)
+        )
+    return response
@@ -0,0 +1,209 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from db_routing import use_primary
+from models import (db, Course, StudyMaterial, Assignment, MCQ, Result, AssignmentSubmission,
+                    CourseContentCounter, StudentCourseProgress)
+
+progress_cli = AppGroup('progress', help='Maintain the course progress counters.')
+
+
+# Lookups used by the write paths to find the course a row belongs to
+def course_id_for_material(material_id):
+    return db.session.query(StudyMaterial.course_id).filter_by(material_id=material_id).scalar()
+
+
+def course_id_for_assignment(assignment_id):
+    return db.session.query(StudyMaterial.course_id).join(
+        Assignment, Assignment.material_id == StudyMaterial.material_id
+    ).filter(Assignment.assignment_id == assignment_id).scalar()
+
+
+# Incremental updates. A missing counter row is seeded from the source tables inside the
+# caller's transaction, after its own write, so the bump is already part of the seed. Doing
+# nothing and leaving the row to the first read would lose the bump whenever that read
+# counted before this transaction committed.
+def _bump_or_seed(model, key, deltas, build):
+    query = model.query.filter_by(**key)
+    if query.update(deltas, synchronize_session=False):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(build())
+    except IntegrityError:
+        # Seeded concurrently, from counts that did not include this transaction's write
+        query.update(deltas, synchronize_session=False)
+
+
+def bump_content(course_id, mcqs=0, assignments=0):
+    if course_id is None:
+        return
+    _bump_or_seed(CourseContentCounter, {'course_id': course_id}, {
+        CourseContentCounter.mcq_count: CourseContentCounter.mcq_count + mcqs,
+        CourseContentCounter.assignment_count: CourseContentCounter.assignment_count + assignments
+    }, lambda: _build_course_counter(course_id))
+
+
+def bump_progress(student_id, course_id, quizzes=0, assignments=0):
+    if course_id is None:
+        return
+    _bump_or_seed(StudentCourseProgress, {'student_id': student_id, 'course_id': course_id}, {
+        StudentCourseProgress.completed_quizzes: StudentCourseProgress.completed_quizzes + quizzes,
+        StudentCourseProgress.submitted_assignments: StudentCourseProgress.submitted_assignments + assignments
+    }, lambda: _build_progress_counter(student_id, course_id))
+
+
+def drop_quiz_completions(mcq_id, course_id):
+    """Un-count a deleted MCQ for every student who had answered it."""
+    if course_id is None:
+        return
+    answered_by = db.session.query(Result.student_id).filter(Result.mcq_id == mcq_id)
+    StudentCourseProgress.query.filter(
+        StudentCourseProgress.course_id == course_id,
+        StudentCourseProgress.student_id.in_(answered_by)
+    ).update({
+        StudentCourseProgress.completed_quizzes: StudentCourseProgress.completed_quizzes - 1
+    }, synchronize_session=False)
+
+
+# Full recomputation, used for first reads and by the rebuild/verify commands
+def _content_counts(course_id=None):
+    """Return {course_id: (mcq_count, assignment_count)}."""
+    mcq_query = db.session.query(StudyMaterial.course_id, db.func.count(MCQ.mcq_id)).join(
+        MCQ, MCQ.material_id == StudyMaterial.material_id
+    )
+    assignment_query = db.session.query(StudyMaterial.course_id, db.func.count(Assignment.assignment_id)).join(
+        Assignment, Assignment.material_id == StudyMaterial.material_id
+    )
+    course_query = db.session.query(Course.course_id)
+    if course_id is not None:
+        mcq_query = mcq_query.filter(StudyMaterial.course_id == course_id)
+        assignment_query = assignment_query.filter(StudyMaterial.course_id == course_id)
+        course_query = course_query.filter(Course.course_id == course_id)
+
+    mcqs = dict(mcq_query.group_by(StudyMaterial.course_id).all())
+    assignments = dict(assignment_query.group_by(StudyMaterial.course_id).all())
+    return {cid: (mcqs.get(cid, 0), assignments.get(cid, 0)) for (cid,) in course_query.all()}
+
+
+def _progress_counts(student_id=None, course_id=None):
+    """Return {(student_id, course_id): (completed_quizzes, submitted_assignments)}."""
+    quiz_query = db.session.query(
+        Result.student_id, StudyMaterial.course_id, db.func.count(Result.result_id)
+    ).join(MCQ, MCQ.mcq_id == Result.mcq_id).join(
+        StudyMaterial, StudyMaterial.material_id == MCQ.material_id
+    )
+    submission_query = db.session.query(
+        AssignmentSubmission.student_id, StudyMaterial.course_id, db.func.count(AssignmentSubmission.submission_id)
+    ).join(Assignment, Assignment.assignment_id == AssignmentSubmission.assignment_id).join(
+        StudyMaterial, StudyMaterial.material_id == Assignment.material_id
+    )
+    if student_id is not None:
+        quiz_query = quiz_query.filter(Result.student_id == student_id)
+        submission_query = submission_query.filter(AssignmentSubmission.student_id == student_id)
+    if course_id is not None:
+        quiz_query = quiz_query.filter(StudyMaterial.course_id == course_id)
+        submission_query = submission_query.filter(StudyMaterial.course_id == course_id)
+
+    quizzes = {(s, c): n for s, c, n in quiz_query.group_by(Result.student_id, StudyMaterial.course_id).all()}
+    submissions = {(s, c): n for s, c, n in submission_query.group_by(
+        AssignmentSubmission.student_id, StudyMaterial.course_id
+    ).all()}
+    return {key: (quizzes.get(key, 0), submissions.get(key, 0)) for key in set(quizzes) | set(submissions)}
+
+
+def _get_or_build(model, key, build):
+    row = db.session.get(model, key)
+    if row is not None:
+        return row
+    # Build from, and check again on, the primary; a lagging replica may just not have it yet
+    use_primary()
+    row = db.session.get(model, key)
+    if row is not None:
+        return row
+    row = build()
+    db.session.add(row)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request built it first
+        db.session.rollback()
+        row = db.session.get(model, key)
+    return row
+
+
+def _build_course_counter(course_id):
+    mcq_count, assignment_count = _content_counts(course_id).get(course_id, (0, 0))
+    return CourseContentCounter(course_id=course_id, mcq_count=mcq_count, assignment_count=assignment_count)
+
+
+def _build_progress_counter(student_id, course_id):
+    quizzes, assignments = _progress_counts(student_id, course_id).get((student_id, course_id), (0, 0))
+    return StudentCourseProgress(student_id=student_id, course_id=course_id,
+                                 completed_quizzes=quizzes, submitted_assignments=assignments)
+
+
+def get_course_counter(course_id):
+    return _get_or_build(CourseContentCounter, course_id, lambda: _build_course_counter(course_id))
+
+
+def get_progress_counter(student_id, course_id):
+    return _get_or_build(StudentCourseProgress, (student_id, course_id),
+                         lambda: _build_progress_counter(student_id, course_id))
+
+
+def rebuild():
+    """Recompute every counter from scratch. Returns (course rows, progress rows)."""
+    content = _content_counts()
+    progress = _progress_counts()
+
+    CourseContentCounter.query.delete()
+    StudentCourseProgress.query.delete()
+    db.session.bulk_insert_mappings(CourseContentCounter, [
+        {'course_id': cid, 'mcq_count': m, 'assignment_count': a} for cid, (m, a) in content.items()
+    ])
+    db.session.bulk_insert_mappings(StudentCourseProgress, [
+        {'student_id': sid, 'course_id': cid, 'completed_quizzes': q, 'submitted_assignments': a}
+        for (sid, cid), (q, a) in progress.items()
+    ])
+    db.session.commit()
+    return len(content), len(progress)
+
+
+def verify():
+    """Compare stored counters with a fresh recomputation. Returns a list of mismatch descriptions."""
+    content = _content_counts()
+    progress = _progress_counts()
+    mismatches = []
+
+    for row in CourseContentCounter.query.all():
+        expected = content.get(row.course_id, (0, 0))
+        if (row.mcq_count, row.assignment_count) != expected:
+            mismatches.append('course {}: stored {} expected {}'.format(
+                row.course_id, (row.mcq_count, row.assignment_count), expected))
+
+    for row in StudentCourseProgress.query.all():
+        expected = progress.get((row.student_id, row.course_id), (0, 0))
+        if (row.completed_quizzes, row.submitted_assignments) != expected:
+            mismatches.append('student {} course {}: stored {} expected {}'.format(
+                row.student_id, row.course_id, (row.completed_quizzes, row.submitted_assignments), expected))
+
+    return mismatches
+
+
+@progress_cli.command('rebuild')
+def rebuild_command():
+    """Recompute all progress counters from scratch."""
+    courses, pairs = rebuild()
+    click.echo('Rebuilt counters for {} courses and {} student/course pairs'.format(courses, pairs))
+
+
+@progress_cli.command('verify')
+def verify_command():
+    """Check stored progress counters against the source tables."""
+    mismatches = verify()
+    for line in mismatches:
+        click.echo(line)
+    if mismatches:
+        raise SystemExit('{} counter mismatches; run `flask progress rebuild`'.format(len(mismatches)))
+    click.echo('All progress counters match')
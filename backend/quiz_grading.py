@@ -0,0 +1,142 @@
+from datetime import datetime
+from sqlalchemy.dialects import mysql, sqlite
+from models import db, MCQ, Result, StudyMaterial
+from progress_counters import bump_progress
+
+
+def _result_values(is_correct):
+    return {
+        'status': 'Pass' if is_correct else 'Fail',
+        'grade': 'A' if is_correct else 'F',
+        # Upserts and bulk mappings bypass the column's onupdate
+        'updated_at': datetime.utcnow()
+    }
+
+
+def _insert_new_results(rows):
+    """Insert the rows that have no result yet and leave the others alone.
+
+    Returns how many were inserted, or None on a dialect without an
+    insert-or-ignore. The unique (student_id, mcq_id) index decides, so of
+    two concurrent first submissions of a question only one inserts it.
+    """
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        stmt = sqlite.insert(Result).values(rows).on_conflict_do_nothing(index_elements=['student_id', 'mcq_id'])
+    elif dialect == 'mysql':
+        stmt = mysql.insert(Result).values(rows).prefix_with('IGNORE')
+    else:
+        return None
+
+    return db.session.execute(stmt).rowcount
+
+
+def _upsert_results(rows):
+    """Write all quiz results in one INSERT ... ON CONFLICT statement.
+
+    Relies on the unique (student_id, mcq_id) constraint on Result so that
+    concurrent resubmits update the existing row instead of adding a new one.
+    """
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        stmt = sqlite.insert(Result).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['student_id', 'mcq_id'],
+            set_={'status': stmt.excluded.status, 'grade': stmt.excluded.grade,
+                  'updated_at': stmt.excluded.updated_at}
+        )
+    elif dialect == 'mysql':
+        stmt = mysql.insert(Result).values(rows)
+        stmt = stmt.on_duplicate_key_update(status=stmt.inserted.status, grade=stmt.inserted.grade,
+                                            updated_at=stmt.inserted.updated_at)
+    else:
+        _merge_results(rows)
+        return
+
+    db.session.execute(stmt)
+
+
+def _existing_results(student_id, mcq_ids):
+    return dict(db.session.query(Result.mcq_id, Result.result_id).filter(
+        Result.student_id == student_id,
+        Result.mcq_id.in_(mcq_ids)
+    ).all())
+
+
+def _merge_results(rows):
+    """Fallback for dialects without an upsert: bulk update known rows, bulk insert the rest."""
+    existing = _existing_results(rows[0]['student_id'], [row['mcq_id'] for row in rows])
+    updates = [dict(row, result_id=existing[row['mcq_id']]) for row in rows if row['mcq_id'] in existing]
+    inserts = [row for row in rows if row['mcq_id'] not in existing]
+
+    if updates:
+        db.session.bulk_update_mappings(Result, updates)
+    if inserts:
+        db.session.bulk_insert_mappings(Result, inserts)
+
+
+def grade_quiz(student_id, answers):
+    """Grade a list of {mcq_id, selected_option} answers for a student.
+
+    Loads every referenced MCQ in one query, grades in memory and writes the
+    results with an insert-or-ignore per course, whose row count is what the
+    course progress counts as newly answered, followed by one bulk upsert.
+    The caller is responsible for committing.
+    Returns (correct_count, per-answer results).
+    """
+    mcq_ids = {answer['mcq_id'] for answer in answers}
+    mcqs = {}
+    if mcq_ids:
+        mcqs = {mcq_id: (correct_option, course_id) for mcq_id, correct_option, course_id in db.session.query(
+            MCQ.mcq_id, MCQ.correct_option, StudyMaterial.course_id
+        ).join(StudyMaterial, StudyMaterial.material_id == MCQ.material_id).filter(MCQ.mcq_id.in_(mcq_ids)).all()}
+
+    results = []
+    rows = {}
+    correct_count = 0
+
+    for answer in answers:
+        mcq_id = answer['mcq_id']
+        if mcq_id not in mcqs:
+            continue
+
+        correct_option = mcqs[mcq_id][0]
+        is_correct = (correct_option or '').upper() == (answer.get('selected_option') or '').upper()
+        if is_correct:
+            correct_count += 1
+
+        # A repeated mcq_id keeps the last answer, as the per-row updates did
+        rows[mcq_id] = dict(student_id=student_id, mcq_id=mcq_id, **_result_values(is_correct))
+
+        results.append({
+            'mcq_id': mcq_id,
+            'is_correct': is_correct,
+            'correct_option': correct_option
+        })
+
+    if not rows:
+        return correct_count, results
+
+    # Questions answered for the first time count towards course progress. The insert's
+    # outcome says which those are; a result read beforehand could be stale by now
+    by_course = {}
+    for mcq_id, row in rows.items():
+        by_course.setdefault(mcqs[mcq_id][1], []).append(row)
+    new_by_course = {}
+    for course_id, course_rows in by_course.items():
+        inserted = _insert_new_results(course_rows)
+        if inserted is None:
+            existing = _existing_results(student_id, [row['mcq_id'] for row in course_rows])
+            inserted = sum(1 for row in course_rows if row['mcq_id'] not in existing)
+        new_by_course[course_id] = inserted
+
+    # Rows inserted above are rewritten with the same values; the others get the new grade
+    _upsert_results(list(rows.values()))
+
+    for course_id, count in new_by_course.items():
+        if count:
+            bump_progress(student_id, course_id, quizzes=count)
+
+    return correct_count, results
@@ -1,6 +1,11 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
+from sqlalchemy.orm import joinedload, selectinload
 from models import db, AcademicYear, Program, Course, ProgramCourse
+from catalog_cache import cached_catalog, bump_version, stats as catalog_cache_stats
+from pagination import list_response
+from conditional import catalog, conditional
+from serializers import ACADEMIC_YEAR, PROGRAM, COURSE, STAFF_COURSE, PROGRAM_COURSE
 
 academic_bp = Blueprint('academic', __name__)
 
@@ -18,19 +23,15 @@ def create_academic_year():
         status=data.get('status', 'Active')
     )
     db.session.add(new_year)
+    bump_version()
     db.session.commit()
     return jsonify({'message': 'Academic Year created successfully'}), 201
 
 @academic_bp.route('/academic-years', methods=['GET'])
+@conditional(catalog)
+@cached_catalog
 def get_academic_years():
-    years = AcademicYear.query.all()
-    return jsonify([{
-        'academic_year_id': y.academic_year_id,
-        'year': y.year,
-        'start_date': y.start_date.isoformat(),
-        'end_date': y.end_date.isoformat(),
-        'status': y.status
-    } for y in years])
+    return jsonify(ACADEMIC_YEAR.many(AcademicYear.query.all()))
 
 # Program Routes
 @academic_bp.route('/programs', methods=['POST'])
@@ -45,29 +46,22 @@ def create_program():
         status=data.get('status', 'Active')
     )
     db.session.add(new_program)
+    bump_version()
     db.session.commit()
     return jsonify({'message': 'Program created successfully'}), 201
 
 @academic_bp.route('/programs', methods=['GET'])
+@conditional(catalog)
+@cached_catalog
 def get_programs():
     # Optional filter by academic year
     academic_year_id = request.args.get('academic_year_id', type=int)
     
-    query = Program.query
+    query = Program.query.options(joinedload(Program.academic_year))
     if academic_year_id:
         query = query.filter_by(academic_year_id=academic_year_id)
     
-    programs = query.all()
-    return jsonify([{
-        'program_id': p.program_id,
-        'program_name': p.program_name,
-        'description': p.description,
-        'duration_months': p.duration_months,
-        'semester': p.semester,
-        'academic_year_id': p.academic_year_id,
-        'academic_year_name': p.academic_year.year if p.academic_year else None,
-        'status': p.status
-    } for p in programs])
+    return jsonify(PROGRAM.many(query.all()))
 
 # Course Routes
 @academic_bp.route('/courses', methods=['POST'])
@@ -81,7 +75,7 @@ def create_course():
         status=data.get('status', 'Active')
     )
     db.session.add(new_course)
-    db.session.commit()
+    db.session.flush()  # For course_id; the course, its links and the version bump commit together
     
     # Link course to multiple programs if provided
     program_ids = data.get('program_ids', [])
@@ -92,45 +86,30 @@ def create_course():
             semester=1  # Default semester, can be updated later
         )
         db.session.add(program_course)
+    bump_version()
     db.session.commit()
     
     return jsonify({'message': 'Course created successfully', 'course_id': new_course.course_id}), 201
 
 @academic_bp.route('/courses', methods=['GET'])
+@conditional(catalog)
+@cached_catalog
 def get_courses():
     # Optional filter by academic year (via linked programs)
     academic_year_id = request.args.get('academic_year_id', type=int)
     
+    # Load teachers and program links up front instead of one lazy query per row
+    query = Course.query.options(
+        joinedload(Course.teacher),
+        selectinload(Course.program_courses).joinedload(ProgramCourse.program).joinedload(Program.academic_year)
+    )
     if academic_year_id:
         # Get courses linked to programs in the specified academic year
-        courses = Course.query.join(ProgramCourse).join(Program).filter(
+        query = query.join(ProgramCourse).join(Program).filter(
             Program.academic_year_id == academic_year_id
-        ).distinct().all()
-    else:
-        courses = Course.query.all()
+        ).distinct()
     
-    result = []
-    for c in courses:
-        # Get linked programs
-        linked_programs = [{
-            'program_id': pc.program_id,
-            'program_name': pc.program.program_name,
-            'semester': pc.program.semester,
-            'academic_year_id': pc.program.academic_year_id,
-            'academic_year_name': pc.program.academic_year.year if pc.program.academic_year else None
-        } for pc in c.program_courses]
-        
-        result.append({
-            'course_id': c.course_id,
-            'course_name': c.course_name,
-            'description': c.description,
-            'credits': c.credits,
-            'staff_id': c.staff_id,
-            'teacher_name': c.teacher.name if c.teacher else None,
-            'linked_programs': linked_programs,
-            'status': c.status
-        })
-    return jsonify(result)
+    return list_response(query, Course.course_id, COURSE)
 
 # Assign Course to Program (with Semester)
 @academic_bp.route('/programs/<int:program_id>/courses', methods=['POST'])
@@ -143,42 +122,27 @@ def add_course_to_program(program_id):
         semester=data['semester']
     )
     db.session.add(program_course)
+    bump_version()
     db.session.commit()
     return jsonify({'message': 'Course added to program successfully'}), 201
 
 @academic_bp.route('/programs/<int:program_id>/courses', methods=['GET'])
+@conditional(lambda program_id: catalog())
 def get_program_courses(program_id):
-    program_courses = ProgramCourse.query.filter_by(program_id=program_id).all()
-    return jsonify([{
-        'program_course_id': pc.program_course_id,
-        'course_id': pc.course_id,
-        'course_name': pc.course.course_name,
-        'semester': pc.semester,
-        'credits': pc.course.credits
-    } for pc in program_courses])
+    program_courses = ProgramCourse.query.options(joinedload(ProgramCourse.course)).filter_by(program_id=program_id).all()
+    return jsonify(PROGRAM_COURSE.many(program_courses))
 
 # Get courses assigned to a specific staff member
 @academic_bp.route('/staff/<int:staff_id>/courses', methods=['GET'])
+@conditional(lambda staff_id: catalog())
 def get_staff_courses(staff_id):
     """Get courses assigned to a specific staff member"""
-    courses = Course.query.filter_by(staff_id=staff_id).all()
-    result = []
-    for c in courses:
-        # Get linked programs
-        linked_programs = [{
-            'program_id': pc.program_id,
-            'program_name': pc.program.program_name,
-            'semester': pc.program.semester
-        } for pc in c.program_courses]
-        
-        result.append({
-            'course_id': c.course_id,
-            'course_name': c.course_name,
-            'description': c.description,
-            'credits': c.credits,
-            'staff_id': c.staff_id,
-            'teacher_name': c.teacher.name if c.teacher else None,
-            'linked_programs': linked_programs,
-            'status': c.status
-        })
-    return jsonify(result)
+    courses = Course.query.options(
+        joinedload(Course.teacher), selectinload(Course.program_courses).joinedload(ProgramCourse.program)
+    ).filter_by(staff_id=staff_id).all()
+    return jsonify(STAFF_COURSE.many(courses))
+
+# Catalog cache hit/miss counters for monitoring
+@academic_bp.route('/catalog/cache-stats', methods=['GET'])
+def get_catalog_cache_stats():
+    return jsonify(catalog_cache_stats())
@@ -1,5 +1,11 @@
-from flask import Blueprint, request, jsonify
-from models import db, Payment, Certificate, Feedback
+from flask import Blueprint, Response, current_app, request, jsonify
+from models import db, Payment, Certificate, CertificateBatch, Program, Feedback, Communication
+from certificates import batch_progress, format_number, reserve_numbers, start_batch
+from file_storage import send_stored_file
+from outbox import queue_announcement
+from conditional import conditional, rows
+import db_profiles
+import metrics
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -21,15 +27,66 @@ def record_payment():
 @admin_bp.route('/certificates', methods=['POST'])
 def issue_certificate():
     data = request.get_json()
+    # Without a caller-chosen number, take the next one from the certificate sequence
+    certificate_number = data.get('certificate_number') or format_number(reserve_numbers(1))
     cert = Certificate(
         student_id=data['student_id'],
         result_id=data.get('result_id'),
-        certificate_number=data['certificate_number'],
+        program_id=data.get('program_id'),
+        certificate_number=certificate_number,
         status='Issued'
     )
     db.session.add(cert)
     db.session.commit()
-    return jsonify({'message': 'Certificate issued'}), 201
+    return jsonify({'message': 'Certificate issued', 'certificate_number': certificate_number}), 201
+
+@admin_bp.route('/certificates/batches', methods=['POST'])
+def issue_certificate_batch():
+    """Certify every passing student of a program in the background.
+
+    Posting again while the program's batch runs returns that batch, and resumes it if its job failed.
+    """
+    data = request.get_json()
+    program_id = data.get('program_id')
+    if not program_id or db.session.get(Program, program_id) is None:
+        return jsonify({'error': 'Unknown program_id'}), 404
+    batch, job, created = start_batch(program_id)
+    body = batch_progress(batch)
+    body['job_id'] = job.job_id
+    return jsonify(body), 202 if created else 200
+
+@admin_bp.route('/certificates/batches/<int:batch_id>', methods=['GET'])
+@conditional(lambda batch_id: rows(CertificateBatch, CertificateBatch.batch_id == batch_id))
+def get_certificate_batch(batch_id):
+    return jsonify(batch_progress(db.get_or_404(CertificateBatch, batch_id)))
+
+@admin_bp.route('/certificates/<int:certificate_id>/pdf', methods=['GET'])
+def get_certificate_pdf(certificate_id):
+    cert = db.get_or_404(Certificate, certificate_id)
+    if not cert.file_path:
+        return jsonify({'error': 'No PDF was rendered for this certificate'}), 404
+    return send_stored_file(cert.file_path)
+
+# Announcements
+@admin_bp.route('/announcements', methods=['POST'])
+def send_announcement():
+    """Queue an email to every student of a course, a program, or everyone.
+
+    The messages are written to the outbox in one statement per audience and
+    delivered in the background, so the request cost does not grow with it.
+    """
+    data = request.get_json()
+    if not data.get('subject') or not data.get('message'):
+        return jsonify({'error': 'subject and message are required'}), 400
+    communication = Communication(message=data['message'])
+    db.session.add(communication)
+    db.session.flush()
+    queued = queue_announcement(data['subject'], data['message'], communication.communication_id,
+                                course_id=data.get('course_id'), program_id=data.get('program_id'),
+                                include_parents=bool(data.get('include_parents')))
+    db.session.commit()
+    return jsonify({'message': 'Announcement queued', 'communication_id': communication.communication_id,
+                    'queued': queued}), 202
 
 # Feedback
 @admin_bp.route('/feedback', methods=['POST'])
@@ -43,3 +100,19 @@ def submit_feedback():
     db.session.add(fb)
     db.session.commit()
     return jsonify({'message': 'Feedback submitted'}), 201
+
+# Metrics
+@admin_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request latency and SQL histograms in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@admin_bp.route('/database', methods=['GET'])
+def get_database_diagnostics():
+    """The active engine profile and the settings the database reports"""
+    return jsonify(db_profiles.diagnostics(current_app))
+
+@admin_bp.route('/startup', methods=['GET'])
+def get_startup_timing():
+    """How long this worker's create_app took, by phase"""
+    return jsonify(dict(current_app.extensions['startup'], schema_startup=current_app.config['SCHEMA_STARTUP']))
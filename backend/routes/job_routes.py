@@ -0,0 +1,21 @@
+from flask import Blueprint, request, jsonify
+from models import db, Job
+from pagination import list_response
+from serializers import JOB
+from conditional import conditional, rows
+
+job_bp = Blueprint('job', __name__)
+
+@job_bp.route('/<int:job_id>', methods=['GET'])
+@conditional(lambda job_id: rows(Job, Job.job_id == job_id))
+def get_job(job_id):
+    return jsonify(JOB(db.get_or_404(Job, job_id)))
+
+@job_bp.route('', methods=['GET'])
+def get_jobs():
+    # Optional filter by status, e.g. ?status=Failed
+    query = Job.query
+    status = request.args.get('status')
+    if status:
+        query = query.filter_by(status=status)
+    return list_response(query, Job.job_id, JOB, default_limit=50, descending=True)
@@ -1,91 +1,230 @@
 from flask import Blueprint, request, jsonify
-from models import db, StudyMaterial, Assignment, MCQ, Course, Result, AssignmentSubmission
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from models import (db, StudyMaterial, Assignment, MCQ, Course, Result, AssignmentSubmission, AssignmentEvaluation,
+                    MaterialOrderSequence, CourseContentCounter, StudentCourseProgress)
 from datetime import datetime
+from quiz_grading import grade_quiz
+from file_storage import resolve_file_path, send_stored_file
+from serializers import MATERIAL, ASSIGNMENT, MCQ_QUESTION, QUIZ_RESULT
+from conditional import conditional, rows
+from progress_counters import (bump_content, bump_progress, drop_quiz_completions, course_id_for_material,
+                               course_id_for_assignment, get_course_counter, get_progress_counter)
 
 learning_bp = Blueprint('learning', __name__)
 
-# Study Material Routes
-@learning_bp.route('/materials', methods=['POST'])
-def upload_material():
-    data = request.get_json()
-    
-    # Get the next order index for this course
-    max_order = db.session.query(db.func.max(StudyMaterial.order_index)).filter_by(course_id=data['course_id']).scalar()
-    next_order = (max_order or 0) + 1
-    
-    new_material = StudyMaterial(
+MAX_BATCH_SIZE = 500
+
+def _allocate_order_indexes(course_id, count):
+    """Reserve `count` consecutive order indexes for a course and return the first.
+
+    The UPDATE locks the course's sequence row before anything is read, so
+    concurrent uploads to one course wait for each other rather than both
+    reading the same MAX(order_index).
+    """
+    seq = MaterialOrderSequence
+    bump = {seq.last_order_index: seq.last_order_index + count}
+    if not seq.query.filter_by(course_id=course_id).update(bump, synchronize_session=False):
+        # First upload to this course: seed the sequence from existing materials
+        max_order = db.session.query(db.func.max(StudyMaterial.order_index)).filter_by(course_id=course_id).scalar() or 0
+        try:
+            with db.session.begin_nested():
+                db.session.add(seq(course_id=course_id, last_order_index=max_order + count))
+            return max_order + 1
+        except IntegrityError:
+            # Another upload seeded it first
+            seq.query.filter_by(course_id=course_id).update(bump, synchronize_session=False)
+    last = db.session.query(seq.last_order_index).filter_by(course_id=course_id).scalar()
+    return last - count + 1
+
+def _batch_items(required):
+    """Read a JSON array body for a batch endpoint; returns (items, error response)."""
+    items = request.get_json()
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'error': 'Expected a non-empty JSON array'}), 400)
+    if len(items) > MAX_BATCH_SIZE:
+        return None, (jsonify({'error': 'At most {} items per batch'.format(MAX_BATCH_SIZE)}), 400)
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            return None, (jsonify({'error': 'Item {}: expected an object'.format(i)}), 400)
+        missing = [field for field in required if item.get(field) in (None, '')]
+        if missing:
+            return None, (jsonify({'error': 'Item {}: missing {}'.format(i, ', '.join(missing))}), 400)
+    return items, None
+
+def _material_courses(material_ids):
+    """Map material_id -> course_id for the given materials in one query."""
+    return dict(db.session.query(StudyMaterial.material_id, StudyMaterial.course_id).filter(
+        StudyMaterial.material_id.in_(set(material_ids))
+    ).all())
+
+def _new_material(data, order_index):
+    return StudyMaterial(
         course_id=data['course_id'],
         title=data['title'],
         description=data.get('description'),
         material_type=data.get('material_type', 'video'),
         video_url=data.get('video_url'),
-        file_path=data.get('file_path'),
+        file_path=resolve_file_path(data),
         duration_minutes=data.get('duration_minutes'),
-        order_index=next_order,
+        order_index=order_index,
         uploaded_by=data.get('uploaded_by')
     )
+
+def _new_assignment(data):
+    due_date = None
+    if data.get('due_date'):
+        due_date = datetime.strptime(data['due_date'], '%Y-%m-%d').date()
+    return Assignment(
+        material_id=data['material_id'],
+        title=data['title'],
+        instructions=data.get('instructions'),
+        due_date=due_date
+    )
+
+def _new_mcq(data):
+    return MCQ(
+        material_id=data['material_id'],
+        question=data['question'],
+        option_a=data['option_a'],
+        option_b=data['option_b'],
+        option_c=data.get('option_c'),
+        option_d=data.get('option_d'),
+        correct_option=data['correct_option']
+    )
+
+# Study Material Routes
+@learning_bp.route('/materials', methods=['POST'])
+def upload_material():
+    data = request.get_json()
+    
+    # Reserve the next order index for this course
+    next_order = _allocate_order_indexes(data['course_id'], 1)
+    
+    new_material = _new_material(data, next_order)
     db.session.add(new_material)
     db.session.commit()
     return jsonify({'message': 'Material uploaded successfully', 'material_id': new_material.material_id}), 201
 
+@learning_bp.route('/materials/batch', methods=['POST'])
+def upload_materials_batch():
+    """Create an array of materials in one transaction.
+
+    Each course gets one block of order indexes for all of its items, in input
+    order. Returns the new material IDs in input order.
+    """
+    items, error = _batch_items(('course_id', 'title'))
+    if error:
+        return error
+
+    counts = {}
+    for item in items:
+        counts[item['course_id']] = counts.get(item['course_id'], 0) + 1
+    known = {cid for (cid,) in db.session.query(Course.course_id).filter(Course.course_id.in_(counts)).all()}
+    unknown = [cid for cid in counts if cid not in known]
+    if unknown:
+        return jsonify({'error': 'Unknown course_id: {}'.format(unknown)}), 400
+
+    next_order = {course_id: _allocate_order_indexes(course_id, n) for course_id, n in counts.items()}
+    materials = []
+    for item in items:
+        materials.append(_new_material(item, next_order[item['course_id']]))
+        next_order[item['course_id']] += 1
+
+    db.session.add_all(materials)
+    db.session.commit()
+    return jsonify({
+        'message': '{} materials uploaded successfully'.format(len(materials)),
+        'material_ids': [m.material_id for m in materials]
+    }), 201
+
+def _course_material_ids(course_id):
+    return db.select(StudyMaterial.material_id).where(StudyMaterial.course_id == course_id)
+
+def _material_versions(material_id):
+    return rows(StudyMaterial, StudyMaterial.material_id == material_id) + \
+        rows(Assignment, Assignment.material_id == material_id) + rows(MCQ, MCQ.material_id == material_id)
+
 @learning_bp.route('/courses/<int:course_id>/materials', methods=['GET'])
+@conditional(lambda course_id: rows(StudyMaterial, StudyMaterial.course_id == course_id)
+             + rows(Assignment, Assignment.material_id.in_(_course_material_ids(course_id)))
+             + rows(MCQ, MCQ.material_id.in_(_course_material_ids(course_id))))
 def get_course_materials(course_id):
-    materials = StudyMaterial.query.filter_by(course_id=course_id).order_by(StudyMaterial.order_index).all()
+    """List a course's materials with assignment and MCQ counts.
+
+    Counts come from grouped subqueries left-joined in a single statement.
+    Pass include=assignments,mcqs to embed the same lists GET /materials/<id>
+    returns, loaded with one extra query per kind for the whole course.
+    """
+    include = set(filter(None, request.args.get('include', '').split(',')))
+    unknown = include - {'assignments', 'mcqs'}
+    if unknown:
+        return jsonify({'error': 'Unknown include: {}'.format(', '.join(sorted(unknown)))}), 400
+
+    # Counts are grouped only over this course's materials, not the whole table
+    assignment_counts = db.session.query(
+        Assignment.material_id, db.func.count(Assignment.assignment_id).label('n')
+    ).join(StudyMaterial).filter(StudyMaterial.course_id == course_id).group_by(Assignment.material_id).subquery()
+    mcq_counts = db.session.query(
+        MCQ.material_id, db.func.count(MCQ.mcq_id).label('n')
+    ).join(StudyMaterial).filter(StudyMaterial.course_id == course_id).group_by(MCQ.material_id).subquery()
+
+    material_rows = db.session.query(
+        StudyMaterial,
+        db.func.coalesce(assignment_counts.c.n, 0),
+        db.func.coalesce(mcq_counts.c.n, 0)
+    ).outerjoin(
+        assignment_counts, assignment_counts.c.material_id == StudyMaterial.material_id
+    ).outerjoin(
+        mcq_counts, mcq_counts.c.material_id == StudyMaterial.material_id
+    ).filter(StudyMaterial.course_id == course_id).order_by(StudyMaterial.order_index).all()
+
+    assignments_by_material = {}
+    if 'assignments' in include:
+        for a in Assignment.query.join(StudyMaterial).filter(
+            StudyMaterial.course_id == course_id
+        ).order_by(Assignment.assignment_id):
+            assignments_by_material.setdefault(a.material_id, []).append(ASSIGNMENT(a))
+
+    mcqs_by_material = {}
+    if 'mcqs' in include:
+        for q in MCQ.query.join(StudyMaterial).filter(
+            StudyMaterial.course_id == course_id
+        ).order_by(MCQ.mcq_id):
+            mcqs_by_material.setdefault(q.material_id, []).append(MCQ_QUESTION(q))
+
     result = []
-    for m in materials:
-        # Get assignments and MCQs count for this material
-        assignment_count = Assignment.query.filter_by(material_id=m.material_id).count()
-        mcq_count = MCQ.query.filter_by(material_id=m.material_id).count()
-        
-        result.append({
-            'material_id': m.material_id,
-            'title': m.title,
-            'description': m.description,
-            'material_type': m.material_type,
-            'video_url': m.video_url,
-            'file_path': m.file_path,
-            'duration_minutes': m.duration_minutes,
-            'order_index': m.order_index,
-            'upload_date': m.upload_date.isoformat() if m.upload_date else None,
-            'assignment_count': assignment_count,
-            'mcq_count': mcq_count
-        })
+    for m, assignment_count, mcq_count in material_rows:
+        item = MATERIAL(m)
+        item['assignment_count'] = assignment_count
+        item['mcq_count'] = mcq_count
+        if 'assignments' in include:
+            item['assignments'] = assignments_by_material.get(m.material_id, [])
+        if 'mcqs' in include:
+            item['mcqs'] = mcqs_by_material.get(m.material_id, [])
+        result.append(item)
     return jsonify(result)
 
 @learning_bp.route('/materials/<int:material_id>', methods=['GET'])
+@conditional(_material_versions)
 def get_material(material_id):
     m = StudyMaterial.query.get_or_404(material_id)
     # Get assignments for this material
-    assignments = [{
-        'assignment_id': a.assignment_id,
-        'title': a.title,
-        'instructions': a.instructions,
-        'due_date': str(a.due_date) if a.due_date else None
-    } for a in m.assignments]
+    assignments = ASSIGNMENT.many(m.assignments)
     
     # Get MCQs for this material
-    mcqs = [{
-        'mcq_id': q.mcq_id,
-        'question': q.question,
-        'option_a': q.option_a,
-        'option_b': q.option_b,
-        'option_c': q.option_c,
-        'option_d': q.option_d
-    } for q in m.mcqs]
+    mcqs = MCQ_QUESTION.many(m.mcqs)
     
-    return jsonify({
-        'material_id': m.material_id,
-        'course_id': m.course_id,
-        'title': m.title,
-        'description': m.description,
-        'material_type': m.material_type,
-        'video_url': m.video_url,
-        'file_path': m.file_path,
-        'duration_minutes': m.duration_minutes,
-        'order_index': m.order_index,
-        'assignments': assignments,
-        'mcqs': mcqs
-    })
+    item = MATERIAL(m)
+    item['assignments'] = assignments
+    item['mcqs'] = mcqs
+    return jsonify(item)
+
+# Stream a material's uploaded file; supports Range (seeking), ETag and If-None-Match
+@learning_bp.route('/materials/<int:material_id>/file', methods=['GET'])
+def download_material_file(material_id):
+    m = StudyMaterial.query.get_or_404(material_id)
+    return send_stored_file(m.file_path)
 
 @learning_bp.route('/materials/<int:material_id>', methods=['DELETE'])
 def delete_material(material_id):
@@ -98,73 +237,101 @@ def delete_material(material_id):
 @learning_bp.route('/assignments', methods=['POST'])
 def create_assignment():
     data = request.get_json()
-    due_date = None
-    if data.get('due_date'):
-        due_date = datetime.strptime(data['due_date'], '%Y-%m-%d').date()
-    
-    new_assignment = Assignment(
-        material_id=data['material_id'],
-        title=data['title'],
-        instructions=data.get('instructions'),
-        due_date=due_date
-    )
+    new_assignment = _new_assignment(data)
     db.session.add(new_assignment)
+    bump_content(course_id_for_material(new_assignment.material_id), assignments=1)
     db.session.commit()
     return jsonify({'message': 'Assignment created successfully', 'assignment_id': new_assignment.assignment_id}), 201
 
+@learning_bp.route('/assignments/batch', methods=['POST'])
+def create_assignments_batch():
+    """Create an array of assignments in one transaction; returns IDs in input order."""
+    items, error = _batch_items(('material_id', 'title'))
+    if error:
+        return error
+    return _create_batch(items, _new_assignment, 'assignment_id', 'assignments', 'Assignments')
+
 @learning_bp.route('/materials/<int:material_id>/assignments', methods=['GET'])
+@conditional(lambda material_id: rows(Assignment, Assignment.material_id == material_id))
 def get_assignments(material_id):
     assignments = Assignment.query.filter_by(material_id=material_id).all()
-    return jsonify([{
-        'assignment_id': a.assignment_id,
-        'title': a.title,
-        'instructions': a.instructions,
-        'due_date': str(a.due_date) if a.due_date else None
-    } for a in assignments])
+    return jsonify(ASSIGNMENT.many(assignments))
 
 # MCQs / Quizzes
 @learning_bp.route('/mcqs', methods=['POST'])
 def create_mcq():
     data = request.get_json()
-    new_mcq = MCQ(
-        material_id=data['material_id'],
-        question=data['question'],
-        option_a=data['option_a'],
-        option_b=data['option_b'],
-        option_c=data.get('option_c'),
-        option_d=data.get('option_d'),
-        correct_option=data['correct_option']
-    )
+    new_mcq = _new_mcq(data)
     db.session.add(new_mcq)
+    bump_content(course_id_for_material(new_mcq.material_id), mcqs=1)
     db.session.commit()
     return jsonify({'message': 'Quiz question created successfully', 'mcq_id': new_mcq.mcq_id}), 201
 
+@learning_bp.route('/mcqs/batch', methods=['POST'])
+def create_mcqs_batch():
+    """Create an array of quiz questions in one transaction; returns IDs in input order."""
+    items, error = _batch_items(('material_id', 'question', 'option_a', 'option_b', 'correct_option'))
+    if error:
+        return error
+    return _create_batch(items, _new_mcq, 'mcq_id', 'mcqs', 'Quiz questions')
+
+def _create_batch(items, build, id_field, kind, label):
+    courses = _material_courses(item['material_id'] for item in items)
+    unknown = sorted({item['material_id'] for item in items} - set(courses))
+    if unknown:
+        return jsonify({'error': 'Unknown material_id: {}'.format(unknown)}), 400
+
+    try:
+        objects = [build(item) for item in items]
+    except ValueError:
+        return jsonify({'error': 'due_date must be YYYY-MM-DD'}), 400
+
+    db.session.add_all(objects)
+    per_course = {}
+    for item in items:
+        course_id = courses[item['material_id']]
+        per_course[course_id] = per_course.get(course_id, 0) + 1
+    for course_id, n in per_course.items():
+        bump_content(course_id, **{kind: n})
+    db.session.commit()
+    return jsonify({
+        'message': '{} created successfully ({})'.format(label, len(objects)),
+        '{}s'.format(id_field): [getattr(o, id_field) for o in objects]
+    }), 201
+
 @learning_bp.route('/materials/<int:material_id>/mcqs', methods=['GET'])
+@conditional(lambda material_id: rows(MCQ, MCQ.material_id == material_id))
 def get_mcqs(material_id):
     mcqs = MCQ.query.filter_by(material_id=material_id).all()
-    return jsonify([{
-        'mcq_id': m.mcq_id,
-        'question': m.question,
-        'option_a': m.option_a,
-        'option_b': m.option_b,
-        'option_c': m.option_c,
-        'option_d': m.option_d
-    } for m in mcqs])
+    return jsonify(MCQ_QUESTION.many(mcqs))
 
 @learning_bp.route('/mcqs/<int:mcq_id>', methods=['DELETE'])
 def delete_mcq(mcq_id):
     mcq = MCQ.query.get_or_404(mcq_id)
+    course_id = course_id_for_material(mcq.material_id)
+    drop_quiz_completions(mcq_id, course_id)
     db.session.delete(mcq)
+    # After the delete, so a counter seeded by the bump does not count this question
+    bump_content(course_id, mcqs=-1)
     db.session.commit()
     return jsonify({'message': 'Quiz question deleted successfully'})
 
 # Get staff's courses (courses they teach)
 @learning_bp.route('/staff/<int:staff_id>/courses', methods=['GET'])
+@conditional(lambda staff_id: rows(Course, Course.staff_id == staff_id) + rows(
+    StudyMaterial, StudyMaterial.course_id.in_(db.select(Course.course_id).where(Course.staff_id == staff_id))))
 def get_staff_courses(staff_id):
-    courses = Course.query.filter_by(staff_id=staff_id).all()
+    # Materials are counted in one grouped query over this staff member's courses
+    material_counts = db.session.query(
+        StudyMaterial.course_id, db.func.count(StudyMaterial.material_id).label('n')
+    ).join(Course).filter(Course.staff_id == staff_id).group_by(StudyMaterial.course_id).subquery()
+
+    course_rows = db.session.query(Course, db.func.coalesce(material_counts.c.n, 0)).outerjoin(
+        material_counts, material_counts.c.course_id == Course.course_id
+    ).filter(Course.staff_id == staff_id).order_by(Course.course_id).all()
+
     result = []
-    for c in courses:
-        material_count = StudyMaterial.query.filter_by(course_id=c.course_id).count()
+    for c, material_count in course_rows:
         result.append({
             'course_id': c.course_id,
             'course_name': c.course_name,
@@ -182,41 +349,11 @@ def submit_quiz():
     student_id = data['student_id']
     answers = data['answers']  # List of {mcq_id, selected_option}
     
-    results = []
-    correct_count = 0
     total_count = len(answers)
-    
-    for answer in answers:
-        mcq = MCQ.query.get(answer['mcq_id'])
-        if mcq:
-            is_correct = mcq.correct_option.upper() == answer['selected_option'].upper()
-            if is_correct:
-                correct_count += 1
-            
-            # Check if result already exists
-            existing_result = Result.query.filter_by(
-                student_id=student_id,
-                mcq_id=answer['mcq_id']
-            ).first()
-            
-            if existing_result:
-                existing_result.status = 'Pass' if is_correct else 'Fail'
-                existing_result.grade = 'A' if is_correct else 'F'
-            else:
-                new_result = Result(
-                    student_id=student_id,
-                    mcq_id=answer['mcq_id'],
-                    status='Pass' if is_correct else 'Fail',
-                    grade='A' if is_correct else 'F'
-                )
-                db.session.add(new_result)
-            
-            results.append({
-                'mcq_id': answer['mcq_id'],
-                'is_correct': is_correct,
-                'correct_option': mcq.correct_option
-            })
-    
+
+    # Grade every answer in memory and write all results in one upsert
+    correct_count, results = grade_quiz(student_id, answers)
+
     db.session.commit()
     
     score_percentage = round((correct_count / total_count) * 100) if total_count > 0 else 0
@@ -231,6 +368,9 @@ def submit_quiz():
 
 # Get student's quiz results for a material
 @learning_bp.route('/quiz/results/<int:student_id>/<int:material_id>', methods=['GET'])
+@conditional(lambda student_id, material_id: rows(MCQ, MCQ.material_id == material_id) + rows(
+    Result, Result.student_id == student_id,
+    Result.mcq_id.in_(db.select(MCQ.mcq_id).where(MCQ.material_id == material_id))))
 def get_quiz_results(student_id, material_id):
     # Get all MCQs for this material
     mcqs = MCQ.query.filter_by(material_id=material_id).all()
@@ -242,12 +382,7 @@ def get_quiz_results(student_id, material_id):
         Result.mcq_id.in_(mcq_ids)
     ).all()
     
-    return jsonify([{
-        'result_id': r.result_id,
-        'mcq_id': r.mcq_id,
-        'status': r.status,
-        'grade': r.grade
-    } for r in results])
+    return jsonify(QUIZ_RESULT.many(results))
 
 # Assignment Submissions
 @learning_bp.route('/assignments/submit', methods=['POST'])
@@ -260,10 +395,12 @@ def submit_assignment():
         student_id=data['student_id']
     ).first()
     
+    file_path = resolve_file_path(data)
+    
     if existing:
         # Update existing submission
         existing.assignment_text = data.get('assignment_text')
-        existing.file_path = data.get('file_path')
+        existing.file_path = file_path
         existing.submitted_date = datetime.utcnow()
         db.session.commit()
         return jsonify({
@@ -274,10 +411,11 @@ def submit_assignment():
     new_submission = AssignmentSubmission(
         assignment_id=data['assignment_id'],
         student_id=data['student_id'],
-        file_path=data.get('file_path'),
+        file_path=file_path,
         assignment_text=data.get('assignment_text')
     )
     db.session.add(new_submission)
+    bump_progress(new_submission.student_id, course_id_for_assignment(new_submission.assignment_id), assignments=1)
     db.session.commit()
     
     return jsonify({
@@ -286,14 +424,24 @@ def submit_assignment():
     }), 201
 
 # Get student's assignment submissions for a material
+def _submission_ids(student_id, material_id):
+    return db.select(AssignmentSubmission.submission_id).where(
+        AssignmentSubmission.student_id == student_id,
+        AssignmentSubmission.assignment_id.in_(db.select(Assignment.assignment_id).where(
+            Assignment.material_id == material_id))
+    )
+
 @learning_bp.route('/assignments/submissions/<int:student_id>/<int:material_id>', methods=['GET'])
+@conditional(lambda student_id, material_id: rows(
+    AssignmentSubmission, AssignmentSubmission.submission_id.in_(_submission_ids(student_id, material_id))
+) + rows(AssignmentEvaluation, AssignmentEvaluation.submission_id.in_(_submission_ids(student_id, material_id))))
 def get_assignment_submissions(student_id, material_id):
     # Get all assignments for this material
     assignments = Assignment.query.filter_by(material_id=material_id).all()
     assignment_ids = [a.assignment_id for a in assignments]
     
     # Get student's submissions for these assignments
-    submissions = AssignmentSubmission.query.filter(
+    submissions = AssignmentSubmission.query.options(selectinload(AssignmentSubmission.evaluations)).filter(
         AssignmentSubmission.student_id == student_id,
         AssignmentSubmission.assignment_id.in_(assignment_ids)
     ).all()
@@ -321,33 +469,17 @@ def get_assignment_submissions(student_id, material_id):
 
 # Get student progress for a course
 @learning_bp.route('/student/<int:student_id>/course/<int:course_id>/progress', methods=['GET'])
+@conditional(lambda student_id, course_id: rows(CourseContentCounter, CourseContentCounter.course_id == course_id) + rows(
+    StudentCourseProgress, StudentCourseProgress.student_id == student_id, StudentCourseProgress.course_id == course_id))
 def get_student_progress(student_id, course_id):
-    """Calculate student progress based on completed quizzes and assignments"""
-    
-    # Get all materials for this course
-    materials = StudyMaterial.query.filter_by(course_id=course_id).all()
-    material_ids = [m.material_id for m in materials]
-    
-    # Get total MCQs for this course
-    total_mcqs = MCQ.query.filter(MCQ.material_id.in_(material_ids)).count()
-    
-    # Get total assignments for this course
-    total_assignments = Assignment.query.filter(Assignment.material_id.in_(material_ids)).count()
-    
-    # Get completed quizzes (MCQs with results)
-    completed_quizzes = Result.query.filter(
-        Result.student_id == student_id,
-        Result.mcq_id.isnot(None)
-    ).join(MCQ).filter(
-        MCQ.material_id.in_(material_ids)
-    ).count()
-    
-    # Get submitted assignments
-    assignment_ids = [a.assignment_id for a in Assignment.query.filter(Assignment.material_id.in_(material_ids)).all()]
-    submitted_assignments = AssignmentSubmission.query.filter(
-        AssignmentSubmission.student_id == student_id,
-        AssignmentSubmission.assignment_id.in_(assignment_ids) if assignment_ids else False
-    ).count()
+    """Student progress from the maintained course and completion counters"""
+    counter = get_course_counter(course_id)
+    progress = get_progress_counter(student_id, course_id)
+
+    total_mcqs = counter.mcq_count
+    total_assignments = counter.assignment_count
+    completed_quizzes = progress.completed_quizzes
+    submitted_assignments = progress.submitted_assignments
     
     # Calculate total items and completed items
     total_items = total_mcqs + total_assignments
@@ -0,0 +1,28 @@
+from flask import Blueprint, request, jsonify
+from search import KINDS, search
+
+search_bp = Blueprint('search', __name__)
+
+MAX_LIMIT = 100
+
+@search_bp.route('', methods=['GET'])
+def search_everything():
+    """Ranked prefix search over materials, quiz questions, students and staff.
+
+    Query params:
+        q: the search text; every word must match the start of a word
+        kind: comma-separated subset of material, mcq, student, staff (optional)
+        course_id: only this course's materials, questions and students (optional)
+        limit: number of results, default 20, max 100
+    """
+    kinds = set(filter(None, request.args.get('kind', '').split(',')))
+    unknown = kinds - set(KINDS)
+    if unknown:
+        return jsonify({'error': 'Unknown kind: {}'.format(', '.join(sorted(unknown)))}), 400
+    limit = request.args.get('limit', 20, type=int)
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+
+    results = search(request.args.get('q', ''), kinds=sorted(kinds), course_id=request.args.get('course_id', type=int),
+                     limit=min(limit, MAX_LIMIT))
+    return jsonify(results)
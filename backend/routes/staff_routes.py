@@ -1,5 +1,9 @@
 from flask import Blueprint, request, jsonify
 from models import db, Staff
+from catalog_cache import bump_version
+from pagination import list_response
+from serializers import STAFF
+from conditional import conditional, rows
 
 staff_bp = Blueprint('staff', __name__)
 
@@ -16,21 +20,14 @@ def create_staff():
         status=data.get('status', 'Active')
     )
     db.session.add(new_staff)
+    bump_version()
     db.session.commit()
     return jsonify({'message': 'Staff created successfully', 'staff_id': new_staff.staff_id}), 201
 
 @staff_bp.route('/staff', methods=['GET'])
+@conditional(lambda: rows(Staff))
 def get_staff():
-    staff_members = Staff.query.all()
-    return jsonify([{
-        'staff_id': s.staff_id,
-        'name': s.name,
-        'email': s.email,
-        'phone': s.phone,
-        'qualifications': s.qualifications,
-        'status': s.status,
-        'has_password': s.password_hash is not None
-    } for s in staff_members])
+    return list_response(Staff.query, Staff.staff_id, STAFF)
 
 @staff_bp.route('/staff/<int:staff_id>', methods=['PUT'])
 def update_staff(staff_id):
@@ -50,6 +47,8 @@ def update_staff(staff_id):
     if 'password' in data and data['password']:
         staff.password_hash = data['password']  # Store as plain text
     
+    # Course listings embed the teacher's name
+    bump_version()
     db.session.commit()
     return jsonify({'message': 'Staff updated successfully'})
 
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from models import db, Student, Program, Course, ProgramCourse
+from pagination import list_response
+from serializers import STUDENT_ROW, ROSTER_ROW, STUDENT_PROFILE
+from conditional import catalog, conditional, rows
+from student_import import FORMATS, decode_lines, import_students, read_rows
 
 student_bp = Blueprint('student', __name__)
 
@@ -64,57 +68,65 @@ def create_student():
     db.session.commit()
     return jsonify({'message': 'Student created successfully'}), 201
 
+@student_bp.route('/students/import', methods=['POST'])
+def import_students_bulk():
+    """Admin endpoint to bulk-create students from a CSV or NDJSON request body.
+
+    The body is read as a stream, so large files are never held in memory.
+    The format comes from ?format=csv|ndjson or the Content-Type.
+    """
+    fmt = request.args.get('format')
+    if not fmt:
+        fmt = 'ndjson' if request.mimetype in ('application/x-ndjson', 'application/jsonl') else 'csv'
+    if fmt not in FORMATS:
+        return jsonify({'error': "format must be 'csv' or 'ndjson'"}), 400
+
+    summary = import_students(read_rows(decode_lines(request.stream), fmt))
+    return jsonify(summary), 201 if summary['created'] else 200
+
+def _student_list_versions():
+    course_id = request.args.get('course_id', type=int)
+    # Program and course names come from the catalog
+    return rows(Student, *([Student.course_id == course_id] if course_id else [])) + catalog()
+
 @student_bp.route('/students', methods=['GET'])
+@conditional(_student_list_versions)
 def get_students():
     # Optional filter by course_id
     course_id = request.args.get('course_id', type=int)
     
+    # Only the columns the list sends, so no Student objects are built
+    query = db.session.query(
+        Student.student_id, Student.name, Student.email, Student.contact, Student.program_id, Program.program_name,
+        Student.course_id, Course.course_name
+    ).outerjoin(Program, Program.program_id == Student.program_id).outerjoin(Course, Course.course_id == Student.course_id)
     if course_id:
         # Get students directly enrolled in this course
-        students = Student.query.filter_by(course_id=course_id).all()
-    else:
-        students = Student.query.all()
+        query = query.filter(Student.course_id == course_id)
     
-    return jsonify([{
-        'student_id': s.student_id,
-        'name': s.name,
-        'email': s.email,
-        'contact': s.contact,
-        'program_id': s.program_id,
-        'program_name': s.program.program_name if s.program else None,
-        'course_id': s.course_id,
-        'course_name': s.course.course_name if s.course else None
-    } for s in students])
+    # Supports limit/after pages and stream=ndjson|json exports
+    return list_response(query, Student.student_id, STUDENT_ROW)
 
 @student_bp.route('/students/<int:student_id>', methods=['GET'])
+@conditional(lambda student_id: rows(Student, Student.student_id == student_id))
 def get_student_profile(student_id):
-    student = Student.query.get_or_404(student_id)
-    return jsonify({
-        'student_id': student.student_id,
-        'name': student.name,
-        'email': student.email,
-        'dob': str(student.dob),
-        'contact': student.contact,
-        'parent_name': student.parent_name,
-        'program_id': student.program_id
-    })
+    return jsonify(STUDENT_PROFILE(Student.query.get_or_404(student_id)))
 
 # Get students for a specific staff member (students enrolled in courses taught by this staff)
 @student_bp.route('/staff/<int:staff_id>/students', methods=['GET'])
+@conditional(lambda staff_id: rows(
+    Student, Student.course_id.in_(db.select(Course.course_id).where(Course.staff_id == staff_id))) + catalog())
 def get_staff_students(staff_id):
     """Get students enrolled in courses taught by this staff member"""
     # Optional filter by specific course
     course_id = request.args.get('course_id', type=int)
     
     # Get courses taught by this staff
-    staff_courses = Course.query.filter_by(staff_id=staff_id).all()
+    staff_course_ids = [course_id for (course_id,) in db.session.query(Course.course_id).filter_by(staff_id=staff_id)]
     
-    if not staff_courses:
+    if not staff_course_ids:
         return jsonify([])
     
-    # Get all course IDs for this staff
-    staff_course_ids = [c.course_id for c in staff_courses]
-    
     # If filtering by specific course, verify it belongs to this staff
     if course_id:
         if course_id not in staff_course_ids:
@@ -124,16 +136,11 @@ def get_staff_students(staff_id):
         filter_course_ids = staff_course_ids
     
     # Get students directly enrolled in these courses (via course_id field)
-    students = Student.query.filter(
+    students = db.session.query(
+        Student.student_id, Student.name, Student.email, Student.contact, Student.course_id, Course.course_name
+    ).join(Course, Course.course_id == Student.course_id).filter(
         Student.course_id.in_(filter_course_ids)
     ).all()
     
-    return jsonify([{
-        'student_id': s.student_id,
-        'name': s.name,
-        'email': s.email,
-        'contact': s.contact,
-        'course_id': s.course_id,
-        'course_name': s.course.course_name if s.course else None
-    } for s in students])
+    return jsonify(ROSTER_ROW.many(students))
 
@@ -1,5 +1,15 @@
-from flask import Blueprint, request, jsonify
-from models import db, AssignmentSubmission, AssignmentEvaluation, Result, Assignment, StudyMaterial, Course, Student
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from sqlalchemy.orm import joinedload
+from pagination import list_response
+from serializers import INBOX_ROW, STUDENT_RESULT
+from gradebook import FORMATS as GRADEBOOK_FORMATS, gradebook_rows, stream_csv, stream_xlsx
+from progress_counters import bump_progress, course_id_for_assignment
+from file_storage import resolve_file_path
+from jobs import enqueue
+from conditional import catalog, conditional, rows
+from outbox import notify_student
+from models import (db, AssignmentSubmission, AssignmentEvaluation, Result, Assignment, StudyMaterial, Course, Student,
+                    Communication)
 
 submission_bp = Blueprint('submission', __name__)
 
@@ -10,137 +20,148 @@ def submit_assignment():
     submission = AssignmentSubmission(
         assignment_id=data['assignment_id'],
         student_id=data['student_id'],
-        file_path=data.get('file_path'),
+        file_path=resolve_file_path(data),
         assignment_text=data.get('assignment_text')
     )
     db.session.add(submission)
+    bump_progress(submission.student_id, course_id_for_assignment(submission.assignment_id), assignments=1)
     db.session.commit()
     return jsonify({'message': 'Assignment submitted successfully'}), 201
 
-# Get all submissions for a staff member's courses
+# Get submissions for a staff member's courses (grading inbox)
+def _inbox_versions(staff_id):
+    material_ids = db.select(StudyMaterial.material_id).join(Course).where(Course.staff_id == staff_id)
+    assignment_ids = db.select(Assignment.assignment_id).where(Assignment.material_id.in_(material_ids))
+    submission_ids = db.select(AssignmentSubmission.submission_id).where(
+        AssignmentSubmission.assignment_id.in_(assignment_ids))
+    student_ids = db.select(AssignmentSubmission.student_id).where(AssignmentSubmission.assignment_id.in_(assignment_ids))
+    # Every table the inbox rows take a column from; course names come from the catalog
+    return (rows(StudyMaterial, StudyMaterial.material_id.in_(material_ids))
+            + rows(Assignment, Assignment.assignment_id.in_(assignment_ids))
+            + rows(AssignmentSubmission, AssignmentSubmission.submission_id.in_(submission_ids))
+            + rows(AssignmentEvaluation, AssignmentEvaluation.submission_id.in_(submission_ids))
+            + rows(Student, Student.student_id.in_(student_ids))
+            + catalog())
+
 @submission_bp.route('/staff/<int:staff_id>/submissions', methods=['GET'])
+@conditional(_inbox_versions)
 def get_staff_submissions(staff_id):
-    """Get all assignment submissions for courses taught by this staff"""
-    # Get all courses taught by this staff
-    staff_courses = Course.query.filter_by(staff_id=staff_id).all()
-    
-    if not staff_courses:
-        return jsonify([])
-    
-    staff_course_ids = [c.course_id for c in staff_courses]
-    
-    # Get all materials for these courses
-    materials = StudyMaterial.query.filter(
-        StudyMaterial.course_id.in_(staff_course_ids)
-    ).all()
-    
-    material_ids = [m.material_id for m in materials]
-    
-    # Get all assignments for these materials
-    assignments = Assignment.query.filter(
-        Assignment.material_id.in_(material_ids)
-    ).all()
-    
-    assignment_ids = [a.assignment_id for a in assignments]
-    
-    # Get all submissions for these assignments
-    submissions = AssignmentSubmission.query.filter(
-        AssignmentSubmission.assignment_id.in_(assignment_ids)
-    ).all()
-    
-    result = []
-    for sub in submissions:
-        # Get student info
-        student = Student.query.get(sub.student_id)
-        # Get assignment info
-        assignment = Assignment.query.get(sub.assignment_id)
-        material = StudyMaterial.query.get(assignment.material_id) if assignment else None
-        course = Course.query.get(material.course_id) if material else None
-        
-        # Get evaluation if exists
-        evaluation = AssignmentEvaluation.query.filter_by(submission_id=sub.submission_id).first()
-        
-        result.append({
-            'submission_id': sub.submission_id,
-            'assignment_id': sub.assignment_id,
-            'assignment_title': assignment.title if assignment else None,
-            'student_id': sub.student_id,
-            'student_name': student.name if student else None,
-            'student_email': student.email if student else None,
-            'course_name': course.course_name if course else None,
-            'material_title': material.title if material else None,
-            'assignment_text': sub.assignment_text,
-            'file_path': sub.file_path,
-            'submitted_date': sub.submitted_date.isoformat() if sub.submitted_date else None,
-            'is_evaluated': evaluation is not None,
-            'marks': float(evaluation.marks) if evaluation and evaluation.marks else None,
-            'feedback': evaluation.feedback if evaluation else None
-        })
-    
-    return jsonify(result)
+    """Get assignment submissions for courses taught by this staff, newest first.
+
+    Query params:
+        status: 'evaluated' or 'pending' (optional)
+        limit: page size, max 200; without limit or after the whole inbox is returned
+        after: cursor from the previous page's X-Next-Cursor header
+        stream: 'ndjson' or 'json' to export everything (see pagination.py)
+    """
+    status = request.args.get('status')
+    if status not in (None, 'evaluated', 'pending'):
+        return jsonify({'error': "status must be 'evaluated' or 'pending'"}), 400
+
+    # One joined query: Course -> StudyMaterial -> Assignment -> Submission -> Student,
+    # with the evaluation outer-joined so pending submissions are included
+    query = db.session.query(
+        AssignmentSubmission.submission_id,
+        AssignmentSubmission.assignment_id,
+        AssignmentSubmission.student_id,
+        AssignmentSubmission.assignment_text,
+        AssignmentSubmission.file_path,
+        AssignmentSubmission.submitted_date,
+        Assignment.title.label('assignment_title'),
+        StudyMaterial.title.label('material_title'),
+        Course.course_name,
+        Student.name.label('student_name'),
+        Student.email.label('student_email'),
+        AssignmentEvaluation.evaluation_id,
+        AssignmentEvaluation.marks,
+        AssignmentEvaluation.feedback
+    ).select_from(Course).join(
+        StudyMaterial, StudyMaterial.course_id == Course.course_id
+    ).join(
+        Assignment, Assignment.material_id == StudyMaterial.material_id
+    ).join(
+        AssignmentSubmission, AssignmentSubmission.assignment_id == Assignment.assignment_id
+    ).join(
+        Student, Student.student_id == AssignmentSubmission.student_id
+    ).outerjoin(
+        AssignmentEvaluation, AssignmentEvaluation.submission_id == AssignmentSubmission.submission_id
+    ).filter(Course.staff_id == staff_id)
+
+    if status == 'evaluated':
+        query = query.filter(AssignmentEvaluation.evaluation_id.isnot(None))
+    elif status == 'pending':
+        query = query.filter(AssignmentEvaluation.evaluation_id.is_(None))
+
+    # Newest first. Only paginated when asked to: clients that send no limit get the whole inbox, as before
+    return list_response(query, AssignmentSubmission.submission_id, INBOX_ROW, max_limit=200, descending=True)
 
 # Evaluate Assignment
 @submission_bp.route('/evaluations', methods=['POST'])
 def evaluate_submission():
+    """Save the evaluation; the Result is generated by a background job"""
     data = request.get_json()
     
     # Check if already evaluated
-    existing = AssignmentEvaluation.query.filter_by(submission_id=data['submission_id']).first()
-    
-    if existing:
-        # Update existing evaluation
-        existing.marks = data['marks']
-        existing.feedback = data.get('feedback')
-        existing.evaluated_by = data.get('evaluated_by')
-        db.session.commit()
-        return jsonify({'message': 'Evaluation updated successfully'})
-    
-    evaluation = AssignmentEvaluation(
-        submission_id=data['submission_id'],
-        marks=data['marks'],
-        feedback=data.get('feedback'),
-        evaluated_by=data.get('evaluated_by')
-    )
-    db.session.add(evaluation)
+    evaluation = AssignmentEvaluation.query.filter_by(submission_id=data['submission_id']).first()
+    created = evaluation is None
+    
+    if created:
+        evaluation = AssignmentEvaluation(submission_id=data['submission_id'])
+        db.session.add(evaluation)
+    marks_changed = created or evaluation.marks is None or float(evaluation.marks) != float(data['marks'])
+    evaluation.marks = data['marks']
+    evaluation.feedback = data.get('feedback')
+    evaluation.evaluated_by = data.get('evaluated_by')
+    db.session.flush()
+    
+    # Queued in the same transaction. The key is the evaluation's row version: a repeated post that
+    # changes nothing gets the same job back, any edit (even back to earlier marks) queues a new one
+    job = enqueue('generate_result', {'evaluation_id': evaluation.evaluation_id},
+                  idempotency_key='evaluation-result:{}:{}'.format(evaluation.evaluation_id,
+                                                                   evaluation.updated_at.isoformat()))
+    
+    if marks_changed:
+        # The email goes out from the outbox after commit, never inside this request
+        submission = evaluation.submission
+        title = submission.assignment.title
+        message = 'Your submission for "{}" was evaluated: {} marks.'.format(title, data['marks'])
+        if evaluation.feedback:
+            message += '\n\nFeedback: {}'.format(evaluation.feedback)
+        communication = Communication(submission_id=submission.submission_id, message=message)
+        db.session.add(communication)
+        db.session.flush()
+        notify_student(submission.student, 'Assignment evaluated: {}'.format(title), message,
+                       communication.communication_id)
     db.session.commit()
     
-    # Auto-create Result entry
-    status = 'Pass' if float(data['marks']) >= 40 else 'Fail'
-    submission = AssignmentSubmission.query.get(data['submission_id'])
-    
-    # Calculate grade
-    marks = float(data['marks'])
-    if marks >= 90:
-        grade = 'A+'
-    elif marks >= 80:
-        grade = 'A'
-    elif marks >= 70:
-        grade = 'B'
-    elif marks >= 60:
-        grade = 'C'
-    elif marks >= 50:
-        grade = 'D'
-    else:
-        grade = 'F'
-    
-    result = Result(
-        student_id=submission.student_id,
-        evaluation_id=evaluation.evaluation_id,
-        status=status,
-        grade=grade
-    )
-    db.session.add(result)
-    db.session.commit()
-    
-    return jsonify({'message': 'Evaluation submitted and result generated'}), 201
+    if created:
+        return jsonify({'message': 'Evaluation submitted, result generation queued', 'job_id': job.job_id}), 201
+    return jsonify({'message': 'Evaluation updated successfully', 'job_id': job.job_id})
 
 @submission_bp.route('/students/<int:student_id>/results', methods=['GET'])
+@conditional(lambda student_id: rows(Result, Result.student_id == student_id) + rows(
+    AssignmentEvaluation, AssignmentEvaluation.evaluation_id.in_(
+        db.select(Result.evaluation_id).where(Result.student_id == student_id))))
 def get_student_results(student_id):
-    results = Result.query.filter_by(student_id=student_id).all()
-    return jsonify([{
-        'result_id': r.result_id,
-        'status': r.status,
-        'grade': r.grade,
-        'marks': float(r.evaluation.marks) if r.evaluation and r.evaluation.marks else None
-    } for r in results])
+    query = Result.query.options(joinedload(Result.evaluation)).filter_by(student_id=student_id)
+    return list_response(query, Result.result_id, STUDENT_RESULT)
+
+# Gradebook export: one row per student, one column per quiz question and assignment
+@submission_bp.route('/courses/<int:course_id>/gradebook', methods=['GET'])
+def export_gradebook(course_id):
+    """Stream the course gradebook as CSV (default) or XLSX via ?format="""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in GRADEBOOK_FORMATS:
+        return jsonify({'error': "format must be 'csv' or 'xlsx'"}), 400
+    Course.query.get_or_404(course_id)
+
+    if fmt == 'xlsx':
+        body = stream_xlsx(gradebook_rows(course_id))
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = stream_csv(gradebook_rows(course_id))
+        mimetype = 'text/csv'
 
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = 'attachment; filename="gradebook-course-{}.{}"'.format(course_id, fmt)
+    return response
@@ -0,0 +1,57 @@
+from flask import Blueprint, request, jsonify
+from models import db, UploadSession
+from file_storage import UploadError, start_upload, write_chunk, complete_upload, file_ref
+
+upload_bp = Blueprint('upload', __name__)
+
+@upload_bp.app_errorhandler(UploadError)
+def handle_upload_error(e):
+    body = {'error': str(e)}
+    if e.offset is not None:
+        body['offset'] = e.offset
+    return jsonify(body), e.status
+
+def _upload_status(upload):
+    return {
+        'upload_id': upload.upload_id,
+        'filename': upload.filename,
+        'size': upload.total_size,
+        'offset': upload.received_bytes,
+        'status': upload.status,
+        'file_ref': file_ref(upload.sha256) if upload.sha256 else None
+    }
+
+# Start a resumable upload
+@upload_bp.route('', methods=['POST'])
+def create_upload():
+    data = request.get_json()
+    upload = start_upload(data.get('filename'), data.get('size'), data.get('content_type'))
+    return jsonify(_upload_status(upload)), 201
+
+# Current offset, so an interrupted client knows where to resume
+@upload_bp.route('/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    upload = db.get_or_404(UploadSession, upload_id)
+    return jsonify(_upload_status(upload))
+
+# Append a chunk: raw bytes in the body, starting at the Upload-Offset header
+@upload_bp.route('/<upload_id>', methods=['PATCH'])
+def upload_chunk(upload_id):
+    upload = db.get_or_404(UploadSession, upload_id)
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'Upload-Offset header is required', 'offset': upload.received_bytes}), 400
+    new_offset = write_chunk(upload, offset, request.stream)
+    return jsonify({'upload_id': upload_id, 'offset': new_offset})
+
+# Finish: hash, deduplicate and return the file reference to store on a material or submission
+@upload_bp.route('/<upload_id>/complete', methods=['POST'])
+def finish_upload(upload_id):
+    upload = db.get_or_404(UploadSession, upload_id)
+    stored = complete_upload(upload)
+    return jsonify({
+        'upload_id': upload_id,
+        'file_ref': file_ref(stored.sha256),
+        'sha256': stored.sha256,
+        'size': stored.size
+    })
@@ -0,0 +1,224 @@
+"""Full-text search over study materials, quiz questions, students and staff.
+
+Every searchable row has a copy in search_document with a title (material
+title, question or name) and a body (description, the four options or
+email). A session listener refreshes the copies of the rows each flush
+inserted, changed or deleted, inside the same transaction, with one DELETE
+and one INSERT ... SELECT per kind. Core inserts bypass the ORM and call
+reindex() themselves, as student_import does.
+
+On SQLite the index is an external-content FTS5 table over search_document,
+kept current by triggers and ranked with bm25, titles weighing more than
+bodies. On MySQL it is a pair of InnoDB FULLTEXT indexes queried in boolean
+mode. Any other database falls back to unranked LIKE matching. Every query
+term matches as a prefix and all of them must match, so "ann smi" finds
+Anna Smith.
+
+`flask search rebuild` repopulates the index from the source tables;
+migration 9 builds it once for existing data.
+"""
+import re
+from collections import defaultdict
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, column, delete, event, func, insert, inspect, literal, select, text
+from sqlalchemy.orm import Session
+from models import db, SearchDocument, StudyMaterial, MCQ, Student, Staff
+
+search_cli = AppGroup('search', help='Maintain the full-text search index.')
+
+KINDS = ('material', 'mcq', 'student', 'staff')
+MODELS = {StudyMaterial: 'material', MCQ: 'mcq', Student: 'student', Staff: 'staff'}
+# Attributes copied into the index; changing any other column does not touch it
+WATCHED = {
+    'material': ('title', 'description', 'course_id'),
+    'mcq': ('question', 'option_a', 'option_b', 'option_c', 'option_d', 'material_id'),
+    'student': ('name', 'email', 'course_id'),
+    'staff': ('name', 'email'),
+}
+TERM_RE = re.compile(r'\w+')
+MAX_TERMS = 8
+TITLE_WEIGHT = 10.0
+EXCERPT_LENGTH = 200
+
+
+def _documents(kind):
+    """SELECT of (kind, ref_id, course_id, title, body) over the kind's source table, and its id column."""
+    if kind == 'material':
+        return select(literal(kind), StudyMaterial.material_id, StudyMaterial.course_id, StudyMaterial.title,
+                      StudyMaterial.description), StudyMaterial.material_id
+    if kind == 'mcq':
+        options = func.coalesce(MCQ.option_a, '')
+        for column in (MCQ.option_b, MCQ.option_c, MCQ.option_d):
+            options = options + ' ' + func.coalesce(column, '')
+        return select(literal(kind), MCQ.mcq_id, StudyMaterial.course_id, MCQ.question, options).join(
+            StudyMaterial, StudyMaterial.material_id == MCQ.material_id), MCQ.mcq_id
+    if kind == 'student':
+        return select(literal(kind), Student.student_id, Student.course_id, Student.name, Student.email), \
+            Student.student_id
+    return select(literal(kind), Staff.staff_id, literal(None, db.Integer), Staff.name, Staff.email), Staff.staff_id
+
+
+def _refresh(conn, kind, ids):
+    """Replace the documents of the rows with these ids."""
+    conn.execute(delete(SearchDocument).where(SearchDocument.kind == kind, SearchDocument.ref_id.in_(ids)))
+    documents, id_column = _documents(kind)
+    conn.execute(insert(SearchDocument).from_select(
+        ['kind', 'ref_id', 'course_id', 'title', 'body'], documents.where(id_column.in_(ids))
+    ))
+
+
+def reindex(model, *criteria):
+    """Refresh the documents of the model's rows matching criteria, for rows written without the ORM."""
+    kind = MODELS[model]
+    conn = db.session.connection()
+    ids = conn.execute(select(_documents(kind)[1]).where(*criteria)).scalars().all()
+    if ids:
+        _refresh(conn, kind, ids)
+
+
+def _row_id(state):
+    # Not state.identity: new rows only get their identity key after the flush completes
+    return state.mapper.primary_key_from_instance(state.obj())[0]
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_flushed(session, flush_context):
+    changed, removed = defaultdict(set), defaultdict(set)
+    moved_materials = set()
+    for obj in session.new:
+        kind = MODELS.get(type(obj))
+        if kind:
+            changed[kind].add(_row_id(inspect(obj)))
+    for obj in session.dirty:
+        kind = MODELS.get(type(obj))
+        if kind:
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in WATCHED[kind]):
+                changed[kind].add(_row_id(state))
+                if kind == 'material' and state.attrs.course_id.history.has_changes():
+                    moved_materials.add(_row_id(state))
+    for obj in session.deleted:
+        kind = MODELS.get(type(obj))
+        if kind:
+            removed[kind].add(_row_id(inspect(obj)))
+    if not (changed or removed):
+        return
+
+    conn = session.connection()
+    for kind, ids in changed.items():
+        _refresh(conn, kind, list(ids))
+    if moved_materials:
+        # Questions carry their material's course
+        mcq_ids = conn.execute(select(MCQ.mcq_id).where(MCQ.material_id.in_(moved_materials))).scalars().all()
+        if mcq_ids:
+            _refresh(conn, 'mcq', mcq_ids)
+    for kind, ids in removed.items():
+        conn.execute(delete(SearchDocument).where(SearchDocument.kind == kind, SearchDocument.ref_id.in_(ids)))
+
+
+def install(conn):
+    """Create the dialect's full-text index over search_document. Safe to re-run."""
+    if conn.dialect.name == 'sqlite':
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(title, body, content='search_document',"
+            " content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+        conn.execute(text(
+            'CREATE TRIGGER IF NOT EXISTS search_document_ai AFTER INSERT ON search_document BEGIN'
+            ' INSERT INTO search_fts (rowid, title, body) VALUES (new.id, new.title, new.body); END'
+        ))
+        conn.execute(text(
+            'CREATE TRIGGER IF NOT EXISTS search_document_ad AFTER DELETE ON search_document BEGIN'
+            " INSERT INTO search_fts (search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);"
+            ' END'
+        ))
+        conn.execute(text(
+            'CREATE TRIGGER IF NOT EXISTS search_document_au AFTER UPDATE ON search_document BEGIN'
+            " INSERT INTO search_fts (search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);"
+            ' INSERT INTO search_fts (rowid, title, body) VALUES (new.id, new.title, new.body); END'
+        ))
+    elif conn.dialect.name == 'mysql':
+        existing = {ix['name'] for ix in inspect(conn).get_indexes('search_document')}
+        if 'ft_search_document' not in existing:
+            conn.execute(text('ALTER TABLE search_document ADD FULLTEXT INDEX ft_search_document (title, body)'))
+        if 'ft_search_document_title' not in existing:
+            conn.execute(text('ALTER TABLE search_document ADD FULLTEXT INDEX ft_search_document_title (title)'))
+
+
+def rebuild(conn):
+    """Repopulate search_document from the source tables. Returns the number of documents."""
+    conn.execute(delete(SearchDocument))
+    for kind in KINDS:
+        documents, _ = _documents(kind)
+        conn.execute(insert(SearchDocument).from_select(['kind', 'ref_id', 'course_id', 'title', 'body'], documents))
+    if conn.dialect.name == 'sqlite':
+        conn.execute(text("INSERT INTO search_fts (search_fts) VALUES ('rebuild')"))
+    return conn.execute(select(func.count()).select_from(SearchDocument)).scalar()
+
+
+def terms(query):
+    return TERM_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def search(query, kinds=None, course_id=None, limit=20):
+    """Ranked documents matching every term of the query as a prefix.
+
+    Returns dicts with kind, id, course_id, title, excerpt and score (higher
+    is better). kinds restricts the result to some of KINDS and course_id to
+    one course's materials, questions and students.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    # From the engine: asking the session for a bind without a statement would pin the request to the primary
+    dialect = db.engine.dialect.name
+    filters, params = '', {'limit': limit}
+    if kinds:
+        filters += ' AND d.kind IN :kinds'
+        params['kinds'] = list(kinds)
+    if course_id is not None:
+        filters += ' AND d.course_id = :course_id'
+        params['course_id'] = course_id
+
+    if dialect == 'sqlite':
+        params['match'] = ' '.join('"{}"*'.format(word) for word in words)
+        sql = ('SELECT d.kind, d.ref_id, d.course_id, d.title, d.body, -bm25(search_fts, {}, 1.0) AS score'
+               ' FROM search_fts JOIN search_document d ON d.id = search_fts.rowid'
+               ' WHERE search_fts MATCH :match{} ORDER BY score DESC LIMIT :limit').format(TITLE_WEIGHT, filters)
+    elif dialect == 'mysql':
+        params['match'] = ' '.join('+{}*'.format(word) for word in words)
+        sql = ('SELECT d.kind, d.ref_id, d.course_id, d.title, d.body,'
+               ' {} * MATCH (d.title) AGAINST (:match IN BOOLEAN MODE)'
+               ' + MATCH (d.title, d.body) AGAINST (:match IN BOOLEAN MODE) AS score'
+               ' FROM search_document d WHERE MATCH (d.title, d.body) AGAINST (:match IN BOOLEAN MODE){}'
+               ' ORDER BY score DESC LIMIT :limit').format(TITLE_WEIGHT, filters)
+    else:
+        conditions = []
+        for i, word in enumerate(words):
+            params['w{}'.format(i)] = '%{}%'.format(word)
+            conditions.append('(LOWER(d.title) LIKE :w{0} OR LOWER(d.body) LIKE :w{0})'.format(i))
+        sql = ('SELECT d.kind, d.ref_id, d.course_id, d.title, d.body, 0 AS score FROM search_document d'
+               ' WHERE {}{} ORDER BY d.title LIMIT :limit').format(' AND '.join(conditions), filters)
+
+    statement = text(sql)
+    if kinds:
+        statement = statement.bindparams(bindparam('kinds', expanding=True))
+    # A textual SELECT, which the routing session sends to a replica like any other read
+    statement = statement.columns(*map(column, ('kind', 'ref_id', 'course_id', 'title', 'body', 'score')))
+    return [{
+        'kind': kind,
+        'id': ref_id,
+        'course_id': row_course_id,
+        'title': title,
+        'excerpt': (body or '')[:EXCERPT_LENGTH],
+        'score': round(float(score), 4),
+    } for kind, ref_id, row_course_id, title, body, score in db.session.execute(statement, params)]
+
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Repopulate the search index from the source tables."""
+    with db.engine.begin() as conn:
+        count = rebuild(conn)
+    click.echo('Indexed {} documents'.format(count))
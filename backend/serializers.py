@@ -0,0 +1,201 @@
+"""API shapes and the app's JSON provider.
+
+A Serializer names the fields of one response shape once. The first time it
+is used it is compiled into a plain function building one dict literal, with
+relationship hops and None checks inlined, so serializing a row costs a
+single function call instead of a call per field. Fields are given as
+
+    'name'                         the attribute of the same name
+    ('name', 'course.course_name') a path through relationships; None when a hop is None
+    ('name', callable)             callable(row), for anything computed
+    ('name', Many('path', shape))  a list, each item serialized with `shape`
+
+Serializers read attributes, so they work on ORM objects and on the Row
+tuples of column queries alike; list endpoints that select only the columns
+they send skip building ORM objects altogether.
+
+Dates, datetimes and Decimals are passed through untouched: JSONProvider
+writes them as ISO 8601 strings and numbers. It uses orjson when installed
+and the standard library otherwise.
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: a faster encoder, same output
+    orjson = None
+
+
+class Many:
+    def __init__(self, path, serializer):
+        self.path = path
+        self.serializer = serializer
+
+
+class Serializer:
+    def __init__(self, *fields):
+        self.fields = [(field, field) if isinstance(field, str) else tuple(field) for field in fields]
+        self._compiled = None
+
+    def __call__(self, row):
+        return (self._compiled or self._compile())(row)
+
+    def many(self, rows):
+        serialize = self._compiled or self._compile()
+        return [serialize(row) for row in rows]
+
+    def extend(self, *fields):
+        """A new serializer with these fields added after this one's."""
+        return Serializer(*self.fields, *fields)
+
+    def _compile(self):
+        env, lines, items, hops = {}, [], [], {}
+
+        def walk(path):
+            # Returns an expression for obj.<path>, assigning each relationship hop to a local once
+            parts = path.split('.')
+            for part in parts:
+                if not part.isidentifier():
+                    raise ValueError('Bad field path: {!r}'.format(path))
+            expr = 'obj'
+            for depth in range(1, len(parts)):
+                prefix = '.'.join(parts[:depth])
+                if prefix not in hops:
+                    hops[prefix] = '_h{}'.format(len(hops))
+                    source = '{}.{}'.format(expr, parts[depth - 1]) if depth == 1 else \
+                        '({0}.{1} if {0} is not None else None)'.format(expr, parts[depth - 1])
+                    lines.append('    {} = {}'.format(hops[prefix], source))
+                expr = hops[prefix]
+            if len(parts) == 1:
+                return 'obj.{}'.format(parts[0])
+            return '({0}.{1} if {0} is not None else None)'.format(expr, parts[-1])
+
+        for i, (name, source) in enumerate(self.fields):
+            if isinstance(source, Many):
+                env['_s{}'.format(i)] = source.serializer
+                value = '_s{}.many({})'.format(i, walk(source.path))
+            elif callable(source):
+                env['_f{}'.format(i)] = source
+                value = '_f{}(obj)'.format(i)
+            else:
+                value = walk(source)
+            items.append('{!r}: {}'.format(name, value))
+
+        code = 'def serialize(obj):\n{}    return {{{}}}\n'.format(
+            ''.join(line + '\n' for line in lines), ', '.join(items))
+        exec(compile(code, '<serializer>', 'exec'), env)
+        self._compiled = env['serialize']
+        return self._compiled
+
+
+def _default(o):
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, (date, datetime, time)):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Dates as ISO 8601 and Decimals as numbers, encoded by orjson when available."""
+    default = staticmethod(_default)
+    sort_keys = False
+
+    def _orjson_options(self):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            kwargs.setdefault('default', self.default)
+            kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# Shapes shared by the blueprints
+
+ACADEMIC_YEAR = Serializer('academic_year_id', 'year', 'start_date', 'end_date', 'status')
+
+PROGRAM = Serializer(
+    'program_id', 'program_name', 'description', 'duration_months', 'semester', 'academic_year_id',
+    ('academic_year_name', 'academic_year.year'), 'status'
+)
+
+LINKED_PROGRAM = Serializer(
+    'program_id', ('program_name', 'program.program_name'), ('semester', 'program.semester')
+)
+
+COURSE = Serializer(
+    'course_id', 'course_name', 'description', 'credits', 'staff_id', ('teacher_name', 'teacher.name'),
+    ('linked_programs', Many('program_courses', LINKED_PROGRAM.extend(
+        ('academic_year_id', 'program.academic_year_id'), ('academic_year_name', 'program.academic_year.year')
+    ))),
+    'status'
+)
+
+# A teacher's own course list leaves out the academic years
+STAFF_COURSE = Serializer(
+    'course_id', 'course_name', 'description', 'credits', 'staff_id', ('teacher_name', 'teacher.name'),
+    ('linked_programs', Many('program_courses', LINKED_PROGRAM)), 'status'
+)
+
+PROGRAM_COURSE = Serializer(
+    'program_course_id', 'course_id', ('course_name', 'course.course_name'), 'semester',
+    ('credits', 'course.credits')
+)
+
+STAFF = Serializer(
+    'staff_id', 'name', 'email', 'phone', 'qualifications', 'status',
+    ('has_password', lambda s: s.password_hash is not None)
+)
+
+# Rows of the student list queries, with program_name and course_name selected as columns
+STUDENT_ROW = Serializer('student_id', 'name', 'email', 'contact', 'program_id', 'program_name', 'course_id',
+                         'course_name')
+ROSTER_ROW = Serializer('student_id', 'name', 'email', 'contact', 'course_id', 'course_name')
+
+STUDENT_PROFILE = Serializer('student_id', 'name', 'email', 'dob', 'contact', 'parent_name', 'program_id')
+
+MATERIAL = Serializer(
+    'material_id', 'course_id', 'title', 'description', 'material_type', 'video_url', 'file_path',
+    'duration_minutes', 'order_index', 'upload_date'
+)
+
+ASSIGNMENT = Serializer('assignment_id', 'title', 'instructions', 'due_date')
+
+# correct_option is deliberately left out; students receive it after submitting
+MCQ_QUESTION = Serializer('mcq_id', 'question', 'option_a', 'option_b', 'option_c', 'option_d')
+
+QUIZ_RESULT = Serializer('result_id', 'mcq_id', 'status', 'grade')
+
+STUDENT_RESULT = Serializer('result_id', 'status', 'grade', ('marks', 'evaluation.marks'))
+
+INBOX_ROW = Serializer(
+    'submission_id', 'assignment_id', 'assignment_title', 'student_id', 'student_name', 'student_email',
+    'course_name', 'material_title', 'assignment_text', 'file_path', 'submitted_date',
+    ('is_evaluated', lambda r: r.evaluation_id is not None), 'marks', 'feedback'
+)
+
+JOB = Serializer(
+    'job_id', 'kind', 'status', 'attempts', 'max_attempts', 'last_error', 'idempotency_key', 'created_at',
+    'run_after', 'finished_at'
+)
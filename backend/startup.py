@@ -0,0 +1,79 @@
+"""Startup modes and timing.
+
+SCHEMA_STARTUP decides what create_app does with the database schema:
+
+upgrade  Apply pending migrations (the default). When the schema is already
+         current this costs one SELECT, no DDL.
+check    Read the schema version and refuse to start if migrations are
+         pending. For pre-forked workers and autoscaled instances, with
+         `flask schema upgrade` run once per deploy.
+skip     Do not touch the database at all.
+
+With STARTUP_WARMUP the ORM mappers are configured and a pooled connection
+opened before the app is returned, instead of on the first request, which
+otherwise pays for both. Each phase of create_app is timed; the breakdown is
+logged and served at /api/admin/startup.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+
+log = logging.getLogger(__name__)
+
+SCHEMA_MODES = ('upgrade', 'check', 'skip')
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []  # (name, seconds), in order
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def report(self):
+        return {
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'phases_ms': {name: round(seconds * 1000, 2) for name, seconds in self.phases},
+        }
+
+
+def prepare_schema(app):
+    """Bring the schema up to date or check it, per SCHEMA_STARTUP. Call inside an app context."""
+    from migrations import LATEST_VERSION, stored_version, upgrade
+    mode = app.config['SCHEMA_STARTUP']
+    if mode not in SCHEMA_MODES:
+        raise ValueError('SCHEMA_STARTUP must be one of {}'.format(', '.join(SCHEMA_MODES)))
+    if mode == 'upgrade':
+        applied = upgrade()
+        if applied:
+            log.info('Applied migrations: %s', ', '.join(str(v) for v in applied))
+    elif mode == 'check':
+        version = stored_version()
+        if version < LATEST_VERSION:
+            raise RuntimeError('Database schema is at version {}, this release needs {}; '
+                               'run `flask schema upgrade` first'.format(version, LATEST_VERSION))
+        if version > LATEST_VERSION:
+            # A newer release has migrated already; migrations only add, so keep serving
+            log.warning('Database schema version %s is newer than this release (%s)', version, LATEST_VERSION)
+
+
+def warm_up():
+    """Configure the ORM mappers and open a pooled connection. Call inside an app context."""
+    from models import db
+    configure_mappers()
+    with db.engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+
+
+def finish(app, timer):
+    app.extensions['startup'] = timer.report()
+    log.info('Started in %.1f ms (%s)', app.extensions['startup']['total_ms'],
+             ', '.join('{} {:.1f}'.format(name, seconds * 1000) for name, seconds in timer.phases))
@@ -0,0 +1,184 @@
+"""Bulk student import from CSV or NDJSON.
+
+Rows are read lazily and processed in chunks: each chunk is validated in
+memory, checked against existing emails and course/program ids with one query
+each, and inserted with a single executemany. Invalid rows are reported and
+skipped without aborting the rest of the import.
+"""
+import codecs
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+import click
+from flask.cli import AppGroup
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from models import db, Student, Course, Program
+from search import reindex
+
+students_cli = AppGroup('students', help='Student administration commands.')
+
+CHUNK_SIZE = 1000
+FORMATS = ('csv', 'ndjson')
+
+# Optional text fields accepted from an import row
+TEXT_FIELDS = ('contact', 'parent_name', 'parent_contact', 'parent_email')
+
+
+def read_rows(lines, fmt):
+    """Yield row dicts from an iterable of text lines."""
+    if fmt == 'csv':
+        for row in csv.DictReader(lines):
+            yield {key.strip(): (value.strip() if value else None) for key, value in row.items() if key}
+    elif fmt == 'ndjson':
+        for line in lines:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+    else:
+        raise ValueError('Unknown import format: {}'.format(fmt))
+
+
+def decode_lines(binary_lines):
+    return codecs.iterdecode(binary_lines, 'utf-8-sig')
+
+
+def _max_length(field):
+    return Student.__table__.c[field].type.length
+
+
+def _parse_id(value, field):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('{} must be an integer'.format(field))
+
+
+def _validate(row):
+    """Turn an import row into Student column values, or raise ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError('Row is not a JSON object')
+
+    values = {}
+    for field in ('name', 'email'):
+        value = row.get(field)
+        if not value:
+            raise ValueError('{} is required'.format(field))
+        values[field] = str(value).strip()
+
+    for field in TEXT_FIELDS:
+        # Every row carries every column so the chunk can go out as one executemany
+        values[field] = str(row[field]).strip() if row.get(field) else None
+
+    for field, value in values.items():
+        if value and len(value) > _max_length(field):
+            raise ValueError('{} is longer than {} characters'.format(field, _max_length(field)))
+
+    values['dob'] = None
+    if row.get('dob'):
+        try:
+            values['dob'] = datetime.strptime(str(row['dob']), '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('dob must be YYYY-MM-DD')
+
+    values['password_hash'] = row.get('password') or None  # Store as plain text, as create_student does
+    values['course_id'] = _parse_id(row.get('course_id'), 'course_id')
+    values['program_id'] = _parse_id(row.get('program_id'), 'program_id')
+    return values
+
+
+def _import_chunk(numbered_rows, seen_emails, errors):
+    valid = []
+    for number, row in numbered_rows:
+        try:
+            valid.append((number, _validate(row)))
+        except ValueError as e:
+            errors.append({'row': number, 'error': str(e)})
+
+    if not valid:
+        return 0
+
+    # One query each for emails already taken and referenced courses/programs that exist
+    emails = {values['email'] for _, values in valid}
+    taken = set(db.session.scalars(db.select(Student.email).where(Student.email.in_(emails))))
+    course_ids = {values['course_id'] for _, values in valid if values['course_id']}
+    program_ids = {values['program_id'] for _, values in valid if values['program_id']}
+    known_courses = set(db.session.scalars(
+        db.select(Course.course_id).where(Course.course_id.in_(course_ids))
+    )) if course_ids else set()
+    known_programs = set(db.session.scalars(
+        db.select(Program.program_id).where(Program.program_id.in_(program_ids))
+    )) if program_ids else set()
+
+    batch = []
+    for number, values in valid:
+        if values['email'] in taken or values['email'] in seen_emails:
+            errors.append({'row': number, 'error': 'Email already registered'})
+        elif values['course_id'] and values['course_id'] not in known_courses:
+            errors.append({'row': number, 'error': 'Unknown course_id {}'.format(values['course_id'])})
+        elif values['program_id'] and values['program_id'] not in known_programs:
+            errors.append({'row': number, 'error': 'Unknown program_id {}'.format(values['program_id'])})
+        else:
+            seen_emails.add(values['email'])
+            batch.append((number, values))
+
+    if not batch:
+        return 0
+
+    try:
+        db.session.execute(insert(Student), [values for _, values in batch])
+        reindex(Student, Student.email.in_([values['email'] for _, values in batch]))
+        db.session.commit()
+        return len(batch)
+    except IntegrityError:
+        # A concurrent writer took one of the emails; retry row by row to pinpoint it
+        db.session.rollback()
+
+    created = 0
+    for number, values in batch:
+        try:
+            db.session.execute(insert(Student), [values])
+            reindex(Student, Student.email == values['email'])
+            db.session.commit()
+            created += 1
+        except IntegrityError:
+            db.session.rollback()
+            errors.append({'row': number, 'error': 'Email already registered'})
+    return created
+
+
+def import_students(rows, chunk_size=CHUNK_SIZE):
+    """Import an iterable of row dicts. Returns {'created', 'failed', 'errors'}."""
+    numbered = enumerate(rows, start=1)
+    seen_emails = set()
+    errors = []
+    created = 0
+
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        created += _import_chunk(chunk, seen_emails, errors)
+
+    errors.sort(key=lambda error: error['row'])
+    return {'created': created, 'failed': len(errors), 'errors': errors}
+
+
+@students_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=CHUNK_SIZE, show_default=True)
+def import_command(path, fmt, chunk_size):
+    """Import students from a CSV or NDJSON file."""
+    fmt = fmt or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        summary = import_students(read_rows(f, fmt), chunk_size)
+
+    for error in summary['errors']:
+        click.echo('row {}: {}'.format(error['row'], error['error']), err=True)
+    click.echo('Created {} students, {} rows failed'.format(summary['created'], summary['failed']))
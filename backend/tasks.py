@@ -0,0 +1,57 @@
+"""Background job handlers. Imported by create_app so every process knows them."""
+from certificates import issue_next_chunk
+from jobs import job_handler
+from outbox import dispatch_pending, notify_student
+from models import db, AssignmentEvaluation, AssignmentSubmission, Assignment, Communication, Result
+
+
+def grade_for_marks(marks):
+    if marks >= 90:
+        return 'A+'
+    elif marks >= 80:
+        return 'A'
+    elif marks >= 70:
+        return 'B'
+    elif marks >= 60:
+        return 'C'
+    elif marks >= 50:
+        return 'D'
+    return 'F'
+
+
+@job_handler('generate_result')
+def generate_result(payload):
+    """Create or refresh the Result for an assignment evaluation and tell the student."""
+    evaluation = db.session.get(AssignmentEvaluation, payload['evaluation_id'])
+    if evaluation is None or evaluation.marks is None:
+        return
+    marks = float(evaluation.marks)
+    submission = db.session.get(AssignmentSubmission, evaluation.submission_id)
+
+    result = Result.query.filter_by(evaluation_id=evaluation.evaluation_id).first()
+    if result is None:
+        result = Result(student_id=submission.student_id, evaluation_id=evaluation.evaluation_id)
+        db.session.add(result)
+    status, grade = 'Pass' if marks >= 40 else 'Fail', grade_for_marks(marks)
+    if (result.status, result.grade) == (status, grade):
+        return
+    result.status = status
+    result.grade = grade
+    db.session.flush()
+
+    title = db.session.query(Assignment.title).filter_by(assignment_id=submission.assignment_id).scalar()
+    message = 'Your result for "{}" is {} with grade {}.'.format(title, status, grade)
+    communication = Communication(result_id=result.result_id, message=message)
+    db.session.add(communication)
+    db.session.flush()
+    notify_student(submission.student, 'Result published: {}'.format(title), message, communication.communication_id)
+
+
+@job_handler('issue_certificate_batch')
+def issue_certificate_batch(payload):
+    issue_next_chunk(payload['batch_id'])
+
+
+@job_handler('dispatch_outbox')
+def dispatch_outbox(payload):
+    dispatch_pending()
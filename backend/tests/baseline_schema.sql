@@ -0,0 +1,179 @@
+-- The schema as it stood before versioned migrations (SQLite, as db.create_all() built it).
+-- test_migrations upgrades a database created from this.
+CREATE TABLE academic_year (
+	academic_year_id INTEGER NOT NULL, 
+	year VARCHAR(20) NOT NULL, 
+	start_date DATE NOT NULL, 
+	end_date DATE NOT NULL, 
+	status VARCHAR(8), 
+	PRIMARY KEY (academic_year_id)
+);
+CREATE TABLE staff (
+	staff_id INTEGER NOT NULL, 
+	name VARCHAR(100) NOT NULL, 
+	email VARCHAR(100) NOT NULL, 
+	password_hash VARCHAR(255), 
+	phone VARCHAR(20), 
+	qualifications TEXT, 
+	status VARCHAR(8), 
+	PRIMARY KEY (staff_id), 
+	UNIQUE (email)
+);
+CREATE TABLE program (
+	program_id INTEGER NOT NULL, 
+	program_name VARCHAR(100) NOT NULL, 
+	description TEXT, 
+	duration_months INTEGER, 
+	semester INTEGER NOT NULL, 
+	academic_year_id INTEGER, 
+	status VARCHAR(8), 
+	PRIMARY KEY (program_id), 
+	FOREIGN KEY(academic_year_id) REFERENCES academic_year (academic_year_id)
+);
+CREATE TABLE course (
+	course_id INTEGER NOT NULL, 
+	course_name VARCHAR(100) NOT NULL, 
+	description TEXT, 
+	credits INTEGER, 
+	staff_id INTEGER, 
+	status VARCHAR(8), 
+	PRIMARY KEY (course_id), 
+	FOREIGN KEY(staff_id) REFERENCES staff (staff_id)
+);
+CREATE TABLE program_course (
+	program_course_id INTEGER NOT NULL, 
+	program_id INTEGER NOT NULL, 
+	course_id INTEGER NOT NULL, 
+	semester INTEGER NOT NULL, 
+	PRIMARY KEY (program_course_id), 
+	FOREIGN KEY(program_id) REFERENCES program (program_id), 
+	FOREIGN KEY(course_id) REFERENCES course (course_id)
+);
+CREATE TABLE study_material (
+	material_id INTEGER NOT NULL, 
+	course_id INTEGER NOT NULL, 
+	title VARCHAR(200) NOT NULL, 
+	description TEXT, 
+	material_type VARCHAR(10), 
+	video_url VARCHAR(500), 
+	file_path VARCHAR(255), 
+	duration_minutes INTEGER, 
+	order_index INTEGER, 
+	upload_date DATE, 
+	uploaded_by INTEGER, 
+	PRIMARY KEY (material_id), 
+	FOREIGN KEY(course_id) REFERENCES course (course_id), 
+	FOREIGN KEY(uploaded_by) REFERENCES staff (staff_id)
+);
+CREATE TABLE student (
+	student_id INTEGER NOT NULL, 
+	name VARCHAR(100) NOT NULL, 
+	email VARCHAR(100) NOT NULL, 
+	password_hash VARCHAR(255), 
+	dob DATE, 
+	contact VARCHAR(20), 
+	parent_name VARCHAR(100), 
+	parent_contact VARCHAR(20), 
+	parent_email VARCHAR(100), 
+	course_id INTEGER, 
+	program_id INTEGER, 
+	PRIMARY KEY (student_id), 
+	UNIQUE (email), 
+	FOREIGN KEY(course_id) REFERENCES course (course_id), 
+	FOREIGN KEY(program_id) REFERENCES program (program_id)
+);
+CREATE TABLE assignment (
+	assignment_id INTEGER NOT NULL, 
+	material_id INTEGER NOT NULL, 
+	title VARCHAR(200) NOT NULL, 
+	instructions TEXT, 
+	due_date DATE, 
+	PRIMARY KEY (assignment_id), 
+	FOREIGN KEY(material_id) REFERENCES study_material (material_id)
+);
+CREATE TABLE mcq (
+	mcq_id INTEGER NOT NULL, 
+	material_id INTEGER NOT NULL, 
+	question TEXT NOT NULL, 
+	option_a VARCHAR(200), 
+	option_b VARCHAR(200), 
+	option_c VARCHAR(200), 
+	option_d VARCHAR(200), 
+	correct_option VARCHAR(1), 
+	PRIMARY KEY (mcq_id), 
+	FOREIGN KEY(material_id) REFERENCES study_material (material_id)
+);
+CREATE TABLE payment (
+	payment_id INTEGER NOT NULL, 
+	student_id INTEGER NOT NULL, 
+	amount NUMERIC(10, 2) NOT NULL, 
+	date DATE, 
+	method VARCHAR(13), 
+	status VARCHAR(9), 
+	PRIMARY KEY (payment_id), 
+	FOREIGN KEY(student_id) REFERENCES student (student_id)
+);
+CREATE TABLE feedback (
+	feedback_id INTEGER NOT NULL, 
+	student_id INTEGER NOT NULL, 
+	rating INTEGER, 
+	comments TEXT, 
+	date DATE, 
+	PRIMARY KEY (feedback_id), 
+	FOREIGN KEY(student_id) REFERENCES student (student_id)
+);
+CREATE TABLE assignment_submission (
+	submission_id INTEGER NOT NULL, 
+	assignment_id INTEGER NOT NULL, 
+	student_id INTEGER NOT NULL, 
+	file_path VARCHAR(255), 
+	submitted_date DATE, 
+	assignment_text TEXT, 
+	PRIMARY KEY (submission_id), 
+	FOREIGN KEY(assignment_id) REFERENCES assignment (assignment_id), 
+	FOREIGN KEY(student_id) REFERENCES student (student_id)
+);
+CREATE TABLE assignment_evaluation (
+	evaluation_id INTEGER NOT NULL, 
+	submission_id INTEGER NOT NULL, 
+	marks NUMERIC(5, 2), 
+	feedback TEXT, 
+	evaluated_by INTEGER, 
+	PRIMARY KEY (evaluation_id), 
+	FOREIGN KEY(submission_id) REFERENCES assignment_submission (submission_id), 
+	FOREIGN KEY(evaluated_by) REFERENCES staff (staff_id)
+);
+CREATE TABLE result (
+	result_id INTEGER NOT NULL, 
+	student_id INTEGER NOT NULL, 
+	evaluation_id INTEGER, 
+	mcq_id INTEGER, 
+	status VARCHAR(4), 
+	grade VARCHAR(5), 
+	PRIMARY KEY (result_id), 
+	FOREIGN KEY(student_id) REFERENCES student (student_id), 
+	FOREIGN KEY(evaluation_id) REFERENCES assignment_evaluation (evaluation_id), 
+	FOREIGN KEY(mcq_id) REFERENCES mcq (mcq_id)
+);
+CREATE TABLE communication (
+	communication_id INTEGER NOT NULL, 
+	submission_id INTEGER, 
+	result_id INTEGER, 
+	message TEXT NOT NULL, 
+	sent_date DATETIME, 
+	PRIMARY KEY (communication_id), 
+	FOREIGN KEY(submission_id) REFERENCES assignment_submission (submission_id), 
+	FOREIGN KEY(result_id) REFERENCES result (result_id)
+);
+CREATE TABLE certificate (
+	certificate_id INTEGER NOT NULL, 
+	student_id INTEGER NOT NULL, 
+	result_id INTEGER, 
+	issue_date DATE, 
+	certificate_number VARCHAR(50), 
+	status VARCHAR(7), 
+	PRIMARY KEY (certificate_id), 
+	FOREIGN KEY(student_id) REFERENCES student (student_id), 
+	FOREIGN KEY(result_id) REFERENCES result (result_id), 
+	UNIQUE (certificate_number)
+);
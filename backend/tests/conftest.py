@@ -0,0 +1,66 @@
+import os
+import sys
+
+# Config reads the environment on import: a throwaway database and no background job threads
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+os.environ['JOB_WORKER_THREADS'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+import pytest
+from app import create_app
+from jobs import claim_due_jobs, run_job
+from models import db, Job, Staff, Course, StudyMaterial, MCQ, Student
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app()
+    # Files go to the test's own directory, never the instance folder
+    app.config.update(UPLOAD_FOLDER=str(tmp_path / 'uploads'), MAIL_FILE_DIR=str(tmp_path / 'mail'),
+                      CERTIFICATE_RENDER_PROCESSES=1)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def run_jobs(app):
+    """Run queued jobs until none is left, ignoring run_after (retry backoff included). Returns how many ran."""
+    def run():
+        count = 0
+        while True:
+            Job.query.filter_by(status='Queued').update({Job.run_after: datetime(2000, 1, 1)})
+            db.session.commit()
+            job_ids = claim_due_jobs(10)
+            if not job_ids:
+                return count
+            for job_id in job_ids:
+                run_job(job_id)
+                count += 1
+    return run
+
+
+@pytest.fixture
+def quiz(app):
+    """A student and a course with two questions whose answer is A. Returns (student_id, course_id, mcq_ids)."""
+    staff = Staff(name='Teacher', email='teacher@example.com', password_hash='x')
+    db.session.add(staff)
+    db.session.flush()
+    course = Course(course_name='German A1', staff_id=staff.staff_id)
+    db.session.add(course)
+    db.session.flush()
+    material = StudyMaterial(course_id=course.course_id, title='Lesson 1', order_index=1)
+    student = Student(name='Student', email='student@example.com', course_id=course.course_id)
+    db.session.add_all([material, student])
+    db.session.flush()
+    mcqs = [MCQ(material_id=material.material_id, question='Q{}'.format(i), option_a='a', option_b='b',
+                correct_option='A') for i in range(2)]
+    db.session.add_all(mcqs)
+    db.session.commit()
+    return student.student_id, course.course_id, [mcq.mcq_id for mcq in mcqs]
@@ -0,0 +1,53 @@
+import catalog_cache
+from catalog_cache import bump_version, current_version
+from models import db, CatalogVersion, Course, Program, ProgramCourse
+from routes import academic_routes
+
+
+def test_migrations_seed_the_version_row(app):
+    assert db.session.get(CatalogVersion, 1) is not None
+    before = current_version()
+    bump_version()
+    db.session.commit()
+    assert current_version() == before + 1
+
+
+def test_bump_creates_a_missing_row(app):
+    CatalogVersion.query.delete()
+    db.session.commit()
+    bump_version()
+    db.session.commit()
+    assert current_version() == 1
+
+
+def test_course_and_program_links_commit_together(app, client, monkeypatch):
+    program = Program(program_name='BCA')
+    db.session.add(program)
+    db.session.commit()
+
+    def fail():
+        raise RuntimeError('lost the connection')
+
+    monkeypatch.setattr(academic_routes, 'bump_version', fail)
+    response = client.post('/api/academic/courses', json={'course_name': 'German A1',
+                                                          'program_ids': [program.program_id]})
+    assert response.status_code == 500
+    db.session.rollback()
+    assert Course.query.count() == 0
+
+    monkeypatch.undo()
+    response = client.post('/api/academic/courses', json={'course_name': 'German A1',
+                                                          'program_ids': [program.program_id]})
+    assert response.status_code == 201
+    assert ProgramCourse.query.filter_by(course_id=response.get_json()['course_id']).count() == 1
+
+
+def test_catalog_is_served_from_cache_until_a_write(client):
+    catalog_cache._entries.clear()
+    hits = catalog_cache.stats()['hits']
+    assert client.get('/api/academic/courses').get_json() == []
+    assert client.get('/api/academic/courses').get_json() == []
+    assert catalog_cache.stats()['hits'] == hits + 1
+
+    client.post('/api/academic/courses', json={'course_name': 'German A1'})
+    assert [c['course_name'] for c in client.get('/api/academic/courses').get_json()] == ['German A1']
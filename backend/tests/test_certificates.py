@@ -0,0 +1,76 @@
+import pytest
+import certificates
+from certificates import start_batch
+from models import db, Certificate, CertificateBatch, Job, MCQ, Program, ProgramCourse, Course, Result, Student, \
+    StudyMaterial
+
+STUDENTS = 5
+
+
+@pytest.fixture
+def program(app, monkeypatch):
+    """A one-course program whose STUDENTS students all passed its only question. Returns the program_id."""
+    monkeypatch.setattr(certificates, 'CHUNK_SIZE', 2)
+    monkeypatch.setattr(certificates, 'NUMBER_BLOCK_SIZE', 4)
+    program = Program(program_name='BCA')
+    course = Course(course_name='German A1')
+    db.session.add_all([program, course])
+    db.session.flush()
+    material = StudyMaterial(course_id=course.course_id, title='Lesson 1', order_index=1)
+    db.session.add_all([material, ProgramCourse(program_id=program.program_id, course_id=course.course_id, semester=1)])
+    db.session.flush()
+    mcq = MCQ(material_id=material.material_id, question='Q', option_a='a', correct_option='A')
+    db.session.add(mcq)
+    db.session.flush()
+    for i in range(STUDENTS):
+        student = Student(name='Student {}'.format(i), email='s{}@example.com'.format(i), program_id=program.program_id)
+        db.session.add(student)
+        db.session.flush()
+        db.session.add(Result(student_id=student.student_id, mcq_id=mcq.mcq_id, status='Pass', grade='A'))
+    db.session.commit()
+    return program.program_id
+
+
+def _numbers(program_id):
+    return sorted(c.certificate_number for c in Certificate.query.filter_by(program_id=program_id))
+
+
+def test_batch_certifies_every_passing_student(program, run_jobs):
+    batch, job, created = start_batch(program)
+    assert created and job is not None
+    run_jobs()
+
+    batch = db.session.get(CertificateBatch, batch.batch_id)
+    assert (batch.status, batch.issued, batch.total) == ('Done', STUDENTS, STUDENTS)
+    assert _numbers(program) == [certificates.format_number(n) for n in range(1, STUDENTS + 1)]
+
+
+def test_batch_resumes_after_its_job_fails_for_good(program, run_jobs, monkeypatch):
+    store_bytes = certificates.store_bytes
+    stored = []
+
+    def store_two(data, content_type):
+        # The second chunk fails on every attempt
+        if len(stored) == 2:
+            raise OSError('disk full')
+        stored.append(content_type)
+        return store_bytes(data, content_type)
+
+    monkeypatch.setattr(certificates, 'store_bytes', store_two)
+    batch, _, _ = start_batch(program)
+    run_jobs()
+    failed = Job.query.filter_by(status='Failed').one()
+    assert failed.attempts == failed.max_attempts
+    assert db.session.get(CertificateBatch, batch.batch_id).status == 'Running'
+    assert len(_numbers(program)) == 2
+
+    monkeypatch.setattr(certificates, 'store_bytes', store_bytes)
+    resumed, job, created = start_batch(program)
+    assert (resumed.batch_id, job.job_id, created) == (batch.batch_id, failed.job_id, False)
+    assert job.status == 'Queued'
+    run_jobs()
+
+    numbers = _numbers(program)
+    assert db.session.get(CertificateBatch, batch.batch_id).status == 'Done'
+    assert numbers == [certificates.format_number(n) for n in range(1, STUDENTS + 1)]
+    assert Certificate.query.filter_by(program_id=program).count() == STUDENTS
@@ -0,0 +1,62 @@
+import pytest
+from models import db, Course, Student
+
+
+@pytest.fixture
+def student_id(app):
+    student = Student(name='Anna Smith', email='anna@example.com')
+    db.session.add(student)
+    db.session.commit()
+    return student.student_id
+
+
+def _get(client, url, etag=None):
+    return client.get(url, headers={'If-None-Match': etag} if etag else {})
+
+
+def test_unchanged_rows_are_answered_304(client, student_id):
+    response = _get(client, '/api/student/students')
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+    assert etag.startswith('W/')
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert 'Last-Modified' in response.headers
+
+    response = _get(client, '/api/student/students', etag)
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_edits_and_deletes_change_the_etag(client, student_id):
+    etag = _get(client, '/api/student/students').headers['ETag']
+
+    db.session.get(Student, student_id).name = 'Anna Jones'
+    db.session.commit()
+    response = _get(client, '/api/student/students', etag)
+    assert response.status_code == 200
+    assert response.get_json()[0]['name'] == 'Anna Jones'
+    edited = response.headers['ETag']
+    assert edited != etag
+
+    # A delete leaves MAX(updated_at) as it was; the count notices it
+    other = Student(name='Bruno Weber', email='bruno@example.com')
+    db.session.add(other)
+    db.session.commit()
+    added = _get(client, '/api/student/students').headers['ETag']
+    db.session.delete(other)
+    db.session.commit()
+    assert _get(client, '/api/student/students', added).status_code == 200
+
+
+def test_query_string_is_part_of_the_etag(client, student_id):
+    etag = _get(client, '/api/student/students').headers['ETag']
+    assert _get(client, '/api/student/students?limit=1', etag).status_code == 200
+
+
+def test_catalog_writes_change_catalog_etags(client):
+    etag = _get(client, '/api/academic/courses').headers['ETag']
+    assert _get(client, '/api/academic/courses', etag).status_code == 304
+    client.post('/api/academic/courses', json={'course_name': 'German A1'})
+    assert Course.query.count() == 1
+    assert _get(client, '/api/academic/courses', etag).status_code == 200
@@ -0,0 +1,109 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from jobs import RUNNING_TIMEOUT, claim_due_jobs, enqueue, job_handler, run_job
+from models import db, Job
+
+calls = []
+
+
+@job_handler('test_record')
+def record(payload):
+    calls.append(payload)
+
+
+@job_handler('test_fail')
+def fail(payload):
+    raise ValueError('nope')
+
+
+@job_handler('test_overrun')
+def overrun(payload):
+    # Runs past RUNNING_TIMEOUT: another worker requeues and claims the job meanwhile
+    job = db.session.get(Job, payload['job_id'])
+    job.locked_at = datetime.utcnow() - RUNNING_TIMEOUT - timedelta(seconds=1)
+    db.session.commit()
+    assert claim_due_jobs(10) == [job.job_id]
+    enqueue('test_record', {'written_by': 'stale run'})
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+def _job(kind, payload=None, **kwargs):
+    job = enqueue(kind, payload or {}, **kwargs)
+    db.session.commit()
+    return job
+
+
+def test_idempotency_key_returns_the_existing_job(app):
+    first = _job('test_record', idempotency_key='k1')
+    assert _job('test_record', idempotency_key='k1').job_id == first.job_id
+    assert _job('test_record', idempotency_key='k2').job_id != first.job_id
+    assert Job.query.count() == 2
+
+
+def test_only_due_queued_jobs_are_claimed_once(app):
+    due = _job('test_record')
+    _job('test_record', delay=60)
+    assert claim_due_jobs(10) == [due.job_id]
+    assert claim_due_jobs(10) == []
+    db.session.refresh(due)
+    assert (due.status, due.attempts) == ('Running', 1)
+
+
+def test_successful_run_is_done(app):
+    job = _job('test_record', {'n': 1})
+    claim_due_jobs(10)
+    run_job(job.job_id)
+    db.session.refresh(job)
+    assert (job.status, job.last_error) == ('Done', None)
+    assert job.finished_at is not None
+    assert calls == [{'n': 1}]
+
+
+def test_failures_back_off_then_fail(app, run_jobs):
+    job = _job('test_fail', max_attempts=2)
+    claim_due_jobs(10)
+    before = datetime.utcnow()
+    run_job(job.job_id)
+    db.session.refresh(job)
+    assert (job.status, job.attempts, job.last_error) == ('Queued', 1, 'ValueError: nope')
+    assert job.run_after >= before + timedelta(seconds=2)
+    assert claim_due_jobs(10) == []
+
+    run_jobs()
+    db.session.refresh(job)
+    assert (job.status, job.attempts) == ('Failed', 2)
+    assert job.finished_at is not None
+
+
+def test_stale_run_does_not_overwrite_the_new_claim(app):
+    job = _job('test_overrun')
+    job.payload = json.dumps({'job_id': job.job_id})
+    db.session.commit()
+    claim_due_jobs(10)
+    run_job(job.job_id)
+
+    db.session.refresh(job)
+    # Still running under the second claim, and the stale run's writes were rolled back
+    assert (job.status, job.attempts) == ('Running', 2)
+    assert Job.query.count() == 1
+
+
+def test_job_endpoints(app, client):
+    job = _job('test_fail', max_attempts=1)
+    claim_due_jobs(10)
+    run_job(job.job_id)
+
+    response = client.get('/api/jobs/{}'.format(job.job_id))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['status'], body['last_error']) == ('Failed', 'ValueError: nope')
+    assert client.get('/api/jobs/{}'.format(job.job_id), headers={'If-None-Match': response.headers['ETag']}
+                      ).status_code == 304
+    assert client.get('/api/jobs/999').status_code == 404
+    assert [j['job_id'] for j in client.get('/api/jobs?status=Failed').get_json()] == [job.job_id]
+    assert client.get('/api/jobs?status=Done').get_json() == []
@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from models import db, Assignment, AssignmentEvaluation, AssignmentSubmission, Course, StudyMaterial
+
+
+@contextmanager
+def count_queries():
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+
+def test_staff_courses_count_materials_in_one_query(client, quiz):
+    student_id, course_id, mcq_ids = quiz
+    staff_id = db.session.get(Course, course_id).staff_id
+    empty = Course(course_name='French B1', staff_id=staff_id)
+    db.session.add_all([empty, StudyMaterial(course_id=course_id, title='Lesson 2', order_index=2)])
+    db.session.commit()
+
+    with count_queries() as statements:
+        response = client.get('/api/learning/staff/{}/courses'.format(staff_id))
+    counts = {c['course_name']: c['material_count'] for c in response.get_json()}
+    assert counts == {'German A1': 2, 'French B1': 0}
+
+    db.session.add(Course(course_name='Spanish A1', staff_id=staff_id))
+    db.session.commit()
+    with count_queries() as more:
+        assert len(client.get('/api/learning/staff/{}/courses'.format(staff_id)).get_json()) == 3
+    # One more course costs no extra query
+    assert len(more) == len(statements)
+
+
+def test_submissions_load_their_evaluations_together(client, quiz):
+    student_id, course_id, mcq_ids = quiz
+    material = StudyMaterial.query.filter_by(course_id=course_id).one()
+    assignments = [Assignment(material_id=material.material_id, title='Essay {}'.format(i)) for i in range(3)]
+    db.session.add_all(assignments)
+    db.session.flush()
+    submissions = [AssignmentSubmission(assignment_id=a.assignment_id, student_id=student_id) for a in assignments]
+    db.session.add_all(submissions)
+    db.session.flush()
+    db.session.add(AssignmentEvaluation(submission_id=submissions[0].submission_id, marks=7, feedback='Good'))
+    db.session.commit()
+
+    url = '/api/learning/assignments/submissions/{}/{}'.format(student_id, material.material_id)
+    with count_queries() as statements:
+        response = client.get(url)
+    body = response.get_json()
+    assert [(s['is_evaluated'], s['marks'], s['feedback']) for s in body] == [
+        (True, 7.0, 'Good'), (False, None, None), (False, None, None)]
+    # One SELECT for all three submissions' evaluations, not one each
+    assert len([s for s in statements if s.startswith('SELECT assignment_evaluation.')]) == 1
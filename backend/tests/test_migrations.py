@@ -0,0 +1,97 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from sqlalchemy import inspect
+from app import create_app
+from config import Config
+from migrations import LATEST_VERSION
+from models import db, CatalogVersion, Result, SchemaVersion, Student
+
+BASELINE_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_schema.sql')
+
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    """A database file with the pre-migration schema, holding one quiz answer stored twice. Returns a connection."""
+    path = tmp_path / 'lls.db'
+    conn = sqlite3.connect(path)
+    with open(BASELINE_SCHEMA) as f:
+        conn.executescript(f.read())
+    conn.executescript(
+        "INSERT INTO staff (staff_id, name, email) VALUES (1, 'Teacher', 'teacher@example.com');"
+        "INSERT INTO course (course_id, course_name, staff_id) VALUES (1, 'German A1', 1);"
+        "INSERT INTO study_material (material_id, course_id, title, order_index) VALUES (1, 1, 'Lesson 1', 1);"
+        "INSERT INTO student (student_id, name, email, course_id) VALUES (1, 'Student', 'student@example.com', 1);"
+        "INSERT INTO mcq (mcq_id, material_id, question, correct_option) VALUES (1, 1, 'Q1', 'A');"
+        "INSERT INTO result (result_id, student_id, mcq_id, status, grade) VALUES (1, 1, 1, 'Fail', 'B');"
+        "INSERT INTO result (result_id, student_id, mcq_id, status, grade) VALUES (2, 1, 1, 'Pass', 'A');"
+    )
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///{}'.format(path))
+    yield conn
+    conn.close()
+
+
+def _versions(conn):
+    return [v for (v,) in conn.execute('SELECT version FROM schema_version ORDER BY version')]
+
+
+def test_baseline_database_is_upgraded(baseline_db):
+    app = create_app()
+    with app.app_context():
+        # The newest copy of the duplicated answer is kept
+        assert [(r.result_id, r.status) for r in Result.query.all()] == [(2, 'Pass')]
+        indexes = {ix['name'] for ix in inspect(db.engine).get_indexes('result')}
+        assert 'uq_result_student_mcq' in indexes
+        assert 'uq_assignment_evaluation_submission' in {
+            ix['name'] for ix in inspect(db.engine).get_indexes('assignment_evaluation')}
+        assert [v.version for v in SchemaVersion.query.order_by(SchemaVersion.version)] == list(
+            range(1, LATEST_VERSION + 1))
+        assert db.session.get(CatalogVersion, 1).version == 1
+        assert db.session.get(Student, 1).updated_at is not None
+
+    response = app.test_client().get('/api/student/students')
+    assert [s['name'] for s in response.get_json()] == ['Student']
+
+
+def test_duplicate_evaluations_stop_the_upgrade(baseline_db):
+    baseline_db.executescript(
+        "INSERT INTO assignment (assignment_id, material_id, title) VALUES (1, 1, 'Essay');"
+        "INSERT INTO assignment_submission (submission_id, assignment_id, student_id) VALUES (1, 1, 1);"
+        "INSERT INTO assignment_evaluation (submission_id, marks) VALUES (1, 7);"
+        "INSERT INTO assignment_evaluation (submission_id, marks) VALUES (1, 8);"
+    )
+    with pytest.raises(RuntimeError, match='merged before upgrading: \\[1\\]'):
+        create_app()
+    # Migration 2 was rolled back whole, duplicated quiz answers included
+    assert _versions(baseline_db) == [1]
+    assert baseline_db.execute('SELECT COUNT(*) FROM result').fetchone() == (2,)
+
+
+def test_check_mode_refuses_a_stale_schema(baseline_db, monkeypatch):
+    monkeypatch.setattr(Config, 'SCHEMA_STARTUP', 'check')
+    with pytest.raises(RuntimeError, match='version 0, this release needs {}'.format(LATEST_VERSION)):
+        create_app()
+    assert baseline_db.execute("SELECT name FROM sqlite_master WHERE name = 'schema_version'").fetchone() is None
+
+    monkeypatch.setattr(Config, 'SCHEMA_STARTUP', 'upgrade')
+    create_app()
+    monkeypatch.setattr(Config, 'SCHEMA_STARTUP', 'check')
+    app = create_app()
+    assert app.test_client().get('/api/student/students').status_code == 200
+
+
+def test_skip_mode_leaves_the_database_alone(baseline_db, monkeypatch):
+    monkeypatch.setattr(Config, 'SCHEMA_STARTUP', 'skip')
+    create_app()
+    assert baseline_db.execute("SELECT name FROM sqlite_master WHERE name = 'schema_version'").fetchone() is None
+    assert baseline_db.execute('SELECT COUNT(*) FROM result').fetchone() == (2,)
+
+
+def test_workers_starting_together_upgrade_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///{}'.format(tmp_path / 'lls.db'))
+    with ThreadPoolExecutor(4) as pool:
+        apps = list(pool.map(lambda _: create_app(), range(4)))
+    with apps[0].app_context():
+        assert [v.version for v in SchemaVersion.query.order_by(SchemaVersion.version)] == list(
+            range(1, LATEST_VERSION + 1))
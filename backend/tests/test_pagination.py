@@ -0,0 +1,64 @@
+import json
+import pytest
+from jobs import enqueue
+from models import db, Student
+
+
+@pytest.fixture
+def student_ids(app):
+    students = [Student(name='Student {}'.format(i), email='s{}@example.com'.format(i)) for i in range(5)]
+    db.session.add_all(students)
+    db.session.commit()
+    return [s.student_id for s in students]
+
+
+def _ids(response, key='student_id'):
+    return [row[key] for row in response.get_json()]
+
+
+def test_without_limit_the_whole_list_is_returned(client, student_ids):
+    response = client.get('/api/student/students')
+    assert _ids(response) == student_ids
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_pages_follow_the_cursor(client, student_ids):
+    response = client.get('/api/student/students?limit=2')
+    assert _ids(response) == student_ids[:2]
+    assert response.headers['X-Next-Cursor'] == str(student_ids[1])
+    assert response.headers['Link'] == '</api/student/students?limit=2&after={}>; rel="next"'.format(student_ids[1])
+
+    response = client.get('/api/student/students?limit=2&after={}'.format(student_ids[1]))
+    assert _ids(response) == student_ids[2:4]
+    response = client.get('/api/student/students?limit=2&after={}'.format(student_ids[3]))
+    assert _ids(response) == student_ids[4:]
+    assert 'X-Next-Cursor' not in response.headers and 'Link' not in response.headers
+
+
+def test_descending_pages_and_default_limit(client):
+    job_ids = [enqueue('test_page', {}).job_id for _ in range(53)]
+    db.session.commit()
+    newest_first = job_ids[::-1]
+
+    response = client.get('/api/jobs')
+    assert _ids(response, 'job_id') == newest_first[:50]
+    cursor = response.headers['X-Next-Cursor']
+    assert _ids(client.get('/api/jobs?after={}'.format(cursor)), 'job_id') == newest_first[50:]
+    assert _ids(client.get('/api/jobs?limit=3'), 'job_id') == newest_first[:3]
+
+
+def test_bad_arguments_are_refused(client, student_ids):
+    assert client.get('/api/student/students?limit=0').status_code == 400
+    assert client.get('/api/student/students?stream=csv').status_code == 400
+
+
+def test_streams(client, student_ids):
+    response = client.get('/api/student/students?stream=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line)['student_id'] for line in response.get_data(as_text=True).splitlines()] == student_ids
+
+    response = client.get('/api/student/students?stream=json')
+    assert response.mimetype == 'application/json'
+    assert _ids(response) == student_ids
+    # Generating the body reopens the session after the view returned; it is closed again
+    assert not db.session().in_transaction()
@@ -0,0 +1,50 @@
+from models import db, Result
+from progress_counters import get_progress_counter
+from quiz_grading import _insert_new_results, _result_values, grade_quiz
+
+
+def _submit(student_id, answers):
+    correct, _ = grade_quiz(student_id, [{'mcq_id': mcq_id, 'selected_option': option} for mcq_id, option in answers])
+    db.session.commit()
+    return correct
+
+
+def _completed(student_id, course_id):
+    return get_progress_counter(student_id, course_id).completed_quizzes
+
+
+def test_resubmission_regrades_without_counting_again(quiz):
+    student_id, course_id, (first, second) = quiz
+    assert _completed(student_id, course_id) == 0
+
+    assert _submit(student_id, [(first, 'B')]) == 0
+    assert _completed(student_id, course_id) == 1
+
+    # The same question again, now right, next to a new one
+    assert _submit(student_id, [(first, 'A'), (second, 'A')]) == 2
+    assert _completed(student_id, course_id) == 2
+
+    assert _submit(student_id, [(first, 'B'), (second, 'B')]) == 0
+    assert _completed(student_id, course_id) == 2
+    results = Result.query.filter_by(student_id=student_id).order_by(Result.mcq_id).all()
+    assert [(r.mcq_id, r.status) for r in results] == [(first, 'Fail'), (second, 'Fail')]
+
+
+def test_first_submission_seeds_a_missing_counter(quiz):
+    student_id, course_id, (first, second) = quiz
+
+    # No counter row yet: the bump builds it, counting this submission once
+    _submit(student_id, [(first, 'A'), (second, 'A')])
+    assert _completed(student_id, course_id) == 2
+    _submit(student_id, [(first, 'A')])
+    assert _completed(student_id, course_id) == 2
+
+
+def test_only_the_first_insert_of_a_result_counts(quiz):
+    student_id, _, (first, second) = quiz
+    rows = [dict(student_id=student_id, mcq_id=mcq_id, **_result_values(True)) for mcq_id in (first, second)]
+
+    # What a second submission racing the first sees once the first has inserted
+    assert _insert_new_results(rows[:1]) == 1
+    assert _insert_new_results(rows) == 1
+    assert _insert_new_results(rows) == 0
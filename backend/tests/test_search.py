@@ -0,0 +1,71 @@
+from sqlalchemy import insert
+from models import db, Staff, Student
+from search import search
+
+
+def _found(query, **kwargs):
+    return [(r['kind'], r['id']) for r in search(query, **kwargs)]
+
+
+def _student(name, email):
+    student = Student(name=name, email=email)
+    db.session.add(student)
+    db.session.commit()
+    return student.student_id
+
+
+def test_new_rows_are_found_by_word_prefixes(app):
+    anna = _student('Anna Smith', 'anna@example.com')
+    staff = Staff(name='Greta Lehrer', email='greta@example.com', password_hash='x')
+    db.session.add(staff)
+    db.session.commit()
+
+    assert _found('ann smi') == [('student', anna)]
+    assert _found('GRE') == [('staff', staff.staff_id)]
+    assert _found('greta@example') == [('staff', staff.staff_id)]
+    # Every term has to match
+    assert _found('anna lehrer') == []
+    assert _found('smith', kinds=['staff']) == []
+
+
+def test_edits_and_deletes_refresh_the_index(app):
+    anna = _student('Anna Smith', 'anna@example.com')
+    student = db.session.get(Student, anna)
+    student.name = 'Anna Jones'
+    db.session.commit()
+    assert _found('smith') == []
+    assert _found('jones') == [('student', anna)]
+
+    db.session.delete(student)
+    db.session.commit()
+    assert _found('jones') == []
+
+
+def test_rebuild_command_indexes_rows_written_without_the_orm(app):
+    # A Core insert bypasses the flush listener
+    db.session.execute(insert(Student), [{'name': 'Bruno Weber', 'email': 'bruno@example.com'}])
+    db.session.commit()
+    assert _found('bruno') == []
+    # The command opens its own transaction; on the in-memory database that is this thread's connection
+    db.session.rollback()
+
+    result = app.test_cli_runner().invoke(args=['search', 'rebuild'])
+    assert result.exit_code == 0, result.output
+    assert 'Indexed 1 documents' in result.output
+    assert [kind for kind, _ in _found('bruno')] == ['student']
+
+
+def test_search_endpoint(client):
+    anna = _student('Anna Smith', 'anna@example.com')
+    response = client.get('/api/search?q=anna&kind=student')
+    assert response.status_code == 200
+    assert [(r['kind'], r['id'], r['title']) for r in response.get_json()] == [('student', anna, 'Anna Smith')]
+    assert client.get('/api/search?q=anna&kind=teacher').status_code == 400
+
+
+def test_search_keeps_a_request_on_its_replica(app):
+    _student('Anna Smith', 'anna@example.com')
+    # The primary engine stands in for a replica; a query routed to the primary would drop it
+    db.session.info['replica'] = db.engine
+    assert len(search('anna')) == 1
+    assert db.session.info.get('replica') is db.engine
@@ -0,0 +1,98 @@
+import fcntl
+import hashlib
+import os
+import pytest
+from sqlalchemy.orm.attributes import set_committed_value
+import file_storage
+from models import db, StudyMaterial, UploadSession
+
+DATA = bytes(range(256)) * 400
+
+
+@pytest.fixture
+def upload_id(client):
+    response = client.post('/api/uploads', json={'filename': 'notes.pdf', 'size': len(DATA),
+                                                 'content_type': 'application/pdf'})
+    assert response.status_code == 201
+    return response.get_json()['upload_id']
+
+
+def _patch(client, upload_id, offset, data):
+    return client.patch('/api/uploads/{}'.format(upload_id), data=data, headers={'Upload-Offset': str(offset)})
+
+
+def _upload_all(client, upload_id):
+    assert _patch(client, upload_id, 0, DATA).status_code == 200
+
+
+def test_upload_resumes_at_the_reported_offset(client, upload_id):
+    assert _patch(client, upload_id, 0, DATA[:1000]).get_json()['offset'] == 1000
+
+    # A chunk at the wrong offset is refused with the offset to resume from
+    response = _patch(client, upload_id, 500, DATA[500:2000])
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 1000
+    assert client.post('/api/uploads/{}/complete'.format(upload_id)).status_code == 409
+
+    assert client.get('/api/uploads/{}'.format(upload_id)).get_json()['offset'] == 1000
+    assert _patch(client, upload_id, 1000, DATA[1000:]).get_json()['offset'] == len(DATA)
+    body = client.post('/api/uploads/{}/complete'.format(upload_id)).get_json()
+    assert body['sha256'] == hashlib.sha256(DATA).hexdigest()
+    assert body['size'] == len(DATA)
+
+
+def test_chunk_is_refused_while_another_is_written(client, upload_id):
+    with open(file_storage._part_path(upload_id), 'rb') as part:
+        fcntl.flock(part.fileno(), fcntl.LOCK_EX)
+        response = _patch(client, upload_id, 0, DATA)
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 0
+    assert _patch(client, upload_id, 0, DATA).status_code == 200
+
+
+def test_stored_file_supports_ranges_and_etags(client, upload_id, quiz):
+    _upload_all(client, upload_id)
+    client.post('/api/uploads/{}/complete'.format(upload_id))
+    material = StudyMaterial(course_id=quiz[1], title='Notes', order_index=2,
+                             file_path=file_storage.resolve_file_path({'upload_id': upload_id}))
+    db.session.add(material)
+    db.session.commit()
+    url = '/api/learning/materials/{}/file'.format(material.material_id)
+
+    response = client.get(url, headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 100-199/{}'.format(len(DATA))
+    assert response.data == DATA[100:200]
+    response.close()
+
+    etag = hashlib.sha256(DATA).hexdigest()
+    response = client.get(url, headers={'If-None-Match': '"{}"'.format(etag)})
+    assert response.status_code == 304
+
+
+def test_completing_twice_returns_the_same_file(client, upload_id):
+    _upload_all(client, upload_id)
+    first = client.post('/api/uploads/{}/complete'.format(upload_id)).get_json()
+    second = client.post('/api/uploads/{}/complete'.format(upload_id)).get_json()
+    assert first == second
+
+
+def test_a_losing_concurrent_completion_gets_the_winners_file(app, client, upload_id):
+    _upload_all(client, upload_id)
+    upload = db.session.get(UploadSession, upload_id)
+    stored = file_storage.complete_upload(upload)
+
+    # The loser loaded the row before the winner committed
+    set_committed_value(upload, 'status', 'Pending')
+    assert file_storage.complete_upload(upload) is stored
+    assert upload.status == 'Complete'
+
+
+def test_completion_in_progress_elsewhere_is_a_conflict(client, upload_id):
+    _upload_all(client, upload_id)
+    # The winner has moved the part file but not committed yet
+    part = file_storage._part_path(upload_id)
+    os.rename(part, part + '.moved')
+    response = client.post('/api/uploads/{}/complete'.format(upload_id))
+    assert response.status_code == 409
+    assert response.get_json()['error'] == 'Upload is being completed'
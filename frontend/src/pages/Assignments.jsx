@@ -34,8 +34,17 @@ const Assignments = () => {
     const loadSubmissions = async () => {
         try {
             if (isStaff && user?.user_id) {
-                const response = await api.get(`/submission/staff/${user.user_id}/submissions`);
-                setSubmissions(response.data);
+                // Follow the keyset cursor until every page is loaded
+                let all = [];
+                let after = null;
+                do {
+                    const params = { limit: 200 };
+                    if (after) params.after = after;
+                    const response = await api.get(`/submission/staff/${user.user_id}/submissions`, { params });
+                    all = all.concat(response.data);
+                    after = response.headers['x-next-cursor'];
+                } while (after);
+                setSubmissions(all);
             } else if (isAdmin) {
                 // Admin could see all submissions - for now just show message
                 setSubmissions([]);